@@ -0,0 +1,299 @@
+# analytics.py
+# Long-range nutrition and training statistics over a user's full history. The
+# raw rows are pulled once per table into NumPy column arrays (dates as days since
+# 1970-01-01) and every series is computed with array operations: bincount for
+# per-day totals, cumulative sums for rolling windows, lexsort + reduceat for
+# per-exercise, per-day volume and estimated 1RM.
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import catalog
+from db import get_connection
+from models import ValidationError
+from services import _as_date
+
+ROLLING_WINDOW = 7
+ADHERENCE_TOLERANCE = 0.10  # a day "hits" a target within +/- 10%
+MACROS = ("calories", "protein_g", "carbs_g", "fats_g")
+
+_MEALS_DTYPE = np.dtype(
+    [("day", "i4"), ("calories", "f8"), ("protein_g", "f8"), ("carbs_g", "f8"), ("fats_g", "f8")]
+)
+_WORKOUTS_DTYPE = np.dtype([("day", "i4"), ("calories_out", "f8")])
+_SETS_DTYPE = np.dtype(
+    [("exercise_id", "i8"), ("day", "i4"), ("sets", "f8"), ("reps", "f8"), ("weight", "f8")]
+)
+
+
+@dataclass
+class History:
+    # Raw rows of one user, one structured array per table.
+    meals: np.ndarray
+    workouts: np.ndarray
+    sets: np.ndarray
+
+
+@dataclass
+class DailySeries:
+    # One element per calendar day from first to last; days without logs are 0.
+    days: np.ndarray        # datetime64[D]
+    calories_in: np.ndarray
+    protein_g: np.ndarray
+    carbs_g: np.ndarray
+    fats_g: np.ndarray
+    calories_out: np.ndarray
+    meal_days: np.ndarray   # bool: at least one meal logged
+    logged: np.ndarray      # bool: at least one meal or workout logged
+
+
+@dataclass
+class ExerciseProgress:
+    # One element per day the exercise was trained.
+    exercise_id: int
+    days: np.ndarray        # datetime64[D]
+    volume: np.ndarray      # sum of sets x reps x weight that day
+    est_1rm: np.ndarray     # best Epley estimate that day
+    best_1rm: np.ndarray    # running maximum of est_1rm
+
+
+@dataclass
+class Adherence:
+    macro: str
+    target: float
+    days: int
+    mean_ratio: Optional[float]   # mean of actual / target over meal days
+    hit_rate: Optional[float]     # share of meal days within the tolerance
+
+
+def _load(cur, sql: str, params, dtype: np.dtype) -> np.ndarray:
+    cur.execute(sql, params)
+    return np.array(cur.fetchall(), dtype=dtype)
+
+
+def load_history(user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> History:
+    params = {"user_id": user_id, "start": start or date.min, "end": end or date.max}
+    with get_connection(readonly=True) as conn, conn.cursor() as cur:
+        meals = _load(
+            cur,
+            """
+            SELECT meal_date - DATE '1970-01-01',
+                   COALESCE(calories, 0)::float8, COALESCE(protein_g, 0)::float8,
+                   COALESCE(carbs_g, 0)::float8, COALESCE(fats_g, 0)::float8
+            FROM meal_logs
+            WHERE user_id = %(user_id)s AND meal_date BETWEEN %(start)s AND %(end)s;
+            """,
+            params,
+            _MEALS_DTYPE,
+        )
+        workouts = _load(
+            cur,
+            """
+            SELECT workout_date - DATE '1970-01-01', COALESCE(calories_burned, 0)::float8
+            FROM workout_logs
+            WHERE user_id = %(user_id)s AND workout_date BETWEEN %(start)s AND %(end)s;
+            """,
+            params,
+            _WORKOUTS_DTYPE,
+        )
+        sets = _load(
+            cur,
+            """
+            SELECT we.exercise_id, w.workout_date - DATE '1970-01-01',
+                   COALESCE(we.sets, 0), COALESCE(we.reps, 0),
+                   COALESCE(we.weight_used_kg, 0)::float8
+            FROM workout_exercises we
+            JOIN workout_logs w ON w.id = we.workout_id
+            WHERE w.user_id = %(user_id)s AND w.workout_date BETWEEN %(start)s AND %(end)s;
+            """,
+            params,
+            _SETS_DTYPE,
+        )
+    return History(meals=meals, workouts=workouts, sets=sets)
+
+
+# ---- series ---------------------------------------------------------------
+
+
+def daily_series(history: History) -> DailySeries:
+    all_days = np.concatenate((history.meals["day"], history.workouts["day"]))
+    if not all_days.size:
+        empty = np.zeros(0)
+        return DailySeries(
+            np.zeros(0, "datetime64[D]"), empty, empty, empty, empty, empty,
+            np.zeros(0, bool), np.zeros(0, bool),
+        )
+    first, n = all_days.min(), int(all_days.max() - all_days.min()) + 1
+
+    meal_idx = history.meals["day"] - first
+    workout_idx = history.workouts["day"] - first
+    meal_counts = np.bincount(meal_idx, minlength=n)
+    workout_counts = np.bincount(workout_idx, minlength=n)
+
+    def per_day(idx, weights):
+        return np.bincount(idx, weights=weights, minlength=n)
+
+    return DailySeries(
+        days=np.arange(first, first + n).astype("datetime64[D]"),
+        calories_in=per_day(meal_idx, history.meals["calories"]),
+        protein_g=per_day(meal_idx, history.meals["protein_g"]),
+        carbs_g=per_day(meal_idx, history.meals["carbs_g"]),
+        fats_g=per_day(meal_idx, history.meals["fats_g"]),
+        calories_out=per_day(workout_idx, history.workouts["calories_out"]),
+        meal_days=meal_counts > 0,
+        logged=(meal_counts + workout_counts) > 0,
+    )
+
+
+def rolling_mean(values: np.ndarray, mask: np.ndarray, window: int = ROLLING_WINDOW) -> np.ndarray:
+    # Mean of values[i - window + 1 .. i] over the positions where mask is set
+    # (NaN when none are); unlogged days do not count as zeros.
+    if window < 1:
+        raise ValidationError("Rolling window must be at least 1 day.")
+    sums = np.concatenate(([0.0], np.cumsum(np.where(mask, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(mask)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    window_sums = sums[ends] - sums[starts]
+    window_counts = counts[ends] - counts[starts]
+    return np.divide(
+        window_sums, window_counts, out=np.full(len(values), np.nan), where=window_counts > 0
+    )
+
+
+def epley_1rm(weight: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    # Epley: w * (1 + reps / 30); a single rep is the lift itself, no reps is 0.
+    est = weight * (1.0 + reps / 30.0)
+    return np.where(reps == 1, weight, np.where(reps > 0, est, 0.0))
+
+
+def exercise_progress(history: History) -> List[ExerciseProgress]:
+    sets = history.sets
+    if not sets.size:
+        return []
+    order = np.lexsort((sets["day"], sets["exercise_id"]))
+    ex = sets["exercise_id"][order]
+    day = sets["day"][order]
+    volume = (sets["sets"] * sets["reps"] * sets["weight"])[order]
+    one_rm = epley_1rm(sets["weight"], sets["reps"])[order]
+
+    # One group per (exercise, day).
+    new_group = np.empty(len(ex), bool)
+    new_group[0] = True
+    new_group[1:] = (ex[1:] != ex[:-1]) | (day[1:] != day[:-1])
+    starts = np.flatnonzero(new_group)
+    group_ex, group_day = ex[starts], day[starts]
+    group_volume = np.add.reduceat(volume, starts)
+    group_1rm = np.maximum.reduceat(one_rm, starts)
+
+    result = []
+    bounds = np.flatnonzero(np.diff(group_ex)) + 1
+    for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(group_ex)]))):
+        result.append(
+            ExerciseProgress(
+                exercise_id=int(group_ex[lo]),
+                days=group_day[lo:hi].astype("datetime64[D]"),
+                volume=group_volume[lo:hi],
+                est_1rm=group_1rm[lo:hi],
+                best_1rm=np.maximum.accumulate(group_1rm[lo:hi]),
+            )
+        )
+    return result
+
+
+def weekly_totals(days: np.ndarray, values: np.ndarray):
+    # (Monday of each week, sum of values that week) for the weeks present.
+    # 1970-01-01 was a Thursday, hence the 3-day shift.
+    offsets = days.astype("i8")
+    weeks = (offsets + 3) // 7
+    unique, idx = np.unique(weeks, return_inverse=True)
+    return (unique * 7 - 3).astype("datetime64[D]"), np.bincount(idx, weights=values)
+
+
+def macro_adherence(
+    series: DailySeries, targets: Dict[str, float], tolerance: float = ADHERENCE_TOLERANCE
+) -> List[Adherence]:
+    columns = {
+        "calories": series.calories_in,
+        "protein_g": series.protein_g,
+        "carbs_g": series.carbs_g,
+        "fats_g": series.fats_g,
+    }
+    result = []
+    for macro, target in targets.items():
+        if macro not in columns:
+            raise ValidationError(f"Unknown macro {macro!r}; expected one of: {', '.join(MACROS)}.")
+        if target <= 0:
+            raise ValidationError(f"Target for {macro} must be greater than zero.")
+        ratio = columns[macro][series.meal_days] / target
+        result.append(
+            Adherence(
+                macro=macro,
+                target=target,
+                days=int(ratio.size),
+                mean_ratio=float(ratio.mean()) if ratio.size else None,
+                hit_rate=float((np.abs(ratio - 1.0) <= tolerance).mean()) if ratio.size else None,
+            )
+        )
+    return result
+
+
+# ---- report ---------------------------------------------------------------
+
+
+def _json(values: np.ndarray) -> list:
+    if values.dtype.kind == "M":
+        return np.datetime_as_string(values).tolist()
+    out = np.round(values, 2).astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+
+def report(
+    user_id: int,
+    start=None,
+    end=None,
+    window: int = ROLLING_WINDOW,
+    targets: Optional[Dict[str, float]] = None,
+) -> dict:
+    # Everything above for one user, as plain JSON-ready values.
+    start = _as_date(start, "start date") if start else None
+    end = _as_date(end, "end date") if end else None
+    history = load_history(user_id, start, end)
+    series = daily_series(history)
+
+    exercises = []
+    for p in exercise_progress(history):
+        weeks, weekly_volume = weekly_totals(p.days, p.volume)
+        records = np.concatenate(([True], p.best_1rm[1:] > p.best_1rm[:-1])) & (p.est_1rm > 0)
+        exercise = catalog.exercises.get(p.exercise_id)
+        exercises.append(
+            {
+                "exercise_id": p.exercise_id,
+                "exercise_name": exercise.exercise_name if exercise else None,
+                "sessions": int(p.days.size),
+                "total_volume": round(float(p.volume.sum()), 2),
+                "best_1rm": round(float(p.best_1rm[-1]), 2),
+                "weekly_volume": {"weeks": _json(weeks), "volume": _json(weekly_volume)},
+                "records_1rm": {"days": _json(p.days[records]), "est_1rm": _json(p.est_1rm[records])},
+            }
+        )
+
+    return {
+        "start": str(series.days[0]) if series.days.size else None,
+        "end": str(series.days[-1]) if series.days.size else None,
+        "days_logged": int(series.logged.sum()),
+        "window": window,
+        "rolling": {
+            "days": _json(series.days),
+            "calories_in": _json(rolling_mean(series.calories_in, series.meal_days, window)),
+            "calories_out": _json(rolling_mean(series.calories_out, series.logged, window)),
+            "protein_g": _json(rolling_mean(series.protein_g, series.meal_days, window)),
+            "carbs_g": _json(rolling_mean(series.carbs_g, series.meal_days, window)),
+            "fats_g": _json(rolling_mean(series.fats_g, series.meal_days, window)),
+        },
+        "exercises": sorted(exercises, key=lambda e: -e["total_volume"]),
+        "adherence": [asdict(a) for a in macro_adherence(series, targets or {})],
+    }
@@ -1,4 +1,8 @@
 # app.py
+import argparse
+
+import autocomplete
+import db
 from auth import register, login
 from workouts import (
     add_workout,
@@ -18,7 +22,7 @@ from meals import (
     add_food_catalog,
     list_foods,
 )
-from reports import daily_report, weekly_report, export_data
+from reports import analytics_report, daily_report, weekly_report, trend_report, export_data
 
 
 def logged_in_menu(user_id: int, name: str):
@@ -44,6 +48,8 @@ def logged_in_menu(user_id: int, name: str):
         print("15) Daily report")
         print("16) Weekly report")
         print("17) Export all data as JSON")
+        print("18) Trend report")
+        print("19) Analytics (averages, volume, 1RM, adherence)")
         print("0) Logout")
 
         choice = input("Choose: ").strip()
@@ -51,7 +57,7 @@ def logged_in_menu(user_id: int, name: str):
         if choice == "1":
             add_workout(user_id)
         elif choice == "2":
-            add_exercise_to_workout()
+            add_exercise_to_workout(user_id)
         elif choice == "3":
             update_workout(user_id)
         elif choice == "4":
@@ -62,7 +68,7 @@ def logged_in_menu(user_id: int, name: str):
         elif choice == "6":
             add_meal(user_id)
         elif choice == "7":
-            add_food_to_meal()
+            add_food_to_meal(user_id)
         elif choice == "8":
             update_meal(user_id)
         elif choice == "9":
@@ -85,6 +91,10 @@ def logged_in_menu(user_id: int, name: str):
             weekly_report(user_id)
         elif choice == "17":
             export_data(user_id)
+        elif choice == "18":
+            trend_report(user_id)
+        elif choice == "19":
+            analytics_report(user_id)
 
         elif choice == "0":
             print("Logging out.\n")
@@ -94,6 +104,15 @@ def logged_in_menu(user_id: int, name: str):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Fitness & Nutrition Logger")
+    parser.add_argument("--backend", choices=db.BACKENDS, default=db.DB_BACKEND,
+                        help="postgres (run.sh) or an embedded SQLite file")
+    parser.add_argument("--db-path", default=db.SQLITE_PATH,
+                        help="SQLite database file, created with sample data if missing")
+    args = parser.parse_args()
+    db.configure_backend(args.backend, args.db_path)
+
+    autocomplete.start_background_load()
     while True:
         print("=== Fitness & Nutrition Logger ===")
         print("1) Register")
@@ -0,0 +1,86 @@
+# async_services.py
+# Asyncio variants of the read-heavy service calls. psycopg2 is blocking, so each
+# query runs on an executor thread with its own pooled connection; independent
+# queries of one report are issued concurrently and gathered. Because they run
+# on separate connections they do not share a snapshot, so calls that need one
+# (the export) run as a single query function on one connection.
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from typing import List
+
+from psycopg2.extras import DictCursor
+
+import db
+import services
+from models import DailyReport, Meal, MealSearch, TrendReport, WeeklyReport, Workout, WorkoutSearch
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # More threads than pooled connections would only queue inside the pool.
+                _executor = ThreadPoolExecutor(
+                    max_workers=db.get_pool().max_size, thread_name_prefix="db-async"
+                )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _query(fn, *args):
+    with db.get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        return fn(cur, *args)
+
+
+async def _run(fn, *args):
+    # The executor thread runs in a copy of our context, so db.read_your_writes() carries over.
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), partial(context.run, fn, *args))
+
+
+async def _run_query(fn, *args):
+    return await _run(_query, fn, *args)
+
+
+async def compute_daily_report(user_id: int, day=None) -> DailyReport:
+    # A single lookup in daily_summaries; nothing to run concurrently.
+    return await _run_query(services._daily_report, user_id, services._as_date(day or date.today()))
+
+
+async def compute_weekly_report(user_id: int, end=None) -> WeeklyReport:
+    return await _run(services.compute_weekly_report, user_id, end)
+
+
+async def compute_trend_report(user_id: int, start=None, end=None, bucket: str = "day") -> TrendReport:
+    return await _run(services.compute_trend_report, user_id, start, end, bucket)
+
+
+async def search_workouts(user_id: int, criteria: WorkoutSearch) -> List[Workout]:
+    rows = await _run_query(services._search_workout_rows, user_id, criteria)
+    return services._group_workouts(rows)
+
+
+async def search_meals(user_id: int, criteria: MealSearch) -> List[Meal]:
+    rows = await _run_query(services._search_meal_rows, user_id, criteria)
+    return services._group_meals(rows)
+
+
+async def export_user_data(user_id: int) -> dict:
+    # One query run on one connection: the sections must come from the same snapshot.
+    return await _run_query(services._export_user_data, user_id)
@@ -0,0 +1,288 @@
+# autocomplete.py
+# In-memory name autocomplete for the foods and exercises catalogs.
+#
+# Every word of every name is kept in one sorted array (`_keys`, parallel to the
+# `_key_slots` array of entry slots) ordered by (word, name length), so a typed
+# word prefix maps to a contiguous range found with two bisects and the first k
+# distinct entries of that range are the best-ranked completions. Inserts go to a
+# small delta run that is spliced into the main arrays in batches. Typos are
+# handled with a trigram index over the distinct words (not the names), which
+# stays small even for a million-entry catalog. Indexes load in a background
+# thread at startup and follow catalog inserts through catalog.CatalogCache
+# listeners.
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import catalog
+from db import get_connection
+from models import Suggestion
+
+SCAN_LIMIT = 5000          # max index entries examined per query and run
+SET_FILTER_LIMIT = 10000   # secondary tokens matching more entries are checked per name
+MERGE_THRESHOLD = 4096     # delta entries before they are spliced into the main run
+FUZZY_THRESHOLD = 0.4      # min trigram similarity for a typo-corrected word
+FUZZY_WORDS = 8            # similar words tried per query
+LOAD_BATCH_SIZE = 10000
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _index_words(text: str) -> List[str]:
+    # Bare numbers ("2", "500") are not indexed; mixed tokens like "100g" are.
+    return [w for w in _words(text) if not w.isdigit()]
+
+
+def _range_size(keys: List[str], prefix: str) -> int:
+    return bisect_left(keys, prefix + "\U0010ffff") - bisect_left(keys, prefix)
+
+
+def _has_word_prefix(text: str, prefix: str) -> bool:
+    i = text.find(prefix)
+    while i != -1:
+        if i == 0 or not text[i - 1].isalnum():
+            return True
+        i = text.find(prefix, i + 1)
+    return False
+
+
+def _trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    def __init__(self, cache: Optional[catalog.CatalogCache] = None):
+        self.cache = cache
+        self._lock = threading.RLock()
+        self._reset()
+        self.ready = False
+        self._loading = False
+        self._pending: List[Tuple[int, str]] = []
+        if cache is not None:
+            cache.add_listener(self._on_put)
+
+    def _reset(self):
+        self._ids = array("q")              # slot -> catalog id
+        self._names: List[str] = []         # slot -> display name
+        self._alive = bytearray()           # slot -> 0 once replaced by a rename
+        self._slot_by_id: Dict[int, int] = {}
+        self._keys: List[str] = []          # sorted words (one per word occurrence)
+        self._key_slots = array("i")        # parallel to _keys
+        self._delta_keys: List[str] = []    # same layout for recent inserts, merged
+        self._delta_slots = array("i")      # into the main arrays every MERGE_THRESHOLD
+        self._vocab: Dict[str, int] = {}    # distinct word -> word id
+        self._vocab_words: List[str] = []
+        self._trigram_postings: Dict[str, array] = {}  # trigram -> word ids
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
+
+    # -- building -------------------------------------------------------
+
+    def build(self, entries: Iterable[Tuple[int, str]]):
+        # Bulk build: append every entry, then sort the word array once.
+        with self._lock:
+            self._reset()
+            triples = []
+            for entry_id, name in entries:
+                slot = self._append_entry(entry_id, name)
+                length = len(name)
+                for word in set(_index_words(name)):
+                    triples.append((self._intern(word), length, slot))
+            triples.sort()
+            self._keys = [t[0] for t in triples]
+            self._key_slots = array("i", (t[2] for t in triples))
+            self.ready = True
+
+    def add(self, entry_id: int, name: str):
+        with self._lock:
+            if self._loading:
+                self._pending.append((entry_id, name))
+            slot = self._slot_by_id.get(entry_id)
+            if slot is not None:
+                if self._names[slot] == name:
+                    return
+                self._alive[slot] = 0
+            slot = self._append_entry(entry_id, name)
+            for word in set(_index_words(name)):
+                word = self._intern(word)
+                pos = self._position(self._delta_keys, self._delta_slots, word, len(name))
+                self._delta_keys.insert(pos, word)
+                self._delta_slots.insert(pos, slot)
+            if len(self._delta_keys) >= MERGE_THRESHOLD:
+                self._merge_delta()
+
+    def load(self):
+        # (Re)build from the database; inserts that arrive meanwhile are replayed.
+        if self.cache is None:
+            return
+        with self._lock:
+            self._loading = True
+            self._pending = []
+        try:
+            with get_connection() as conn:
+                with conn.cursor(name=f"autocomplete_{self.cache.table}") as cur:
+                    cur.itersize = LOAD_BATCH_SIZE
+                    cur.execute(f"SELECT id, {self.cache.name_column} FROM {self.cache.table} ORDER BY id;")
+                    fresh = NameIndex()
+                    fresh.build(cur)
+                conn.rollback()
+            with self._lock:
+                self.__dict__.update(
+                    {k: v for k, v in fresh.__dict__.items() if k not in ("cache", "_lock", "_pending")}
+                )
+                self._loading = False
+                for entry_id, name in self._pending:
+                    self.add(entry_id, name)
+                self._pending = []
+                self.ready = True
+        finally:
+            self._loading = False
+
+    def _append_entry(self, entry_id: int, name: str) -> int:
+        slot = len(self._names)
+        self._ids.append(entry_id)
+        self._names.append(name)
+        self._alive.append(1)
+        self._slot_by_id[entry_id] = slot
+        return slot
+
+    def _intern(self, word: str) -> str:
+        # One str object per distinct word; new words also enter the trigram index.
+        word_id = self._vocab.get(word)
+        if word_id is not None:
+            return self._vocab_words[word_id]
+        word_id = len(self._vocab_words)
+        self._vocab[word] = word_id
+        self._vocab_words.append(word)
+        for gram in _trigrams(word):
+            postings = self._trigram_postings.get(gram)
+            if postings is None:
+                postings = self._trigram_postings[gram] = array("i")
+            postings.append(word_id)
+        return word
+
+    def _name_len(self, slot: int) -> int:
+        return len(self._names[slot])
+
+    def _position(self, keys: List[str], slots: array, word: str, length: int) -> int:
+        lo, hi = bisect_left(keys, word), bisect_right(keys, word)
+        return bisect_right(slots, length, lo, hi, key=self._name_len)
+
+    def _merge_delta(self):
+        # Splice the (sorted) delta run into the main arrays: one bisect per delta
+        # entry plus slice copies, instead of a full re-sort.
+        keys, slots = [], array("i")
+        prev = 0
+        for word, slot in zip(self._delta_keys, self._delta_slots):
+            pos = self._position(self._keys, self._key_slots, word, self._name_len(slot))
+            keys.extend(self._keys[prev:pos])
+            slots.extend(self._key_slots[prev:pos])
+            keys.append(word)
+            slots.append(slot)
+            prev = pos
+        keys.extend(self._keys[prev:])
+        slots.extend(self._key_slots[prev:])
+        self._keys, self._key_slots = keys, slots
+        self._delta_keys, self._delta_slots = [], array("i")
+
+    def _on_put(self, entry):
+        self.add(entry.id, getattr(entry, self.cache.name_column))
+
+    # -- queries --------------------------------------------------------
+
+    def search(self, query: str, k: int = 10) -> List[Suggestion]:
+        tokens = list(dict.fromkeys(_index_words(query)))
+        if not tokens or k < 1:
+            return []
+        with self._lock:
+            # Drive the scan with the most selective token; every other token must
+            # start some word of the name.
+            sizes = {t: _range_size(self._keys, t) for t in tokens}
+            driver = min(tokens, key=sizes.get)
+            filters = []
+            for t in tokens:
+                if t == driver:
+                    continue
+                if sizes[t] <= SET_FILTER_LIMIT:
+                    filters.append(self._slot_set(t).__contains__)
+                else:
+                    filters.append(lambda slot, t=t: _has_word_prefix(self._names[slot].lower(), t))
+            found = self._complete(driver, True, filters, k, {})
+            if len(found) < k:
+                for word in self._similar_words(driver):
+                    found = self._complete(word, False, filters, k, found)
+                    if len(found) >= k:
+                        break
+            return [Suggestion(self._ids[s], self._names[s]) for s in found]
+
+    def _complete(self, word: str, prefix: bool, filters: list, k: int, found: Dict[int, None]) -> Dict[int, None]:
+        # Up to k new matches for `word` from the main and delta runs, merged in
+        # (word, name length) order and appended to `found` (an ordered set).
+        candidates = []
+        for keys, slots in ((self._keys, self._key_slots), (self._delta_keys, self._delta_slots)):
+            lo = bisect_left(keys, word)
+            hi = bisect_left(keys, word + "\U0010ffff") if prefix else bisect_right(keys, word)
+            seen = set()
+            for pos in range(lo, min(hi, lo + SCAN_LIMIT)):
+                slot = slots[pos]
+                if slot in found or slot in seen or not self._alive[slot]:
+                    continue
+                if filters and not all(f(slot) for f in filters):
+                    continue
+                seen.add(slot)
+                candidates.append((keys[pos], len(self._names[slot]), slot))
+                if len(seen) >= k:
+                    break
+        candidates.sort()
+        for _, _, slot in candidates:
+            if len(found) >= k:
+                break
+            found.setdefault(slot, None)
+        return found
+
+    def _slot_set(self, prefix: str) -> set:
+        # Slots having a word that starts with prefix (set() over array slices runs in C).
+        result = set()
+        for keys, slots in ((self._keys, self._key_slots), (self._delta_keys, self._delta_slots)):
+            result.update(slots[bisect_left(keys, prefix):bisect_left(keys, prefix + "\U0010ffff")])
+        return result
+
+    def _similar_words(self, token: str) -> List[str]:
+        grams = _trigrams(token)
+        counts = Counter()
+        for gram in grams:
+            postings = self._trigram_postings.get(gram)
+            if postings is not None:
+                counts.update(postings)
+        scored = []
+        for word_id, shared in counts.items():
+            word = self._vocab_words[word_id]
+            score = shared / (len(grams) + len(_trigrams(word)) - shared)
+            if score >= FUZZY_THRESHOLD and not word.startswith(token):
+                scored.append((-score, word))
+        scored.sort()
+        return [w for _, w in scored[:FUZZY_WORDS]]
+
+
+foods = NameIndex(catalog.foods)
+exercises = NameIndex(catalog.exercises)
+
+
+def load_all():
+    foods.load()
+    exercises.load()
+
+
+def start_background_load() -> threading.Thread:
+    thread = threading.Thread(target=load_all, name="autocomplete-load", daemon=True)
+    thread.start()
+    return thread
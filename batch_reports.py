@@ -0,0 +1,281 @@
+# batch_reports.py
+# Nightly report run for every user: the daily and weekly report figures (as
+# services.compute_daily_report/compute_weekly_report) and, optionally, a data
+# export per user. Users are split into chunks of consecutive ids and the chunks
+# run on a thread or process pool; each chunk holds one connection, reads the
+# summaries of all its users in one query and writes one part file.
+#
+# Output, under <out-dir>/<day>/:
+#   part-<first id>-<last id>.ndjson   one line per user, written atomically
+#   reports.ndjson                     all parts concatenated once every chunk succeeded
+#   exports/user_<id>_export.<fmt>     with --reports ... export
+#
+# Finished part files double as the checkpoint: rerunning with the same day and
+# out-dir skips users already written to a part (use --restart to start over).
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from psycopg2.extras import DictCursor
+
+import db
+import exporter
+import services
+import summaries
+from db import get_connection
+from models import ValidationError
+
+REPORTS = ("daily", "weekly", "export")
+REPORT_CHUNK_SIZE = 500
+REPORT_WORKERS = min(8, os.cpu_count() or 1)
+REPORT_OUT_DIR = "nightly_reports"
+MODES = ("thread", "process")
+
+_PART_PREFIX = "part-"
+_MERGED_NAME = "reports.ndjson"
+
+
+@dataclass
+class ChunkJob:
+    user_ids: List[int]
+    day: date
+    reports: Tuple[str, ...]
+    run_dir: str
+    export_format: str = "json"
+
+    @property
+    def part_name(self) -> str:
+        return f"{_PART_PREFIX}{self.user_ids[0]:010d}-{self.user_ids[-1]:010d}.ndjson"
+
+
+@dataclass
+class ChunkResult:
+    first_id: int
+    last_id: int
+    users: int
+    exports: int
+    seconds: float
+
+
+@dataclass
+class RunStats:
+    day: date
+    run_dir: str
+    users_total: int = 0
+    users_skipped: int = 0   # covered by part files of an earlier run
+    users_done: int = 0
+    chunks_done: int = 0
+    exports: int = 0
+    failed: List[Tuple[int, int, str]] = field(default_factory=list)  # (first id, last id, error)
+    seconds: float = 0.0
+    merged: Optional[str] = None
+
+
+def _write_atomic(path: str, lines: Sequence[dict]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, default=exporter._nested_default) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def run_chunk(job: ChunkJob) -> ChunkResult:
+    # Runs in a worker thread or process; one pooled connection for the chunk.
+    started = time.perf_counter()
+    week_start = job.day - timedelta(days=6)
+    exports = 0
+    lines = []
+
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        days_by_user = defaultdict(list)
+        if "daily" in job.reports or "weekly" in job.reports:
+            for r in summaries.get_days_for_users(cur, job.user_ids, week_start, job.day):
+                days_by_user[r["user_id"]].append(r)
+
+        for user_id in job.user_ids:
+            rows = days_by_user.get(user_id, [])
+            line = {"user_id": user_id, "day": job.day}
+            if "daily" in job.reports:
+                daily = services._daily_from_row(job.day, next((r for r in rows if r["day"] == job.day), None))
+                line["daily"] = {**asdict(daily), "balance": daily.balance}
+            if "weekly" in job.reports:
+                line["weekly"] = asdict(services._weekly_from_days(week_start, job.day, rows))
+            if "export" in job.reports:
+                path = os.path.join(job.run_dir, "exports", exporter.default_filename(user_id, job.export_format))
+                exporter.export_to_path(user_id, path, job.export_format, conn=conn)
+                line["export"] = path
+                exports += 1
+            lines.append(line)
+
+    _write_atomic(os.path.join(job.run_dir, job.part_name), lines)
+    return ChunkResult(job.user_ids[0], job.user_ids[-1], len(job.user_ids), exports, time.perf_counter() - started)
+
+
+def _part_names(run_dir: str) -> List[str]:
+    return sorted(
+        name for name in os.listdir(run_dir) if name.startswith(_PART_PREFIX) and name.endswith(".ndjson")
+    )
+
+
+def _done_users(run_dir: str) -> Set[int]:
+    # The ids actually in the part files: a part's name gives only its first and
+    # last id, and parts from different runs may span the same range.
+    done = set()
+    for name in _part_names(run_dir):
+        with open(os.path.join(run_dir, name), encoding="utf-8") as f:
+            for line in f:
+                done.add(json.loads(line)["user_id"])
+    return done
+
+
+def _merge_parts(run_dir: str) -> str:
+    merged = os.path.join(run_dir, _MERGED_NAME)
+    tmp_path = merged + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for name in _part_names(run_dir):
+            with open(os.path.join(run_dir, name), encoding="utf-8") as f:
+                for line in f:
+                    out.write(line)
+    os.replace(tmp_path, merged)
+    return merged
+
+
+def _print_progress(stats: RunStats, started: float):
+    elapsed = time.perf_counter() - started
+    todo = stats.users_total - stats.users_skipped
+    rate = stats.users_done / elapsed if elapsed > 0 else 0.0
+    eta = (todo - stats.users_done) / rate if rate else 0.0
+    print(
+        f"[{stats.users_done}/{todo} users] {stats.chunks_done} chunks, "
+        f"{len(stats.failed)} failed, {rate:.0f} users/s, ETA {eta:.0f} s",
+        file=sys.stderr,
+    )
+
+
+def run(
+    day=None,
+    reports: Sequence[str] = ("daily", "weekly"),
+    workers: int = REPORT_WORKERS,
+    mode: str = "thread",
+    out_dir: str = REPORT_OUT_DIR,
+    chunk_size: int = REPORT_CHUNK_SIZE,
+    export_format: str = "json",
+    restart: bool = False,
+    progress: Optional[Callable[[RunStats, float], None]] = _print_progress,
+) -> RunStats:
+    day = services._as_date(day or date.today())
+    reports = tuple(reports)
+    if not reports or any(r not in REPORTS for r in reports):
+        raise ValidationError(f"Reports must be chosen from: {', '.join(REPORTS)}.")
+    if mode not in MODES:
+        raise ValidationError(f"Mode must be one of: {', '.join(MODES)}.")
+    if export_format not in exporter.FORMATS:
+        raise ValidationError(f"Unknown export format {export_format!r}.")
+    if workers < 1 or chunk_size < 1:
+        raise ValidationError("Workers and chunk size must be at least 1.")
+
+    run_dir = os.path.join(out_dir, day.isoformat())
+    os.makedirs(os.path.join(run_dir, "exports"), exist_ok=True)
+    if restart:
+        for name in os.listdir(run_dir):
+            if name.startswith(_PART_PREFIX) or name == _MERGED_NAME:
+                os.remove(os.path.join(run_dir, name))
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT id FROM users ORDER BY id;")
+        user_ids = [r[0] for r in cur.fetchall()]
+
+    stats = RunStats(day=day, run_dir=run_dir, users_total=len(user_ids))
+    done = _done_users(run_dir)
+    todo = [u for u in user_ids if u not in done]
+    stats.users_skipped = len(user_ids) - len(todo)
+    jobs = [
+        ChunkJob(todo[i:i + chunk_size], day, reports, run_dir, export_format)
+        for i in range(0, len(todo), chunk_size)
+    ]
+
+    if mode == "process":
+        # Children get their own pools (db.get_pool checks the pid); closing ours
+        # first means no socket is ever shared across the fork.
+        db.close_pool()
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        if db.get_pool().max_size < workers:
+            db.configure_pool(max_size=workers)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-report")
+
+    started = time.perf_counter()
+    with executor:
+        pending = {executor.submit(run_chunk, job): job for job in jobs}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    stats.failed.append((job.user_ids[0], job.user_ids[-1], f"{type(e).__name__}: {e}".strip()))
+                else:
+                    stats.users_done += result.users
+                    stats.exports += result.exports
+                    stats.chunks_done += 1
+                if progress:
+                    progress(stats, started)
+
+    stats.seconds = time.perf_counter() - started
+    if not stats.failed:
+        stats.merged = _merge_parts(run_dir)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily/weekly reports and exports for every user")
+    parser.add_argument("--day", help="report day (YYYY-MM-DD, default today)")
+    parser.add_argument(
+        "--reports", default="daily,weekly", help=f"comma-separated subset of {','.join(REPORTS)}"
+    )
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    parser.add_argument("--mode", choices=MODES, default="thread")
+    parser.add_argument("--out-dir", default=REPORT_OUT_DIR)
+    parser.add_argument("--chunk-size", type=int, default=REPORT_CHUNK_SIZE)
+    parser.add_argument("--export-format", choices=exporter.FORMATS, default="json")
+    parser.add_argument("--restart", action="store_true", help="ignore part files of an earlier run")
+    args = parser.parse_args()
+
+    try:
+        stats = run(
+            args.day,
+            [r.strip() for r in args.reports.split(",") if r.strip()],
+            args.workers,
+            args.mode,
+            args.out_dir,
+            args.chunk_size,
+            args.export_format,
+            args.restart,
+        )
+    except ValidationError as e:
+        raise SystemExit(str(e))
+
+    print(
+        f"{stats.users_done} users in {stats.seconds:.1f} s "
+        f"({stats.users_skipped} already done, {stats.exports} exports) -> {stats.run_dir}"
+    )
+    for first, last, error in stats.failed:
+        print(f"  users {first}..{last} failed: {error}")
+    if stats.failed:
+        print("Rerun the same command to retry the failed chunks.")
+        raise SystemExit(1)
+    print(f"Merged report: {stats.merged}")
+
+
+if __name__ == "__main__":
+    main()
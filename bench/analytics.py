@@ -0,0 +1,138 @@
+# bench/analytics.py
+# Vectorised analytics versus the same statistics computed with per-row Python
+# loops, on synthetic multi-year histories (no database needed). --user also
+# times load_history + report() for a real user.
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import analytics
+
+EXERCISES = 12
+
+
+def synthetic_history(years: int, seed: int) -> analytics.History:
+    # 2-4 meals a day and a workout on ~4 days a week with 20 single-set rows.
+    rng = np.random.default_rng(seed)
+    days = np.arange(19000, 19000 + 365 * years, dtype="i4")
+
+    meal_days = np.repeat(days, rng.integers(2, 5, days.size))
+    meals = np.zeros(meal_days.size, analytics._MEALS_DTYPE)
+    meals["day"] = meal_days
+    meals["calories"] = rng.normal(650, 150, meal_days.size).clip(50)
+    meals["protein_g"] = rng.normal(40, 10, meal_days.size).clip(0)
+    meals["carbs_g"] = rng.normal(70, 20, meal_days.size).clip(0)
+    meals["fats_g"] = rng.normal(22, 6, meal_days.size).clip(0)
+
+    workout_days = days[rng.random(days.size) < 4 / 7]
+    workouts = np.zeros(workout_days.size, analytics._WORKOUTS_DTYPE)
+    workouts["day"] = workout_days
+    workouts["calories_out"] = rng.normal(400, 80, workout_days.size).clip(0)
+
+    set_days = np.repeat(workout_days, 5 * 4)
+    sets = np.zeros(set_days.size, analytics._SETS_DTYPE)
+    sets["day"] = set_days
+    sets["exercise_id"] = rng.integers(1, EXERCISES + 1, set_days.size)
+    sets["sets"] = 1
+    sets["reps"] = rng.integers(3, 13, set_days.size)
+    progress = (set_days - days[0]) / days.size  # slow strength gains
+    sets["weight"] = np.round(rng.normal(60, 10, set_days.size) * (1 + 0.5 * progress), 1).clip(0)
+    return analytics.History(meals=meals, workouts=workouts, sets=sets)
+
+
+def loop_statistics(history: analytics.History, window: int, targets: dict):
+    # Reference implementation: dicts and per-row loops over tuples.
+    meals = history.meals.tolist()
+    workouts = history.workouts.tolist()
+    sets = history.sets.tolist()
+
+    per_day = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0, 0.0, 0])
+    for day, cal, protein, carbs, fats in meals:
+        d = per_day[day]
+        d[0] += cal
+        d[1] += protein
+        d[2] += carbs
+        d[3] += fats
+        d[5] += 1
+    for day, out in workouts:
+        per_day[day][4] += out
+    first, last = min(per_day), max(per_day)
+
+    rolling = []
+    for day in range(first, last + 1):
+        values = [per_day[d][0] for d in range(day - window + 1, day + 1) if d in per_day and per_day[d][5]]
+        rolling.append(sum(values) / len(values) if values else None)
+
+    volume = defaultdict(float)
+    best = defaultdict(float)
+    for exercise_id, day, n_sets, reps, weight in sets:
+        volume[(exercise_id, day)] += n_sets * reps * weight
+        est = weight if reps == 1 else weight * (1 + reps / 30) if reps > 0 else 0.0
+        best[exercise_id] = max(best[exercise_id], est)
+
+    hits = {}
+    for macro, target in targets.items():
+        column = analytics.MACROS.index(macro)
+        ratios = [d[column] / target for d in per_day.values() if d[5]]
+        hits[macro] = sum(abs(r - 1) <= analytics.ADHERENCE_TOLERANCE for r in ratios) / len(ratios)
+    return rolling, volume, best, hits
+
+
+def vector_statistics(history: analytics.History, window: int, targets: dict):
+    series = analytics.daily_series(history)
+    rolling = analytics.rolling_mean(series.calories_in, series.meal_days, window)
+    progress = analytics.exercise_progress(history)
+    hits = analytics.macro_adherence(series, targets)
+    return rolling, progress, hits
+
+
+def _time(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised vs per-row analytics")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--window", type=int, default=analytics.ROLLING_WINDOW)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--user", type=int, help="also time report() for this user id")
+    args = parser.parse_args()
+
+    targets = {"calories": 2000.0, "protein_g": 120.0}
+
+    print(f"{'history':<10} {'meal rows':>10} {'set rows':>10} {'loops ms':>10} {'numpy ms':>10} {'speed-up':>9}")
+    for years in args.years:
+        history = synthetic_history(years, args.seed)
+        rolling, _, _ = vector_statistics(history, args.window, targets)
+        expected, _, _, _ = loop_statistics(history, args.window, targets)
+        assert np.allclose(rolling, np.array(expected, dtype=float), equal_nan=True)
+
+        loops = _time(loop_statistics, history, args.window, targets)
+        vector = _time(vector_statistics, history, args.window, targets)
+        print(
+            f"{years:>4} years {history.meals.size:>10} {history.sets.size:>10} "
+            f"{loops * 1000:>10.1f} {vector * 1000:>10.1f} {loops / vector:>8.1f}x"
+        )
+
+    if args.user is not None:
+        t = time.perf_counter()
+        history = analytics.load_history(args.user)
+        load_s = time.perf_counter() - t
+        t = time.perf_counter()
+        analytics.report(args.user, targets=targets)
+        print(
+            f"\nuser {args.user}: load_history {load_s * 1000:.0f} ms "
+            f"({history.meals.size + history.workouts.size + history.sets.size} rows), "
+            f"report {(time.perf_counter() - t) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
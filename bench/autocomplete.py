@@ -0,0 +1,88 @@
+# bench/autocomplete.py
+# Build time, memory and query latency of the in-memory autocomplete index on a
+# generated catalog (no database needed).
+import argparse
+import random
+import time
+import tracemalloc
+
+from autocomplete import NameIndex
+from bench.catalog_search import ADJECTIVES, BRANDS, NOUNS
+from bench.common import latency_row, print_latency_table
+
+# Extra vocabulary so the word index looks more like a real nutrition database.
+SYLLABLES = ["ba", "co", "di", "fe", "go", "ka", "li", "mo", "nu", "pa", "ri", "so", "ta", "vi", "zu"]
+
+
+def generate(n: int, seed: int):
+    rng = random.Random(seed)
+    coined = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(20000)]
+    for i in range(n):
+        words = [rng.choice(NOUNS), rng.choice(ADJECTIVES), rng.choice(coined).capitalize(), rng.choice(BRANDS)]
+        yield i + 1, " ".join(words[: rng.randint(2, 4)]) + f" {i}"
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:]
+
+
+def _time(label: str, index: NameIndex, queries, k: int) -> dict:
+    samples = []
+    start = time.perf_counter()
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q, k)
+        samples.append(time.perf_counter() - t)
+    return latency_row(label, samples, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autocomplete index build and query latency")
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--memory", action="store_true", help="trace memory during the build (much slower)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = NameIndex()
+    if args.memory:
+        tracemalloc.start()
+    t = time.perf_counter()
+    index.build(generate(args.entries, args.seed))
+    build_s = time.perf_counter() - t
+    memory = ""
+    if args.memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = f" ({current / 2**20:.0f} MiB retained, {peak / 2**20:.0f} MiB peak)"
+    print(f"Built index over {len(index)} names in {build_s:.1f} s{memory}\n")
+
+    n, k = args.queries, args.k
+    words = NOUNS + ADJECTIVES
+    rows = [
+        _time("prefix, 2-4 chars", index, [rng.choice(words).lower()[: rng.randint(2, 4)] for _ in range(n)], k),
+        _time("prefix, full word", index, [rng.choice(words).lower() for _ in range(n)], k),
+        _time(
+            "two words",
+            index,
+            [f"{rng.choice(NOUNS)[:4]} {rng.choice(ADJECTIVES)[:3]}" for _ in range(n)],
+            k,
+        ),
+        _time("typo (fuzzy fallback)", index, [_typo(rng.choice(NOUNS).lower(), rng) for _ in range(n)], k),
+    ]
+
+    samples = []
+    start = time.perf_counter()
+    for i in range(min(n, 5000)):
+        t = time.perf_counter()
+        index.add(args.entries + i + 1, f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} New {i}")
+        samples.append(time.perf_counter() - t)
+    rows.append(latency_row("incremental insert", samples, time.perf_counter() - start))
+    print_latency_table(rows)
+
+
+if __name__ == "__main__":
+    main()
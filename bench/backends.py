@@ -0,0 +1,167 @@
+# bench/backends.py
+# Latency of every app.py menu operation on Postgres versus the embedded SQLite
+# backend. Each backend gets the same temporary user with --days of seeded
+# history (three meals a day, a workout every other day); the user is deleted
+# from Postgres afterwards and the SQLite file lives in a temporary directory.
+# Logins hash inline (passwords.HASH_WORKERS = 0) so both sides pay the same KDF.
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+import analytics
+import catalog
+import db
+import passwords
+import services
+from bench.common import latency_row
+from models import MealSearch, WorkoutSearch
+
+EMAIL = "backends@bench.test"
+PASSWORD = "backend bench"
+FOODS = ("Chicken Breast", "White Rice", "Olive Oil")          # sample data in both schemas
+EXERCISES = ("Bench Press", "Squat", "Running")
+MEAL_TYPES = ("Breakfast", "Lunch", "Dinner")
+
+
+@dataclass
+class Context:
+    user_id: int
+    day: date
+    foods: List[int]
+    exercises: List[int]
+    export_path: str
+    workouts: List[int] = field(default_factory=list)   # created by add_workout, removed by delete_workout
+    meals: List[int] = field(default_factory=list)
+
+
+def _seed(days: int, end: date, export_path: str) -> Context:
+    user_id = services.register_user("Backend Bench", EMAIL, PASSWORD, 30, "X", 175, 70)
+    foods = [services.search_foods(name, limit=1).items[0].id for name in FOODS]
+    exercises = [services.search_exercises(name, limit=1).items[0].id for name in EXERCISES]
+    for n in range(days):
+        day = end - timedelta(days=n)
+        for k, meal_type in enumerate(MEAL_TYPES):
+            services.log_meal(user_id, meal_type, [(foods[k], 1 + n % 3), (foods[(k + 1) % 3], 0.5)], day)
+        if n % 2 == 0:
+            services.log_workout(
+                user_id, "Strength", [(exercises[0], 4, 8, 60 + n % 20), (exercises[1], 3, 10, 80)], 45, "Hard", 320, day
+            )
+    return Context(user_id, end, foods, exercises, export_path)
+
+
+def _add_workout(ctx: Context, i: int):
+    w = services.log_workout(ctx.user_id, "Bench", [(ctx.exercises[0], 3, 10, 50)], 40, "Hard", 300, ctx.day)
+    ctx.workouts.append(w.id)
+
+
+def _add_meal(ctx: Context, i: int):
+    m = services.log_meal(ctx.user_id, "Snack", [(ctx.foods[0], 1), (ctx.foods[1], 2)], ctx.day)
+    ctx.meals.append(m.id)
+
+
+# (menu label, call); run in this order, each --repeat times.
+OPERATIONS: List[tuple] = [
+    ("login", lambda ctx, i: services.authenticate(EMAIL, PASSWORD)),
+    ("add workout", _add_workout),
+    ("add exercise to workout", lambda ctx, i: services.add_exercise_to_workout(
+        ctx.user_id, ctx.workouts[i % len(ctx.workouts)], ctx.exercises[2], 3, 8 + i % 4, 20)),
+    ("update workout", lambda ctx, i: services.update_workout(
+        ctx.user_id, ctx.workouts[i % len(ctx.workouts)], duration_min=30 + i % 10)),
+    ("search workouts (type)", lambda ctx, i: services.search_workouts(ctx.user_id, WorkoutSearch(workout_type="bench"))),
+    ("search workouts (range)", lambda ctx, i: services.search_workouts(
+        ctx.user_id, WorkoutSearch(start=ctx.day - timedelta(days=30), end=ctx.day))),
+    ("add meal", _add_meal),
+    ("add food to meal", lambda ctx, i: services.add_food_to_meal(
+        ctx.user_id, ctx.meals[i % len(ctx.meals)], ctx.foods[2], 1 + i % 3)),
+    ("update meal", lambda ctx, i: services.update_meal(
+        ctx.user_id, ctx.meals[i % len(ctx.meals)], meal_type=MEAL_TYPES[i % 3])),
+    ("search meals (food)", lambda ctx, i: services.search_meals(ctx.user_id, MealSearch(food_name="rice"))),
+    ("search meals (date)", lambda ctx, i: services.search_meals(
+        ctx.user_id, MealSearch(meal_date=ctx.day - timedelta(days=i % 30)))),
+    ("list exercises", lambda ctx, i: services.browse_exercises(limit=20)),
+    ("list foods (prefix search)", lambda ctx, i: services.search_foods("chi", limit=20)),
+    ("daily report", lambda ctx, i: services.compute_daily_report(ctx.user_id, ctx.day - timedelta(days=i % 30))),
+    ("weekly report", lambda ctx, i: services.compute_weekly_report(ctx.user_id, ctx.day)),
+    ("trend report (month)", lambda ctx, i: services.compute_trend_report(
+        ctx.user_id, ctx.day - timedelta(days=180), ctx.day, "month")),
+    ("analytics", lambda ctx, i: analytics.report(ctx.user_id, targets={"protein_g": 120})),
+    ("export data", lambda ctx, i: services.export_to_file(ctx.user_id, ctx.export_path)),
+    ("delete workout", lambda ctx, i: services.delete_workout(ctx.user_id, ctx.workouts.pop())),
+    ("delete meal", lambda ctx, i: services.delete_meal(ctx.user_id, ctx.meals.pop())),
+]
+
+
+def _measure(ctx: Context, run: Callable, repeat: int) -> dict:
+    samples = []
+    started = time.perf_counter()
+    for i in range(repeat):
+        t = time.perf_counter()
+        run(ctx, i)
+        samples.append(time.perf_counter() - t)
+    return latency_row("", samples, time.perf_counter() - started)
+
+
+def _delete_user(user_id: int):
+    with db.get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE id = %s;", (user_id,))
+        conn.commit()
+
+
+def run_backend(name: str, sqlite_path: str, days: int, repeat: int, end: date, workdir: str) -> Dict[str, dict]:
+    db.configure_backend(name, sqlite_path)
+    catalog.invalidate_all()  # cached catalog rows belong to the previous backend
+    with db.get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE id IN (SELECT user_id FROM user_profiles WHERE email = %s);", (EMAIL,))
+        conn.commit()
+
+    started = time.perf_counter()
+    ctx = _seed(days, end, os.path.join(workdir, f"export_{name}.json"))
+    print(f"{name}: seeded {days} days in {time.perf_counter() - started:.1f}s")
+    try:
+        return {label: _measure(ctx, run, repeat) for label, run in OPERATIONS}
+    finally:
+        _delete_user(ctx.user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Menu operation latency: Postgres vs embedded SQLite")
+    parser.add_argument("--backends", default=",".join(db.BACKENDS), help="comma-separated, in run order")
+    parser.add_argument("--days", type=int, default=120, help="days of seeded history")
+    parser.add_argument("--repeat", type=int, default=30, help="calls per operation")
+    parser.add_argument("--sqlite-path", help="SQLite file to use (default: a fresh temporary one)")
+    args = parser.parse_args()
+    backends = args.backends.split(",")
+
+    passwords.HASH_WORKERS = 0
+    workdir = tempfile.mkdtemp(prefix="bench_backends_")
+    sqlite_path = args.sqlite_path or os.path.join(workdir, "fitness_tracker.db")
+    end = date.today()
+    try:
+        results = {b: run_backend(b, sqlite_path, args.days, args.repeat, end, workdir) for b in backends}
+    finally:
+        db.close_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{args.repeat} calls per operation, {args.days} days of history; milliseconds")
+    header = f"{'operation':<28}" + "".join(f" {b + ' p50':>14} {b + ' p95':>14}" for b in backends)
+    if len(backends) == 2:
+        header += f" {'p50 ratio':>10}"
+    print(header)
+    for label, _ in OPERATIONS:
+        line = f"{label:<28}"
+        for b in backends:
+            r = results[b][label]
+            line += f" {r['p50_ms']:>14.2f} {r['p95_ms']:>14.2f}"
+        if len(backends) == 2:
+            first, second = (results[b][label]["p50_ms"] for b in backends)
+            line += f" {second / first:>10.2f}" if first else f" {'-':>10}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench/batch_logging.py
+# Logging a meal with N foods (and a workout with N exercises) through the
+# per-item flow (create, then one add_* call per item) versus the batch
+# log_meal/log_workout calls. Rows are written on a far-future date for the first
+# user and deleted afterwards.
+import argparse
+import random
+import time
+from datetime import date
+
+import catalog
+import services
+import summaries
+from bench.common import latency_row, print_latency_table, sample_user_ids
+from db import get_connection
+
+BENCH_DATE = date(2099, 1, 1)
+
+
+def _time(label: str, fn, n: int) -> dict:
+    samples = []
+    start = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return latency_row(label, samples, time.perf_counter() - start)
+
+
+def cleanup(user_id: int):
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM meal_logs WHERE user_id = %s AND meal_date = %s;", (user_id, BENCH_DATE))
+        cur.execute("DELETE FROM workout_logs WHERE user_id = %s AND workout_date = %s;", (user_id, BENCH_DATE))
+        cur.execute("DELETE FROM daily_summaries WHERE user_id = %s AND day = %s;", (user_id, BENCH_DATE))
+        summaries.refresh_rollups(cur, [(user_id, BENCH_DATE)])
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-item vs batch meal/workout logging")
+    parser.add_argument("--requests", type=int, default=100, help="meals/workouts logged per flow")
+    parser.add_argument("--items", type=int, default=8, help="foods per meal / exercises per workout")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    user_ids = sample_user_ids(1)
+    if not user_ids:
+        raise SystemExit("No users in the database; run datagen or register one first.")
+    user_id = user_ids[0]
+    rng = random.Random(args.seed)
+    food_ids = [f.id for f in catalog.foods.all()]
+    exercise_ids = [e.id for e in catalog.exercises.all()]
+    if len(food_ids) < args.items or len(exercise_ids) < args.items:
+        raise SystemExit(f"Need at least {args.items} foods and exercises in the catalog.")
+
+    def meal_items():
+        return [(fid, rng.choice((0.5, 1, 1.5, 2))) for fid in rng.sample(food_ids, args.items)]
+
+    def workout_items():
+        return [(eid, 3, rng.randint(5, 12), rng.randint(10, 100)) for eid in rng.sample(exercise_ids, args.items)]
+
+    def meal_per_item():
+        meal = services.create_meal(user_id, "Bench", BENCH_DATE)
+        for food_id, quantity in meal_items():
+            services.add_food_to_meal(user_id, meal.id, food_id, quantity)
+
+    def workout_per_item():
+        workout = services.create_workout(user_id, "Bench", 45, "Moderate", 300, BENCH_DATE)
+        for exercise_id, sets, reps, weight in workout_items():
+            services.add_exercise_to_workout(user_id, workout.id, exercise_id, sets, reps, weight)
+
+    n = args.requests
+    try:
+        rows = [
+            _time(f"meal, {args.items} foods, per item", meal_per_item, n),
+            _time(
+                f"meal, {args.items} foods, batch",
+                lambda: services.log_meal(user_id, "Bench", meal_items(), BENCH_DATE),
+                n,
+            ),
+            _time(f"workout, {args.items} ex., per item", workout_per_item, n),
+            _time(
+                f"workout, {args.items} ex., batch",
+                lambda: services.log_workout(user_id, "Bench", workout_items(), 45, "Moderate", 300, BENCH_DATE),
+                n,
+            ),
+        ]
+        print_latency_table(rows)
+    finally:
+        cleanup(user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# bench/catalog_search.py
+# Catalog listing/search latency on a large foods table. Loads --rows generated
+# foods with COPY (removed again afterwards unless --keep), then compares the old
+# full listing and OFFSET paging with keyset pages, prefix search and fuzzy search.
+import argparse
+import random
+import time
+
+from psycopg2.extras import DictCursor
+
+import services
+from bench.common import latency_row, print_latency_table
+from bulk_import import copy_rows
+from db import get_connection
+
+ADJECTIVES = [
+    "Baked", "Boiled", "Braised", "Crispy", "Dried", "Fresh", "Fried", "Frozen", "Grilled",
+    "Low-Fat", "Organic", "Pickled", "Raw", "Roasted", "Salted", "Smoked", "Spicy", "Steamed",
+    "Sweet", "Whole",
+]
+NOUNS = [
+    "Almonds", "Apple", "Bagel", "Banana", "Beans", "Beef", "Broccoli", "Butter", "Carrot",
+    "Cheddar", "Chicken", "Chickpeas", "Cod", "Couscous", "Egg", "Granola", "Ham", "Hummus",
+    "Lentils", "Mackerel", "Milk", "Oats", "Pasta", "Peanuts", "Pork", "Potato", "Quinoa",
+    "Rice", "Salmon", "Spinach", "Tofu", "Tuna", "Turkey", "Yogurt",
+]
+BRANDS = ["Acme", "Brookside", "Coastal", "Daily", "Evergreen", "Farmhouse", "Golden", "Harvest"]
+
+
+def _food_rows(n: int, rng: random.Random):
+    for i in range(n):
+        name = f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {rng.choice(BRANDS)} {i:07d}"
+        yield (name, "100g", rng.randint(20, 600), rng.randint(0, 40), rng.randint(0, 80), rng.randint(0, 40))
+
+
+def load(n: int, seed: int) -> int:
+    # Returns the first id of the generated rows.
+    rng = random.Random(seed)
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM foods;")
+        first_id = cur.fetchone()[0]
+        copy_rows(
+            cur,
+            "foods",
+            ["food_name", "serving_size", "calories_per_serv", "protein_g", "carbs_g", "fats_g"],
+            _food_rows(n, rng),
+        )
+        conn.commit()
+        cur.execute("ANALYZE foods;")
+        conn.commit()
+    return first_id
+
+
+def cleanup(first_id: int):
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM foods WHERE id >= %s;", (first_id,))
+        conn.commit()
+
+
+def _time(label: str, fn, args_list) -> dict:
+    samples = []
+    start = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t)
+    return latency_row(label, samples, time.perf_counter() - start)
+
+
+def _full_listing():
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            "SELECT id, food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g "
+            "FROM foods ORDER BY id;"
+        )
+        cur.fetchall()
+
+
+def _offset_page(offset: int, limit: int):
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            "SELECT id, food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g "
+            "FROM foods ORDER BY id OFFSET %s LIMIT %s;",
+            (offset, limit),
+        )
+        cur.fetchall()
+
+
+def _prefix_two_pages(term: str, limit: int):
+    page = services.search_foods(term, limit=limit)
+    if page.next_cursor:
+        services.search_foods(term, after=page.next_cursor, limit=limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog listing/search latency on a large foods table")
+    parser.add_argument("--rows", type=int, default=100_000, help="generated foods to load")
+    parser.add_argument("--requests", type=int, default=200, help="samples per operation")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--keep", action="store_true", help="keep the generated foods")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    t = time.perf_counter()
+    first_id = load(args.rows, args.seed)
+    print(f"Loaded {args.rows} foods in {time.perf_counter() - t:.1f} s\n")
+
+    try:
+        n, limit = args.requests, args.page_size
+        last_id = first_id + args.rows - 1
+        afters = [(str(rng.randint(first_id, last_id)), limit) for _ in range(n)]
+        offsets = [(rng.randint(0, args.rows), limit) for _ in range(n)]
+        prefixes = [(rng.choice(NOUNS)[: rng.randint(2, 5)], limit) for _ in range(n)]
+        fuzzy_terms = [(rng.choice(NOUNS).lower()[:-1] + " " + rng.choice(ADJECTIVES).lower(),) for _ in range(n)]
+
+        rows = [
+            _time("full listing (old list_foods)", _full_listing, [()] * min(n, 5)),
+            _time("OFFSET page (random depth)", _offset_page, offsets),
+            _time("keyset page (random depth)", lambda a, l: services.browse_foods(a, l), afters),
+            _time("prefix search, 2 pages", _prefix_two_pages, prefixes),
+        ]
+        try:
+            rows.append(_time("fuzzy search (pg_trgm)", lambda q: services.search_foods(q, fuzzy=True), fuzzy_terms))
+        except Exception as e:
+            print(f"fuzzy search skipped: {str(e).strip().splitlines()[0]}\n")
+        print_latency_table(rows)
+    finally:
+        if not args.keep:
+            cleanup(first_id)
+
+
+if __name__ == "__main__":
+    main()
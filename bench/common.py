@@ -0,0 +1,45 @@
+# bench/common.py
+# Small helpers shared by the benchmark scripts. Run scripts from the repo root,
+# e.g. `python -m bench.report_latency`.
+import math
+from typing import List, Sequence
+
+from psycopg2.extras import DictCursor
+
+from db import get_connection
+
+
+def percentile(samples: Sequence[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def latency_row(label: str, samples: Sequence[float], elapsed: float) -> dict:
+    n = len(samples)
+    return {
+        "label": label,
+        "n": n,
+        "mean_ms": (sum(samples) / n * 1000) if n else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "ops_per_s": n / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_latency_table(rows: List[dict]):
+    print(f"{'operation':<32} {'n':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10}")
+    for r in rows:
+        print(
+            f"{r['label']:<32} {r['n']:>7} {r['mean_ms']:>9.2f} {r['p50_ms']:>9.2f} "
+            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['ops_per_s']:>10.1f}"
+        )
+
+
+def sample_user_ids(limit: int) -> List[int]:
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute("SELECT id FROM users ORDER BY id LIMIT %s;", (limit,))
+        return [r["id"] for r in cur.fetchall()]
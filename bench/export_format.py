@@ -0,0 +1,123 @@
+# bench/export_format.py
+# Size and serialisation time of the export layouts on a generated history,
+# without a database: the legacy in-memory dump (json.dump, indent=2), the flat
+# streaming layout and the nested layout, as JSON and NDJSON.
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from exporter import write_export
+
+WORKOUT_TYPES = ["Upper Body", "Lower Body", "Cardio", "Full Body", "Mobility"]
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+
+
+def generate(days: int, exercises_per_workout: int, foods_per_meal: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    workouts, workout_exercises, meals, meal_foods = [], [], [], []
+    nested_workouts, nested_meals = [], []
+
+    for d in range(days):
+        day = start + timedelta(days=d)
+        w = {
+            "id": len(workouts) + 1,
+            "user_id": 1,
+            "workout_type": rng.choice(WORKOUT_TYPES),
+            "duration_min": Decimal(rng.randint(20, 90)).quantize(Decimal("0.01")),
+            "intensity": rng.choice(["Light", "Moderate", "Hard"]),
+            "calories_burned": Decimal(rng.randint(150, 900)).quantize(Decimal("0.01")),
+            "workout_date": day,
+        }
+        workouts.append(w)
+        children = []
+        for e in range(exercises_per_workout):
+            child = {
+                "exercise_id": e + 1,
+                "sets": rng.randint(2, 5),
+                "reps": rng.randint(3, 12),
+                "weight_used_kg": Decimal(rng.randint(10, 140)).quantize(Decimal("0.01")),
+            }
+            workout_exercises.append({**w, **child})
+            children.append({**child, "exercise_name": f"Exercise {e + 1}"})
+        nested_workouts.append({k: v for k, v in w.items() if k != "user_id"} | {"exercises": children})
+
+        for meal_type in MEAL_TYPES:
+            m = {
+                "id": len(meals) + 1,
+                "user_id": 1,
+                "meal_type": meal_type,
+                "calories": Decimal(rng.randint(100, 900)).quantize(Decimal("0.01")),
+                "protein_g": Decimal(rng.randint(0, 60)).quantize(Decimal("0.01")),
+                "carbs_g": Decimal(rng.randint(0, 120)).quantize(Decimal("0.01")),
+                "fats_g": Decimal(rng.randint(0, 50)).quantize(Decimal("0.01")),
+                "meal_date": day,
+            }
+            meals.append(m)
+            children = []
+            for f in range(foods_per_meal):
+                child = {"food_id": f + 1, "quantity": Decimal(rng.randint(1, 4)).quantize(Decimal("0.001"))}
+                meal_foods.append({**m, **child})
+                children.append({**child, "food_name": f"Food {f + 1}"})
+            nested_meals.append({k: v for k, v in m.items() if k != "user_id"} | {"foods": children})
+
+    flat = [
+        ("workouts", workouts),
+        ("workout_exercises", workout_exercises),
+        ("meals", meals),
+        ("meal_foods", meal_foods),
+    ]
+    nested = [("workouts", nested_workouts), ("meals", nested_meals)]
+    return flat, nested
+
+
+def _measure(label, write):
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        t0 = time.perf_counter()
+        with open(path, "w", encoding="utf-8") as f:
+            write(f)
+        elapsed = time.perf_counter() - t0
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    print(f"{label:<34} {size / 1e6:>10.2f} MB {elapsed:>9.3f} s")
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare export layouts on generated data")
+    parser.add_argument("--days", type=int, default=3 * 365 * 4, help="days of history (one workout, four meals a day)")
+    parser.add_argument("--exercises", type=int, default=5, help="exercises per workout")
+    parser.add_argument("--foods", type=int, default=4, help="foods per meal")
+    args = parser.parse_args()
+
+    flat, nested = generate(args.days, args.exercises, args.foods)
+    header = {"user_id": 1, "since": None}
+    nested_header = {"format": "fitness-tracker-export", "version": 2, "user_id": 1, "since": None}
+    rows = sum(len(r) for _, r in flat)
+    print(f"{args.days} days, {rows} flat rows\n")
+    print(f"{'layout':<34} {'size':>13} {'time':>11}")
+
+    base_size, base_time = _measure(
+        "legacy (in-memory, indent=2)",
+        lambda f: json.dump({**header, **dict(flat)}, f, default=str, indent=2),
+    )
+    results = [
+        _measure("flat streaming json", lambda f: write_export(f, "json", header, flat, "flat")),
+        _measure("nested json", lambda f: write_export(f, "json", nested_header, nested, "nested")),
+        _measure("nested ndjson", lambda f: write_export(f, "ndjson", nested_header, nested, "nested")),
+    ]
+    print("")
+    for (size, elapsed), label in zip(results, ["flat streaming json", "nested json", "nested ndjson"]):
+        print(f"{label:<34} {size / base_size:>8.2f}x size {elapsed / base_time:>8.2f}x time vs legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# bench/loadtest.py
+# Concurrent virtual users replaying a weighted mix of the logged-in menu actions
+# (logging, searching, editing, catalog lookups and reports) against users made
+# by datagen.py, calling the service layer in-process from one thread per
+# virtual user. Reports p50/p95/p99 per operation. Meals and workouts created
+# during the run are deleted at the end.
+#
+#   python datagen.py generate --users 1000 --years 2
+#   python -m bench.loadtest --vus 32 --duration 60
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import catalog
+import db
+import services
+from bench.common import latency_row, print_latency_table
+from datagen import DATAGEN_DOMAIN, DATAGEN_PASSWORD, INTENSITIES, MEAL_TYPES, WORKOUT_TYPES
+from db import get_connection
+from models import MealSearch, WorkoutSearch
+
+RECENT_DAYS = 60  # reads and new logs fall within this many days of today
+
+
+@dataclass
+class VirtualUser:
+    rng: random.Random
+    user_id: int = 0
+    meals: Dict[int, set] = field(default_factory=dict)     # meal id -> food ids
+    workouts: Dict[int, set] = field(default_factory=dict)  # workout id -> exercise ids
+    samples: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def recent_day(self) -> date:
+        return date.today() - timedelta(days=self.rng.randrange(RECENT_DAYS))
+
+
+@dataclass
+class Operation:
+    name: str
+    weight: float
+    run: Callable[[VirtualUser, "Catalog"], None]
+    needs: Optional[str] = None  # "meal" / "workout": only when the VU has created one
+
+
+@dataclass
+class Catalog:
+    food_ids: List[int]
+    food_names: List[str]
+    exercise_ids: List[int]
+
+
+def _log_meal(vu: VirtualUser, cat: Catalog):
+    foods = [(f, vu.rng.choice((0.5, 1, 1.5, 2))) for f in vu.rng.sample(cat.food_ids, vu.rng.randint(1, 4))]
+    meal = services.log_meal(vu.user_id, vu.rng.choice(MEAL_TYPES), foods, date.today())
+    vu.meals[meal.id] = {f for f, _ in foods}
+
+
+def _add_food_to_meal(vu: VirtualUser, cat: Catalog):
+    meal_id = vu.rng.choice(list(vu.meals))
+    food_id = vu.rng.choice(cat.food_ids)
+    if food_id not in vu.meals[meal_id]:
+        services.add_food_to_meal(vu.user_id, meal_id, food_id, 1.0)
+        vu.meals[meal_id].add(food_id)
+
+
+def _update_meal(vu: VirtualUser, cat: Catalog):
+    services.update_meal(vu.user_id, vu.rng.choice(list(vu.meals)), meal_type=vu.rng.choice(MEAL_TYPES))
+
+
+def _delete_meal(vu: VirtualUser, cat: Catalog):
+    meal_id = vu.rng.choice(list(vu.meals))
+    services.delete_meal(vu.user_id, meal_id)
+    del vu.meals[meal_id]
+
+
+def _search_meals(vu: VirtualUser, cat: Catalog):
+    if vu.rng.random() < 0.7:
+        services.search_meals(vu.user_id, MealSearch(meal_date=vu.recent_day()))
+    else:
+        services.search_meals(vu.user_id, MealSearch(food_name=vu.rng.choice(cat.food_names).split()[-1]))
+
+
+def _log_workout(vu: VirtualUser, cat: Catalog):
+    exercises = [
+        (e, vu.rng.randint(3, 5), vu.rng.randint(5, 12), vu.rng.randint(4, 40) * 2.5)
+        for e in vu.rng.sample(cat.exercise_ids, min(len(cat.exercise_ids), vu.rng.randint(1, 5)))
+    ]
+    workout = services.log_workout(
+        vu.user_id, vu.rng.choice(WORKOUT_TYPES), exercises, vu.rng.randint(20, 90),
+        vu.rng.choice(INTENSITIES), vu.rng.randint(100, 700), date.today(),
+    )
+    vu.workouts[workout.id] = {e[0] for e in exercises}
+
+
+def _add_exercise(vu: VirtualUser, cat: Catalog):
+    workout_id = vu.rng.choice(list(vu.workouts))
+    exercise_id = vu.rng.choice(cat.exercise_ids)
+    if exercise_id not in vu.workouts[workout_id]:
+        services.add_exercise_to_workout(vu.user_id, workout_id, exercise_id, 3, 10, 40.0)
+        vu.workouts[workout_id].add(exercise_id)
+
+
+def _update_workout(vu: VirtualUser, cat: Catalog):
+    services.update_workout(vu.user_id, vu.rng.choice(list(vu.workouts)), duration_min=vu.rng.randint(20, 90))
+
+
+def _delete_workout(vu: VirtualUser, cat: Catalog):
+    workout_id = vu.rng.choice(list(vu.workouts))
+    services.delete_workout(vu.user_id, workout_id)
+    del vu.workouts[workout_id]
+
+
+def _search_workouts(vu: VirtualUser, cat: Catalog):
+    end = vu.recent_day()
+    services.search_workouts(vu.user_id, WorkoutSearch(start=end - timedelta(days=30), end=end))
+
+
+def _suggest_foods(vu: VirtualUser, cat: Catalog):
+    name = vu.rng.choice(cat.food_names)
+    services.suggest_foods(name[: vu.rng.randint(2, 6)])
+
+
+def _search_foods(vu: VirtualUser, cat: Catalog):
+    services.search_foods(vu.rng.choice(cat.food_names)[:3])
+
+
+def _browse(pages: Callable):
+    def run(vu: VirtualUser, cat: Catalog):
+        page = pages()
+        for _ in range(vu.rng.randint(0, 3)):
+            if not page.next_cursor:
+                break
+            page = pages(page.next_cursor)
+    return run
+
+
+OPERATIONS = [
+    Operation("daily report", 15, lambda vu, cat: services.compute_daily_report(vu.user_id, vu.recent_day())),
+    Operation("weekly report", 6, lambda vu, cat: services.compute_weekly_report(vu.user_id, vu.recent_day())),
+    Operation(
+        "trend report (month, 1y)", 2,
+        lambda vu, cat: services.compute_trend_report(vu.user_id, date.today() - timedelta(days=365), None, "month"),
+    ),
+    Operation("export user data", 0.5, lambda vu, cat: services.export_user_data(vu.user_id)),
+    Operation("log meal", 15, _log_meal),
+    Operation("search meals", 10, _search_meals),
+    Operation("add food to meal", 8, _add_food_to_meal, "meal"),
+    Operation("update meal", 3, _update_meal, "meal"),
+    Operation("delete meal", 2, _delete_meal, "meal"),
+    Operation("log workout", 6, _log_workout),
+    Operation("search workouts", 8, _search_workouts),
+    Operation("add exercise to workout", 6, _add_exercise, "workout"),
+    Operation("update workout", 2, _update_workout, "workout"),
+    Operation("delete workout", 1, _delete_workout, "workout"),
+    Operation("suggest foods", 8, _suggest_foods),
+    Operation("search foods", 4, _search_foods),
+    Operation("browse foods", 5, _browse(lambda after=None: services.browse_foods(after))),
+    Operation("browse exercises", 3, _browse(lambda after=None: services.browse_exercises(after))),
+]
+
+
+def _pick(vu: VirtualUser) -> Operation:
+    available = [
+        op for op in OPERATIONS
+        if op.needs is None or (vu.meals if op.needs == "meal" else vu.workouts)
+    ]
+    return vu.rng.choices(available, weights=[op.weight for op in available])[0]
+
+
+def _virtual_user(vu: VirtualUser, email: str, cat: Catalog, deadline: float, ops: int, think_s: float):
+    t = time.perf_counter()
+    user = services.authenticate(email, DATAGEN_PASSWORD)
+    vu.samples["login"].append(time.perf_counter() - t)
+    if user is None:
+        vu.errors["login"] += 1
+        return
+    vu.user_id = user.id
+
+    done = 0
+    while done < ops and time.perf_counter() < deadline:
+        op = _pick(vu)
+        t = time.perf_counter()
+        try:
+            op.run(vu, cat)
+        except Exception:
+            vu.errors[op.name] += 1
+        else:
+            vu.samples[op.name].append(time.perf_counter() - t)
+        done += 1
+        if think_s:
+            time.sleep(vu.rng.expovariate(1 / think_s))
+
+
+def _cleanup(vus: List[VirtualUser]):
+    for vu in vus:
+        for meal_id in list(vu.meals):
+            services.delete_meal(vu.user_id, meal_id)
+        for workout_id in list(vu.workouts):
+            services.delete_workout(vu.user_id, workout_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent virtual users against datagen users")
+    parser.add_argument("--vus", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--ops", type=int, default=10**9, help="stop each VU after this many operations")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a VU's operations")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT email FROM user_profiles WHERE email LIKE %s ORDER BY user_id;", (f"%@{DATAGEN_DOMAIN}",))
+        emails = [r[0] for r in cur.fetchall()]
+    if not emails:
+        raise SystemExit("No generated users; run `python datagen.py generate` first.")
+    foods = catalog.foods.all()
+    cat = Catalog(
+        food_ids=[f.id for f in foods],
+        food_names=[f.food_name for f in foods],
+        exercise_ids=[e.id for e in catalog.exercises.all()],
+    )
+    if db.get_pool().max_size < args.vus:
+        db.configure_pool(max_size=args.vus)
+
+    rng = random.Random(args.seed)
+    vus = [VirtualUser(random.Random(f"{args.seed}/{i}")) for i in range(args.vus)]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(
+            target=_virtual_user,
+            args=(vu, rng.choice(emails), cat, deadline, args.ops, args.think_ms / 1000),
+            name=f"vu-{i}",
+        )
+        for i, vu in enumerate(vus)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        _cleanup(vus)
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for vu in vus:
+        for name, values in vu.samples.items():
+            samples[name].extend(values)
+        for name, n in vu.errors.items():
+            errors[name] += n
+    rows = [latency_row(name, samples[name], elapsed) for name in sorted(samples, key=lambda n: -len(samples[n]))]
+    rows.append(latency_row("all operations", [x for name, s in samples.items() if name != "login" for x in s], elapsed))
+    print(f"{args.vus} virtual users, {len(emails)} generated users, {elapsed:.1f} s\n")
+    print_latency_table(rows)
+    if errors:
+        print("\nerrors: " + ", ".join(f"{name} {n}" for name, n in sorted(errors.items())))
+
+
+if __name__ == "__main__":
+    main()
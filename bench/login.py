@@ -0,0 +1,87 @@
+# bench/login.py
+# Logins per second under concurrency: services.authenticate with scrypt on the
+# process pool (passwords.HASH_WORKERS) versus scrypt on the calling threads,
+# and the bearer-token lookup that replaces a login on every later request.
+# Temporary users are registered under @loginbench.test and deleted afterwards.
+import argparse
+import threading
+import time
+
+import passwords
+import services
+import sessions
+from bench.common import latency_row, print_latency_table
+from db import get_connection
+
+DOMAIN = "loginbench.test"
+PASSWORD = "correct horse battery staple"
+
+
+def _hammer(label: str, fn, threads: int, seconds: float) -> dict:
+    samples = [[] for _ in range(threads)]
+    deadline = time.perf_counter() + seconds
+
+    def worker(i: int):
+        n = 0
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            fn(i, n)
+            samples[i].append(time.perf_counter() - t)
+            n += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latency_row(f"{label}, {threads} threads", [s for per in samples for s in per], time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput: KDF pool vs inline vs session tokens")
+    parser.add_argument("--threads", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--seconds", type=float, default=5.0, help="per measurement")
+    parser.add_argument("--users", type=int, default=16)
+    args = parser.parse_args()
+    levels = [int(t) for t in args.threads.split(",")]
+
+    emails = [f"user{i}@{DOMAIN}" for i in range(args.users)]
+    for email in emails:
+        services.register_user("Login Bench", email, PASSWORD, 30, "X", 175, 70)
+    tokens = [sessions.login(email, PASSWORD).token for email in emails]
+
+    def login(i: int, n: int):
+        if services.authenticate(emails[(i + n) % len(emails)], PASSWORD) is None:
+            raise RuntimeError("login failed")
+
+    def resolve(i: int, n: int):
+        sessions.resolve(tokens[(i + n) % len(tokens)])
+
+    rows = []
+    try:
+        for threads in levels:
+            rows.append(_hammer(f"login, KDF pool ({passwords.HASH_WORKERS})", login, threads, args.seconds))
+        workers = passwords.HASH_WORKERS
+        passwords.shutdown()
+        passwords.HASH_WORKERS = 0
+        try:
+            for threads in levels:
+                rows.append(_hammer("login, KDF inline", login, threads, args.seconds))
+        finally:
+            passwords.HASH_WORKERS = workers
+        for threads in levels:
+            rows.append(_hammer("bearer token lookup", resolve, threads, args.seconds))
+        print_latency_table(rows)
+    finally:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM users WHERE id IN (SELECT user_id FROM user_profiles WHERE email LIKE %s);",
+                (f"%@{DOMAIN}",),
+            )
+            conn.commit()
+        passwords.shutdown()
+
+
+if __name__ == "__main__":
+    main()
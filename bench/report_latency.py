@@ -0,0 +1,76 @@
+# bench/report_latency.py
+# End-to-end latency of the daily report and export on the sync path (services,
+# one thread per in-flight request) versus the async path (async_services on one
+# event loop, independent queries gathered).
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import async_services
+import db
+import services
+from bench.common import latency_row, print_latency_table, sample_user_ids
+
+OPERATIONS = {
+    "daily_report": (services.compute_daily_report, async_services.compute_daily_report),
+    "export_user_data": (services.export_user_data, async_services.export_user_data),
+}
+
+
+def run_sync(fn, user_ids, concurrency):
+    def timed(user_id):
+        t0 = time.perf_counter()
+        fn(user_id)
+        return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        samples = list(ex.map(timed, user_ids))
+    return samples, time.perf_counter() - start
+
+
+async def run_async(fn, user_ids, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def timed(user_id):
+        async with sem:
+            t0 = time.perf_counter()
+            await fn(user_id)
+            return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(timed(u) for u in user_ids))
+    return list(samples), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async report latency")
+    parser.add_argument("--users", type=int, default=50, help="distinct users to report on")
+    parser.add_argument("--requests", type=int, default=500, help="reports per operation and path")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=16)
+    args = parser.parse_args()
+
+    db.configure_pool(min_size=min(db.POOL_MIN_SIZE, args.pool_size), max_size=args.pool_size)
+    users = sample_user_ids(args.users)
+    if not users:
+        raise SystemExit("No users in the database; load some data first.")
+    user_ids = [users[i % len(users)] for i in range(args.requests)]
+
+    rows = []
+    for name, (sync_fn, async_fn) in OPERATIONS.items():
+        sync_fn(user_ids[0])  # warm the pool
+        samples, elapsed = run_sync(sync_fn, user_ids, args.concurrency)
+        rows.append(latency_row(f"{name} (sync)", samples, elapsed))
+        samples, elapsed = asyncio.run(run_async(async_fn, user_ids, args.concurrency))
+        rows.append(latency_row(f"{name} (async)", samples, elapsed))
+
+    print(f"{args.requests} requests per row, concurrency {args.concurrency}, pool {args.pool_size}")
+    print_latency_table(rows)
+    async_services.shutdown_executor()
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
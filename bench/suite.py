@@ -0,0 +1,297 @@
+# bench/suite.py
+# Benchmark suite for the data-access functions at several data sizes. Each size
+# is a set of datagen users with that many years of history (generated once and
+# reused on later runs; --clean removes them). Per operation and size it records
+# wall time over --repeat calls, statements and rows per call (instrument.py)
+# and peak Python memory (tracemalloc), writes the results as JSON and, with
+# --baseline, flags regressions.
+#
+#   python -m bench.suite --sizes 0.25,1,3 --save-baseline bench_baseline.json
+#   python -m bench.suite --sizes 0.25,1,3 --baseline bench_baseline.json --threshold 0.15
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional
+
+import catalog
+import datagen
+import db
+import instrument
+import services
+from bench.common import percentile
+from db import get_connection
+from models import MealSearch, WorkoutSearch
+
+SUITE_SIZES = (0.25, 1.0, 3.0)   # years of history per user
+SUITE_USERS = 20                 # users generated per size
+SUITE_REPEAT = 30
+SUITE_THRESHOLD = 0.20           # relative increase that counts as a regression
+SUITE_MIN_DELTA_MS = 1.0         # smaller wall-time changes are noise, never regressions
+SUITE_WARMUP = 3
+SUITE_CATALOG = (2000, 150)      # foods, exercises the catalog is topped up to
+SUITE_OUT = "bench_results.json"
+
+
+# ---- operations -----------------------------------------------------------
+
+
+@dataclass
+class Context:
+    size: float
+    user_ids: List[int]
+    emails: List[str]
+    food_ids: List[int]
+    day: date
+
+
+@dataclass
+class Operation:
+    name: str
+    run: Callable[[Context, int], object]
+    # Optional per-call setup (untimed) whose result is passed to run/teardown.
+    setup: Optional[Callable[[Context, int], object]] = None
+    teardown: Optional[Callable[[Context, int, object], None]] = None
+
+
+def _meal_setup(ctx: Context, i: int):
+    return services.create_meal(ctx.user_ids[i % len(ctx.user_ids)], "Bench", ctx.day)
+
+
+def _meal_teardown(ctx: Context, i: int, meal):
+    services.delete_meal(meal.user_id, meal.id)
+
+
+def _recent(ctx: Context, i: int) -> date:
+    return ctx.day - timedelta(days=(i * 7) % 60)
+
+
+OPERATIONS = [
+    Operation("login", lambda ctx, i: services.authenticate(ctx.emails[i % len(ctx.emails)], datagen.DATAGEN_PASSWORD)),
+    Operation(
+        "search_workouts",
+        lambda ctx, i: services.search_workouts(
+            ctx.user_ids[i % len(ctx.user_ids)], WorkoutSearch(start=_recent(ctx, i) - timedelta(days=30), end=_recent(ctx, i))
+        ),
+    ),
+    Operation(
+        "search_meals",
+        lambda ctx, i: services.search_meals(ctx.user_ids[i % len(ctx.user_ids)], MealSearch(meal_date=_recent(ctx, i))),
+    ),
+    Operation("daily_report", lambda ctx, i: services.compute_daily_report(ctx.user_ids[i % len(ctx.user_ids)], _recent(ctx, i))),
+    Operation("weekly_report", lambda ctx, i: services.compute_weekly_report(ctx.user_ids[i % len(ctx.user_ids)], _recent(ctx, i))),
+    Operation("export_data", lambda ctx, i: services.export_user_data(ctx.user_ids[i % len(ctx.user_ids)])),
+    Operation(
+        "add_food_to_meal",
+        lambda ctx, i, meal: services.add_food_to_meal(meal.user_id, meal.id, ctx.food_ids[i % len(ctx.food_ids)], 1.5),
+        _meal_setup,
+        _meal_teardown,
+    ),
+]
+
+
+@dataclass
+class Result:
+    operation: str
+    size: float
+    n: int
+    p50_ms: float
+    p95_ms: float
+    min_ms: float
+    mean_ms: float
+    queries: float      # per call
+    rows: float         # per call
+    peak_kb: float      # tracemalloc peak of one call
+
+
+def _call(op: Operation, ctx: Context, i: int, traced: bool = False) -> tuple:
+    # (seconds, queries, rows, peak bytes) of one run; setup and teardown are
+    # outside the measured part.
+    state = op.setup(ctx, i) if op.setup else None
+    args = (ctx, i, state) if op.setup else (ctx, i)
+    before = instrument.totals()
+    peak = 0
+    if traced:
+        tracemalloc.start()
+    try:
+        t = time.perf_counter()
+        op.run(*args)
+        elapsed = time.perf_counter() - t
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if traced:
+            tracemalloc.stop()
+    after = instrument.totals()
+    queries, rows = after.statements - before.statements, after.rows - before.rows
+    if op.teardown:
+        op.teardown(ctx, i, state)
+    return elapsed, queries, rows, peak
+
+
+def measure(op: Operation, ctx: Context, repeat: int) -> Result:
+    for i in range(SUITE_WARMUP):  # warm caches, the pool and the server's buffers
+        _call(op, ctx, i)
+    runs = [_call(op, ctx, i) for i in range(repeat)]
+    samples = [r[0] for r in runs]
+    # tracemalloc slows everything down, so memory gets its own run.
+    peak = _call(op, ctx, 0, traced=True)[3]
+
+    return Result(
+        operation=op.name,
+        size=ctx.size,
+        n=repeat,
+        p50_ms=statistics.median(samples) * 1000,
+        p95_ms=percentile(samples, 95) * 1000,
+        min_ms=min(samples) * 1000,
+        mean_ms=statistics.fmean(samples) * 1000,
+        queries=sum(r[1] for r in runs) / repeat,
+        rows=sum(r[2] for r in runs) / repeat,
+        peak_kb=peak / 1024,
+    )
+
+
+# ---- data sizes -----------------------------------------------------------
+
+
+def _domain(size: float) -> str:
+    return f"suite-{size:g}y.{datagen.DATAGEN_DOMAIN}"
+
+
+def prepare(size: float, users: int, seed: int, day: date) -> Context:
+    domain = _domain(size)
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM user_profiles WHERE email LIKE %s;", (f"%@{domain}",))
+        existing = cur.fetchone()[0]
+        cur.execute("SELECT (SELECT COUNT(*) FROM foods), (SELECT COUNT(*) FROM exercises);")
+        foods, exercises = cur.fetchone()
+    if existing < users:
+        print(f"Generating {users - existing} users with {size:g} years of history ...", file=sys.stderr)
+        datagen.generate(
+            users - existing, size, seed,
+            foods=max(0, SUITE_CATALOG[0] - foods), exercises=max(0, SUITE_CATALOG[1] - exercises),
+            end=day, progress=None, domain=domain,
+        )
+        catalog.invalidate_all()
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT user_id, email FROM user_profiles WHERE email LIKE %s ORDER BY user_id LIMIT %s;",
+            (f"%@{domain}", users),
+        )
+        rows = cur.fetchall()
+    return Context(
+        size=size,
+        user_ids=[r[0] for r in rows],
+        emails=[r[1] for r in rows],
+        food_ids=[f.id for f in catalog.foods.all()],
+        day=day,
+    )
+
+
+# ---- baseline comparison ----------------------------------------------------
+
+# (metric, allowed relative increase; None means the --threshold)
+_COMPARED = [("p50_ms", None), ("queries", 0.0), ("rows", 0.0), ("peak_kb", None)]
+
+
+def compare(
+    results: List[dict], baseline: List[dict], threshold: float, min_delta_ms: float = SUITE_MIN_DELTA_MS
+) -> List[tuple]:
+    old = {(r["operation"], r["size"]): r for r in baseline}
+    regressions = []
+    print(f"\n{'operation':<18} {'size':>6} {'metric':<8} {'baseline':>10} {'current':>10} {'change':>8}")
+    for r in results:
+        b = old.get((r["operation"], r["size"]))
+        if b is None:
+            continue
+        for metric, allowed in _COMPARED:
+            before, now = b[metric], r[metric]
+            change = (now - before) / before if before else (0.0 if now == before else float("inf"))
+            limit = threshold if allowed is None else allowed
+            regressed = change > limit + 1e-9
+            if metric.endswith("_ms") and now - before < min_delta_ms:
+                regressed = False
+            flag = " REGRESSION" if regressed else ""
+            print(f"{r['operation']:<18} {r['size']:>5g}y {metric:<8} {before:>10.2f} {now:>10.2f} {change:>+7.0%}{flag}")
+            if flag:
+                regressions.append((r["operation"], r["size"], metric, before, now))
+    return regressions
+
+
+def clean(sizes):
+    for size in sizes:
+        print(f"Deleted {datagen.clean(_domain(size))} users of size {size:g}y.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data-access benchmarks with baseline comparison")
+    parser.add_argument("--sizes", default=",".join(f"{s:g}" for s in SUITE_SIZES), help="years of history, comma-separated")
+    parser.add_argument("--users", type=int, default=SUITE_USERS, help="users per size")
+    parser.add_argument("--repeat", type=int, default=SUITE_REPEAT)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--day", type=date.fromisoformat, default=date(2030, 1, 1), help="last day of generated history")
+    parser.add_argument("--ops", help="comma-separated subset of operations")
+    parser.add_argument("--out", default=SUITE_OUT, help="where to write this run's results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results here")
+    parser.add_argument("--threshold", type=float, default=SUITE_THRESHOLD, help="allowed relative slow-down")
+    parser.add_argument(
+        "--min-delta-ms", type=float, default=SUITE_MIN_DELTA_MS, help="ignore wall-time changes below this"
+    )
+    parser.add_argument("--clean", action="store_true", help="delete the suite's generated users and exit")
+    args = parser.parse_args()
+
+    sizes = [float(s) for s in args.sizes.split(",") if s.strip()]
+    if args.clean:
+        clean(sizes)
+        return
+    ops = OPERATIONS
+    if args.ops:
+        wanted = {o.strip() for o in args.ops.split(",")}
+        ops = [op for op in OPERATIONS if op.name in wanted]
+        if unknown := wanted - {op.name for op in ops}:
+            raise SystemExit(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+    contexts = [prepare(size, args.users, args.seed, args.day) for size in sizes]
+    instrument.enable(log_path=None)
+    db.configure_pool()
+
+    results = []
+    print(f"{'operation':<18} {'size':>6} {'p50 ms':>8} {'p95 ms':>8} {'min ms':>8} {'queries':>8} {'rows':>9} {'peak KiB':>9}")
+    for ctx in contexts:
+        for op in ops:
+            r = measure(op, ctx, args.repeat)
+            results.append(asdict(r))
+            print(
+                f"{r.operation:<18} {r.size:>5g}y {r.p50_ms:>8.2f} {r.p95_ms:>8.2f} {r.min_ms:>8.2f} "
+                f"{r.queries:>8.1f} {r.rows:>9.1f} {r.peak_kb:>9.1f}"
+            )
+
+    document = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {"sizes": sizes, "users": args.users, "repeat": args.repeat, "seed": args.seed, "day": args.day},
+        "results": results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, default=str)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above the threshold.")
+            raise SystemExit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
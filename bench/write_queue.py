@@ -0,0 +1,92 @@
+# bench/write_queue.py
+# Rows written per second by concurrent loggers: every call committing its own
+# transaction (services.log_meal / log_workout) versus the group-commit queue
+# (writequeue), at several thread counts. A row is a meal/workout plus each of
+# its foods/exercises. Writes go to a temporary @writebench.test user, deleted
+# afterwards.
+import argparse
+import random
+import threading
+import time
+from datetime import date
+
+import catalog
+import passwords
+import services
+import writequeue
+from bench.common import latency_row
+from db import get_connection
+
+EMAIL = "loggers@writebench.test"
+BENCH_DATE = date(2099, 1, 1)
+
+
+def _hammer(label: str, api, user_id: int, items: int, threads: int, seconds: float) -> dict:
+    food_ids = [f.id for f in catalog.foods.all()]
+    exercise_ids = [e.id for e in catalog.exercises.all()]
+    samples = [[] for _ in range(threads)]
+    rows = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(i: int):
+        rng = random.Random(i)
+        n = 0
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            if n % 2:
+                exercises = [(e, 3, rng.randint(5, 12), 40) for e in rng.sample(exercise_ids, items)]
+                api.log_workout(user_id, "Synced", exercises, 30, "Moderate", 250, BENCH_DATE)
+            else:
+                api.log_meal(user_id, "Synced", [(f, 1) for f in rng.sample(food_ids, items)], BENCH_DATE)
+            samples[i].append(time.perf_counter() - t)
+            rows[i] += 1 + items
+            n += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    row = latency_row(f"{label}, {threads} threads", [s for per in samples for s in per], elapsed)
+    row["rows_per_s"] = sum(rows) / elapsed
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging throughput: per-call commit vs group-commit queue")
+    parser.add_argument("--threads", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--seconds", type=float, default=5.0, help="per measurement")
+    parser.add_argument("--items", type=int, default=3, help="foods per meal / exercises per workout")
+    parser.add_argument("--group-max", type=int, default=writequeue.GROUP_MAX_WRITES)
+    parser.add_argument("--group-wait-ms", type=float, default=writequeue.GROUP_MAX_WAIT * 1000)
+    args = parser.parse_args()
+    levels = [int(t) for t in args.threads.split(",")]
+
+    passwords.HASH_WORKERS = 0
+    user_id = services.register_user("Write Bench", EMAIL, "write bench", 30, "X", 175, 70)
+    writequeue.GROUP_MAX_WRITES = args.group_max
+    writequeue.GROUP_MAX_WAIT = args.group_wait_ms / 1000
+    results = []
+    try:
+        for threads in levels:
+            results.append(_hammer("per-call commit", services, user_id, args.items, threads, args.seconds))
+            queue = writequeue.get_queue()
+            groups, writes = queue.groups, queue.writes
+            results.append(_hammer("group commit", writequeue, user_id, args.items, threads, args.seconds))
+            results[-1]["per_group"] = (queue.writes - writes) / max(queue.groups - groups, 1)
+    finally:
+        writequeue.shutdown()
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM users WHERE id = %s;", (user_id,))
+            conn.commit()
+
+    print(f"{'operation':<32} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'rows/s':>10} {'writes/group':>13}")
+    for r in results:
+        per_group = f"{r['per_group']:>13.1f}" if "per_group" in r else f"{'-':>13}"
+        print(f"{r['label']:<32} {r['n']:>7} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['rows_per_s']:>10.1f} {per_group}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+# bulk_import.py
+# Bulk loader for historical workouts and meals (e.g. migrated from another
+# tracker). Input files are CSV (with a header row) or NDJSON, one per kind:
+#
+#   workouts           ref, workout_date, workout_type, duration_min, intensity, calories_burned
+#   workout_exercises  workout_ref, exercise_name | exercise_id, sets, reps, weight_used_kg
+#   meals              ref, meal_date, meal_type [, calories, protein_g, carbs_g, fats_g]
+#   meal_foods         meal_ref, food_name | food_id, quantity
+#
+# `ref` is any identifier unique within the file; child rows point at it. Everything
+# is COPYed into temporary staging tables and moved into the real tables with
+# set-based statements in a single transaction.
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Sequence
+
+from psycopg2 import sql
+
+import macros
+import summaries
+from db import get_connection
+from models import ValidationError
+
+# kind -> (staging table, columns accepted from the input, required columns)
+_KINDS = {
+    "workouts": (
+        "stage_workouts",
+        ["ref", "workout_date", "workout_type", "duration_min", "intensity", "calories_burned"],
+        ["ref", "workout_date"],
+    ),
+    "workout_exercises": (
+        "stage_workout_exercises",
+        ["workout_ref", "exercise_name", "exercise_id", "sets", "reps", "weight_used_kg"],
+        ["workout_ref"],
+    ),
+    "meals": (
+        "stage_meals",
+        ["ref", "meal_date", "meal_type", "calories", "protein_g", "carbs_g", "fats_g"],
+        ["ref", "meal_date"],
+    ),
+    "meal_foods": (
+        "stage_meal_foods",
+        ["meal_ref", "food_name", "food_id", "quantity"],
+        ["meal_ref"],
+    ),
+}
+
+_STAGING_DDL = """
+    CREATE TEMP TABLE stage_workouts (
+        id              BIGINT NOT NULL DEFAULT nextval(%(workout_seq)s::regclass),
+        ref             TEXT NOT NULL,
+        workout_date    DATE NOT NULL,
+        workout_type    VARCHAR(60),
+        duration_min    DECIMAL(5,2),
+        intensity       VARCHAR(30),
+        calories_burned DECIMAL(7,2)
+    ) ON COMMIT DROP;
+
+    CREATE TEMP TABLE stage_workout_exercises (
+        workout_ref    TEXT NOT NULL,
+        exercise_name  TEXT,
+        exercise_id    BIGINT,
+        sets           SMALLINT,
+        reps           SMALLINT,
+        weight_used_kg DECIMAL(6,2)
+    ) ON COMMIT DROP;
+
+    CREATE TEMP TABLE stage_meals (
+        id        BIGINT NOT NULL DEFAULT nextval(%(meal_seq)s::regclass),
+        ref       TEXT NOT NULL,
+        meal_date DATE NOT NULL,
+        meal_type VARCHAR(40),
+        calories  DECIMAL(7,2),
+        protein_g DECIMAL(6,2),
+        carbs_g   DECIMAL(6,2),
+        fats_g    DECIMAL(6,2)
+    ) ON COMMIT DROP;
+
+    CREATE TEMP TABLE stage_meal_foods (
+        meal_ref  TEXT NOT NULL,
+        food_name TEXT,
+        food_id   BIGINT,
+        quantity  DECIMAL(8,3)
+    ) ON COMMIT DROP;
+"""
+
+class _CsvStream:
+    # Minimal file-like object that renders rows as CSV on demand for COPY.
+    def __init__(self, rows: Iterable[Sequence]):
+        self._rows = iter(rows)
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, lineterminator="\n")
+        self._pending = ""
+
+    def _fill(self, size: int):
+        while size < 0 or len(self._pending) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                return
+            self._writer.writerow(["" if v is None else v for v in row])
+            self._pending += self._buf.getvalue()
+            self._buf.seek(0)
+            self._buf.truncate()
+
+    def read(self, size: int = -1) -> str:
+        self._fill(size)
+        if size < 0:
+            out, self._pending = self._pending, ""
+        else:
+            out, self._pending = self._pending[:size], self._pending[size:]
+        return out
+
+    readline = read
+
+
+def copy_rows(cur, table: str, columns: List[str], rows: Iterable[Sequence]) -> int:
+    # COPY an iterable of tuples into `table`; empty strings and None load as NULL.
+    stmt = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    cur.copy_expert(stmt.as_string(cur), _CsvStream(rows))
+    return cur.rowcount
+
+
+def _input_rows(path: str, allowed: List[str], required: List[str]):
+    # Returns (columns, row iterator) for a CSV or NDJSON file.
+    name = os.path.basename(path)
+    if path.endswith((".ndjson", ".jsonl")):
+        def rows():
+            with open(path, encoding="utf-8") as f:
+                for lineno, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    obj = json.loads(line)
+                    missing = [c for c in required if obj.get(c) in (None, "")]
+                    if missing:
+                        raise ValidationError(f"{name}:{lineno}: missing {', '.join(missing)}")
+                    yield [obj.get(c) for c in allowed]
+
+        return allowed, rows()
+
+    with open(path, encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), [])
+    header = [h.strip() for h in header]
+    unknown = [h for h in header if h not in allowed]
+    missing = [c for c in required if c not in header]
+    if unknown or missing:
+        problems = []
+        if unknown:
+            problems.append(f"unknown columns {unknown}")
+        if missing:
+            problems.append(f"missing columns {missing}")
+        raise ValidationError(f"{name}: " + "; ".join(problems) + f" (expected some of {allowed})")
+
+    def rows():
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                if row:
+                    yield row
+
+    return header, rows()
+
+
+def _scalar(cur, query: str, params=None):
+    cur.execute(query, params)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def bulk_load(user_id: int, files: Dict[str, str], strict: bool = False) -> Dict[str, float]:
+    unknown = set(files) - set(_KINDS)
+    if unknown:
+        raise ValueError(f"unknown input kinds: {sorted(unknown)}")
+
+    stats: Dict[str, float] = {}
+    t_start = time.perf_counter()
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM users WHERE id = %s;", (user_id,))
+        if not cur.fetchone():
+            raise ValidationError(f"User {user_id} does not exist.")
+
+        cur.execute(
+            _STAGING_DDL,
+            {
+                "workout_seq": _scalar(cur, "SELECT pg_get_serial_sequence('workout_logs', 'id');"),
+                "meal_seq": _scalar(cur, "SELECT pg_get_serial_sequence('meal_logs', 'id');"),
+            },
+        )
+
+        # 1. COPY every input into its staging table.
+        staged = 0
+        for kind, path in files.items():
+            table, allowed, required = _KINDS[kind]
+            columns, rows = _input_rows(path, allowed, required)
+            n = copy_rows(cur, table, columns, rows)
+            stats[f"staged_{kind}"] = n
+            staged += n
+        # Temp tables are never auto-analyzed; without stats the joins below plan badly.
+        cur.execute("ANALYZE stage_workouts, stage_workout_exercises, stage_meals, stage_meal_foods;")
+        stats["copy_s"] = time.perf_counter() - t_start
+
+        for table in ("stage_workouts", "stage_meals"):
+            dup = _scalar(cur, f"SELECT ref FROM {table} GROUP BY ref HAVING COUNT(*) > 1 LIMIT 1;")
+            if dup is not None:
+                raise ValidationError(f"Duplicate ref {dup!r} in {table[len('stage_'):]} input.")
+
+        # 2. Resolve catalog names to ids in bulk.
+        t = time.perf_counter()
+        cur.execute(
+            """
+            UPDATE stage_workout_exercises s SET exercise_id = e.id
+            FROM exercises e
+            WHERE s.exercise_id IS NULL AND e.exercise_name = s.exercise_name;
+            """
+        )
+        cur.execute(
+            """
+            UPDATE stage_meal_foods s SET food_id = f.id
+            FROM foods f
+            WHERE s.food_id IS NULL AND f.food_name = s.food_name;
+            """
+        )
+        stats["unresolved_exercises"] = _scalar(
+            cur,
+            """
+            SELECT COUNT(*) FROM stage_workout_exercises s
+            WHERE NOT EXISTS (SELECT 1 FROM exercises e WHERE e.id = s.exercise_id)
+               OR NOT EXISTS (SELECT 1 FROM stage_workouts w WHERE w.ref = s.workout_ref);
+            """,
+        )
+        stats["unresolved_foods"] = _scalar(
+            cur,
+            """
+            SELECT COUNT(*) FROM stage_meal_foods s
+            WHERE NOT EXISTS (SELECT 1 FROM foods f WHERE f.id = s.food_id)
+               OR NOT EXISTS (SELECT 1 FROM stage_meals m WHERE m.ref = s.meal_ref);
+            """,
+        )
+        if strict and (stats["unresolved_exercises"] or stats["unresolved_foods"]):
+            raise ValidationError(
+                f"{stats['unresolved_exercises']} exercise rows and {stats['unresolved_foods']} "
+                "food rows reference unknown catalog entries or parent refs."
+            )
+        stats["resolve_s"] = time.perf_counter() - t
+
+        # 3. Move staged rows into the real tables (ids were reserved by the staging defaults).
+        t = time.perf_counter()
+        cur.execute(
+            """
+            INSERT INTO workout_logs
+                (id, user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+            OVERRIDING SYSTEM VALUE
+            SELECT id, %s, workout_type, duration_min, intensity,
+                   COALESCE(calories_burned, 0), workout_date
+            FROM stage_workouts;
+            """,
+            (user_id,),
+        )
+        stats["workouts"] = cur.rowcount
+        cur.execute(
+            """
+            INSERT INTO workout_exercises (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date)
+            SELECT w.id, s.exercise_id, s.sets, s.reps, s.weight_used_kg, w.workout_date
+            FROM stage_workout_exercises s
+            JOIN stage_workouts w ON w.ref = s.workout_ref
+            JOIN exercises e ON e.id = s.exercise_id
+            ON CONFLICT (workout_id, exercise_id) DO NOTHING;
+            """
+        )
+        stats["workout_exercises"] = cur.rowcount
+        cur.execute(
+            """
+            INSERT INTO meal_logs
+                (id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g)
+            OVERRIDING SYSTEM VALUE
+            SELECT id, %s, meal_type, meal_date, calories, protein_g, carbs_g, fats_g
+            FROM stage_meals;
+            """,
+            (user_id,),
+        )
+        stats["meals"] = cur.rowcount
+        cur.execute(
+            """
+            INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date)
+            SELECT m.id, s.food_id, COALESCE(s.quantity, 1), m.meal_date
+            FROM stage_meal_foods s
+            JOIN stage_meals m ON m.ref = s.meal_ref
+            JOIN foods f ON f.id = s.food_id
+            ON CONFLICT (meal_id, food_id) DO NOTHING;
+            """
+        )
+        stats["meal_foods"] = cur.rowcount
+        stats["insert_s"] = time.perf_counter() - t
+
+        # 4. Derived data: meal macro totals and the user's daily summaries.
+        t = time.perf_counter()
+        cur.execute("SELECT id FROM stage_meals;")
+        macros.recompute_meals(cur, [r[0] for r in cur.fetchall()])
+        summaries.rebuild_user(cur, user_id)
+        stats["derive_s"] = time.perf_counter() - t
+
+        conn.commit()
+
+    elapsed = time.perf_counter() - t_start
+    stats["total_s"] = elapsed
+    stats["rows"] = staged
+    stats["rows_per_s"] = staged / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load historical workouts and meals with COPY")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--workouts", help="CSV/NDJSON of workouts")
+    parser.add_argument("--workout-exercises", help="CSV/NDJSON of exercises per workout")
+    parser.add_argument("--meals", help="CSV/NDJSON of meals")
+    parser.add_argument("--meal-foods", help="CSV/NDJSON of foods per meal")
+    parser.add_argument("--strict", action="store_true",
+                        help="abort if any row references an unknown exercise/food or parent ref")
+    args = parser.parse_args()
+
+    files = {
+        kind: path
+        for kind, path in (
+            ("workouts", args.workouts),
+            ("workout_exercises", args.workout_exercises),
+            ("meals", args.meals),
+            ("meal_foods", args.meal_foods),
+        )
+        if path
+    }
+    if not files:
+        parser.error("give at least one of --workouts/--workout-exercises/--meals/--meal-foods")
+
+    try:
+        stats = bulk_load(args.user_id, files, args.strict)
+    except ValidationError as e:
+        raise SystemExit(f"Import failed: {e}")
+
+    print(
+        f"Loaded {stats['workouts']} workouts, {stats['workout_exercises']} workout exercises, "
+        f"{stats['meals']} meals, {stats['meal_foods']} meal foods."
+    )
+    if stats["unresolved_exercises"] or stats["unresolved_foods"]:
+        print(
+            f"Skipped {stats['unresolved_exercises']} exercise rows and "
+            f"{stats['unresolved_foods']} food rows with unknown catalog names or parent refs."
+        )
+    print(
+        f"{stats['rows']} input rows in {stats['total_s']:.2f} s ({stats['rows_per_s']:.0f} rows/s): "
+        f"copy {stats['copy_s']:.2f} s, resolve {stats['resolve_s']:.2f} s, "
+        f"insert {stats['insert_s']:.2f} s, derive {stats['derive_s']:.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
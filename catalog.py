@@ -0,0 +1,243 @@
+# catalog.py
+# In-process cache of the foods and exercises catalogs, keyed by id and by name.
+# Entries expire after CATALOG_TTL seconds (catalog edits made by other processes
+# become visible within that window); edits made through services.py update the
+# cache immediately via put()/invalidate(). While the whole table fits in
+# CATALOG_MAX_ENTRIES the cache also remembers that it is complete, so full
+# listings are answered without a query; lookups of unknown ids or names still
+# check the database, since other processes may have added them.
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from psycopg2.extras import DictCursor
+
+from db import get_connection
+from models import Exercise, Food
+
+CATALOG_MAX_ENTRIES = 10000
+CATALOG_TTL = 300.0
+
+
+@dataclass
+class CacheStats:
+    size: int
+    complete: bool
+    version: int
+    hits: int
+    misses: int
+    loads: int
+    evictions: int
+    invalidations: int
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+def exercise_from_row(r) -> Exercise:
+    return Exercise(
+        id=r["id"],
+        exercise_name=r["exercise_name"],
+        category=r["category"],
+        muscle_group=r["muscle_group"],
+        equipment=r["equipment"],
+    )
+
+
+def food_from_row(r) -> Food:
+    return Food(
+        id=r["id"],
+        food_name=r["food_name"],
+        serving_size=r["serving_size"],
+        calories_per_serv=_num(r["calories_per_serv"]),
+        protein_g=_num(r["protein_g"]),
+        carbs_g=_num(r["carbs_g"]),
+        fats_g=_num(r["fats_g"]),
+    )
+
+
+class CatalogCache:
+    def __init__(
+        self,
+        table: str,
+        name_column: str,
+        columns: str,
+        from_row: Callable,
+        max_entries: int = CATALOG_MAX_ENTRIES,
+        ttl: float = CATALOG_TTL,
+    ):
+        self.table = table
+        self.name_column = name_column
+        self.columns = columns
+        self.from_row = from_row
+        self._select = f"SELECT {columns} FROM {table}"
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.RLock()
+        self._by_id: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (entry, expires_at), LRU order
+        self._by_name: Dict[str, int] = {}
+        self._complete_until = 0.0  # while in the future, _by_id holds every row of the table
+        self._listeners: List[Callable] = []
+
+        self.version = 0
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    # -- lookups --------------------------------------------------------
+
+    def get(self, entry_id: int, cur=None):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._by_id.get(entry_id)
+            if cached and cached[1] > now:
+                self._by_id.move_to_end(entry_id)
+                self._hits += 1
+                return cached[0]
+            self._misses += 1
+
+        # Even when the cache is complete, a miss goes to the database once: the id
+        # may have been added by another process (bulk_import, datagen, a server).
+        rows = self._query(f"{self._select} WHERE id = %s;", (entry_id,), cur)
+        return self._store(rows[0]) if rows else None
+
+    def get_by_name(self, name: str, cur=None):
+        now = time.monotonic()
+        with self._lock:
+            entry_id = self._by_name.get(name)
+            cached = self._by_id.get(entry_id) if entry_id is not None else None
+            if cached and cached[1] > now:
+                self._by_id.move_to_end(entry_id)
+                self._hits += 1
+                return cached[0]
+            self._misses += 1
+
+        rows = self._query(f"{self._select} WHERE {self.name_column} = %s;", (name,), cur)
+        return self._store(rows[0]) if rows else None
+
+    def exists(self, entry_id: int, cur=None) -> bool:
+        return self.get(entry_id, cur) is not None
+
+    def all(self, cur=None) -> list:
+        # Every entry ordered by id; served from memory while the cache is complete.
+        now = time.monotonic()
+        with self._lock:
+            if self._complete_until > now:
+                self._hits += 1
+                return [entry for entry, _ in sorted(self._by_id.values(), key=lambda e: e[0].id)]
+            self._misses += 1
+
+        rows = self._query(f"{self._select} ORDER BY id;", None, cur)
+        entries = [self.from_row(r) for r in rows]
+        if len(entries) <= self.max_entries:
+            with self._lock:
+                self._by_id.clear()
+                self._by_name.clear()
+                expires = time.monotonic() + self.ttl
+                for entry in entries:
+                    self._insert(entry, expires)
+                self._complete_until = expires
+                self._loads += 1
+        return entries
+
+    # -- maintenance ----------------------------------------------------
+
+    def put(self, entry):
+        # Called after a write through services.py so the cache reflects it at once.
+        with self._lock:
+            self._insert(entry, time.monotonic() + self.ttl)
+            self.version += 1
+        for listener in self._listeners:
+            listener(entry)
+
+    def invalidate(self, entry_id: Optional[int] = None):
+        with self._lock:
+            if entry_id is None:
+                self._by_id.clear()
+                self._by_name.clear()
+            else:
+                self._remove(entry_id)
+            self._complete_until = 0.0
+            self.version += 1
+            self._invalidations += 1
+
+    def add_listener(self, fn: Callable):
+        # fn(entry) runs after every put(); used to keep derived indexes in sync.
+        self._listeners.append(fn)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                size=len(self._by_id),
+                complete=self._complete_until > time.monotonic(),
+                version=self.version,
+                hits=self._hits,
+                misses=self._misses,
+                loads=self._loads,
+                evictions=self._evictions,
+                invalidations=self._invalidations,
+            )
+
+    # -- internals ------------------------------------------------------
+
+    def _query(self, query: str, params, cur) -> list:
+        if cur is not None:
+            cur.execute(query, params)
+            return cur.fetchall()
+        with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as own:
+            own.execute(query, params)
+            return own.fetchall()
+
+    def _store(self, row):
+        entry = self.from_row(row)
+        with self._lock:
+            self._insert(entry, time.monotonic() + self.ttl)
+        return entry
+
+    def _insert(self, entry, expires: float):
+        name = getattr(entry, self.name_column)
+        old = self._by_id.get(entry.id)
+        if old is not None:
+            self._by_name.pop(getattr(old[0], self.name_column), None)
+        self._by_id[entry.id] = (entry, expires)
+        self._by_id.move_to_end(entry.id)
+        self._by_name[name] = entry.id
+        while len(self._by_id) > self.max_entries:
+            evicted_id, (evicted, _) = self._by_id.popitem(last=False)
+            self._by_name.pop(getattr(evicted, self.name_column), None)
+            self._complete_until = 0.0
+            self._evictions += 1
+
+    def _remove(self, entry_id: int):
+        old = self._by_id.pop(entry_id, None)
+        if old is not None:
+            self._by_name.pop(getattr(old[0], self.name_column), None)
+
+
+exercises = CatalogCache(
+    "exercises",
+    "exercise_name",
+    "id, exercise_name, category, muscle_group, equipment",
+    exercise_from_row,
+)
+foods = CatalogCache(
+    "foods",
+    "food_name",
+    "id, food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g",
+    food_from_row,
+)
+
+
+def stats() -> Dict[str, CacheStats]:
+    return {"exercises": exercises.stats(), "foods": foods.stats()}
+
+
+def invalidate_all():
+    exercises.invalidate()
+    foods.invalidate()
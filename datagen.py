@@ -0,0 +1,362 @@
+# datagen.py
+# Deterministic synthetic data for benchmarks and load tests: foods and exercises
+# catalogs plus users with profiles and years of workouts and meals, loaded with
+# COPY. Every user's history comes from its own Random(seed/ordinal), so the same
+# seed gives the same data whatever the batch size or number of workers.
+#
+#   python datagen.py generate --users 10000 --years 3 --workers 4
+#   python datagen.py clean          # removes generated users and their logs
+#
+# Generated users log in as user<id>@datagen.test / password123. Ids are taken
+# from the tables' identity sequences up front (db.allocate_ids), so generated
+# rows never collide with rows created through the app.
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import date, timedelta
+from typing import List, Tuple
+
+import db
+import summaries
+from bulk_import import copy_rows
+from db import get_connection
+from services import hash_password
+
+DATAGEN_DOMAIN = "datagen.test"
+DATAGEN_PASSWORD = "password123"
+DATAGEN_BATCH_USERS = 100
+
+_FOOD_STYLES = [
+    "Baked", "Boiled", "Braised", "Fresh", "Fried", "Grilled", "Low-Fat", "Organic",
+    "Raw", "Roasted", "Smoked", "Spicy", "Steamed", "Sweet", "Whole", "Dried",
+]
+_FOOD_NOUNS = [
+    "Almonds", "Apple", "Bagel", "Banana", "Beans", "Beef Mince", "Broccoli", "Carrots",
+    "Cheddar", "Chicken Breast", "Chickpeas", "Cod", "Cottage Cheese", "Couscous", "Eggs",
+    "Granola", "Greek Yogurt", "Ham", "Hummus", "Lentils", "Mackerel", "Milk", "Oats",
+    "Pasta", "Peanut Butter", "Pork Loin", "Potatoes", "Quinoa", "Rice", "Salmon",
+    "Spinach", "Sweet Potato", "Tofu", "Tuna", "Turkey", "Wholemeal Bread",
+]
+_BRANDS = ["Acme", "Brookside", "Coastal", "Daily", "Evergreen", "Farmhouse", "Golden", "Harvest"]
+_SERVINGS = ["100g", "1 cup", "1 portion", "1 piece", "30g", "250ml"]
+
+# (movement, category, muscle group)
+_MOVEMENTS = [
+    ("Bench Press", "Strength", "Chest"), ("Squat", "Strength", "Legs"),
+    ("Deadlift", "Strength", "Back"), ("Overhead Press", "Strength", "Shoulders"),
+    ("Row", "Strength", "Back"), ("Lunge", "Strength", "Legs"), ("Curl", "Strength", "Arms"),
+    ("Triceps Extension", "Strength", "Arms"), ("Fly", "Strength", "Chest"),
+    ("Calf Raise", "Strength", "Legs"), ("Hip Thrust", "Strength", "Glutes"),
+    ("Lateral Raise", "Strength", "Shoulders"), ("Pulldown", "Strength", "Back"),
+]
+_VARIANTS = ["", "Incline", "Decline", "Single-Arm", "Paused", "Tempo", "Wide-Grip", "Close-Grip"]
+_EQUIPMENT = ["Barbell", "Dumbbell", "Cable", "Machine", "Kettlebell", "Smith Machine", "Band"]
+
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+WORKOUT_TYPES = ["Upper body", "Lower body", "Full body", "Push", "Pull", "Legs", "Cardio"]
+INTENSITIES = ["Light", "Moderate", "Hard"]
+_QUANTITIES = [0.5, 1.0, 1.0, 1.5, 2.0]
+
+
+@dataclass
+class DatagenStats:
+    foods: int = 0
+    exercises: int = 0
+    users: int = 0
+    workouts: int = 0
+    workout_exercises: int = 0
+    meals: int = 0
+    meal_foods: int = 0
+    seconds: float = 0.0
+
+    def add(self, other: "DatagenStats"):
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+
+# ---- catalog ------------------------------------------------------------
+
+
+def _food_names(rng: random.Random):
+    while True:
+        yield f"{rng.choice(_FOOD_STYLES)} {rng.choice(_FOOD_NOUNS)} ({rng.choice(_BRANDS)})"
+
+
+def _exercise_names(rng: random.Random):
+    while True:
+        movement, category, muscle = rng.choice(_MOVEMENTS)
+        equipment = rng.choice(_EQUIPMENT)
+        name = " ".join(p for p in (rng.choice(_VARIANTS), equipment, movement) if p)
+        yield name, category, muscle, equipment
+
+
+def _new_names(cur, table: str, name_column: str, names, n: int) -> list:
+    # Up to n generated entries whose names are not in the table yet (numbered
+    # once the plain combinations run out).
+    cur.execute(f"SELECT {name_column} FROM {table};")
+    taken = {r[0] for r in cur.fetchall()}
+    result, attempts = [], 0
+    while len(result) < n:
+        entry = next(names)
+        name = entry if isinstance(entry, str) else entry[0]
+        attempts += 1
+        if name in taken and attempts > n * 20:
+            name = f"{name} {attempts}"
+        if name in taken:
+            continue
+        taken.add(name)
+        result.append((name,) + (entry[1:] if not isinstance(entry, str) else ()))
+    return result
+
+
+def generate_catalog(cur, seed: int, n_foods: int, n_exercises: int) -> DatagenStats:
+    rng = random.Random(f"{seed}/catalog")
+    stats = DatagenStats()
+    foods = _new_names(cur, "foods", "food_name", _food_names(rng), n_foods)
+    if foods:
+        ids = db.allocate_ids(cur, "foods", len(foods))
+        rows = []
+        for food_id, (name,) in zip(ids, foods):
+            protein, carbs, fats = rng.randint(0, 300) / 10, rng.randint(0, 600) / 10, rng.randint(0, 250) / 10
+            calories = round(protein * 4 + carbs * 4 + fats * 9 + rng.randint(0, 20), 1)
+            rows.append((food_id, name, rng.choice(_SERVINGS), calories, protein, carbs, fats))
+        stats.foods = copy_rows(
+            cur, "foods", ["id", "food_name", "serving_size", "calories_per_serv", "protein_g", "carbs_g", "fats_g"], rows
+        )
+    exercises = _new_names(cur, "exercises", "exercise_name", _exercise_names(rng), n_exercises)
+    if exercises:
+        ids = db.allocate_ids(cur, "exercises", len(exercises))
+        rows = [(exercise_id, *e) for exercise_id, e in zip(ids, exercises)]
+        stats.exercises = copy_rows(
+            cur, "exercises", ["id", "exercise_name", "category", "muscle_group", "equipment"], rows
+        )
+    return stats
+
+
+def _load_catalog(cur) -> Tuple[List[tuple], List[int]]:
+    cur.execute(
+        "SELECT id, COALESCE(calories_per_serv, 0)::float8, COALESCE(protein_g, 0)::float8, "
+        "COALESCE(carbs_g, 0)::float8, COALESCE(fats_g, 0)::float8 FROM foods ORDER BY id;"
+    )
+    foods = cur.fetchall()
+    cur.execute("SELECT id FROM exercises ORDER BY id;")
+    return foods, [r[0] for r in cur.fetchall()]
+
+
+# ---- users and their logs ----------------------------------------------------
+
+
+@dataclass
+class _Batch:
+    ordinals: range
+    seed: int
+    start: date
+    end: date
+    foods: List[tuple]
+    exercise_ids: List[int]
+    password_hash: str
+    domain: str = DATAGEN_DOMAIN
+
+
+def _user_history(rng: random.Random, b: _Batch, workouts: list, sets: list, meals: list, items: list):
+    # Appends one user's rows; workouts/meals get positional ids (index in their
+    # list) that _load_batch maps onto the allocated ids.
+    span = (b.end - b.start).days
+    day = b.start + timedelta(days=rng.randint(0, span // 5))
+    logs_per_week = rng.choice([0, 1, 2, 3, 3, 4, 4, 5, 6])
+    log_rate = rng.uniform(0.55, 0.98)
+    meals_per_day = rng.randint(2, 4)
+    favourite_foods = rng.sample(b.foods, min(40, len(b.foods)))
+    favourite_exercises = rng.sample(b.exercise_ids, min(10, len(b.exercise_ids)))
+    base_weight = {e: rng.randint(8, 40) * 2.5 for e in favourite_exercises}
+    gain = rng.uniform(0.0, 0.4)  # strength gained over the whole period
+
+    while day <= b.end:
+        progress = 1 + gain * (day - b.start).days / max(span, 1)
+        if favourite_exercises and rng.random() < logs_per_week / 7:
+            duration = rng.randint(20, 90)
+            intensity = rng.choice(INTENSITIES)
+            burned = duration * (4 + 3 * INTENSITIES.index(intensity)) + rng.randint(0, 40)
+            local_id = len(workouts)
+            workouts.append([local_id, rng.choice(WORKOUT_TYPES), duration, intensity, burned, day])
+            for exercise_id in rng.sample(favourite_exercises, rng.randint(1, min(6, len(favourite_exercises)))):
+                weight = round(base_weight[exercise_id] * progress / 2.5) * 2.5
+                sets.append([local_id, exercise_id, rng.randint(3, 5), rng.randint(5, 12), weight, day])
+
+        if favourite_foods and rng.random() < log_rate:
+            for meal_type in MEAL_TYPES[:meals_per_day]:
+                local_id = len(meals)
+                totals = [0.0, 0.0, 0.0, 0.0]
+                for food in rng.sample(favourite_foods, rng.randint(1, 4)):
+                    quantity = rng.choice(_QUANTITIES)
+                    items.append([local_id, food[0], quantity, day])
+                    for k in range(4):
+                        totals[k] += food[k + 1] * quantity
+                meals.append([local_id, meal_type] + [round(t, 2) for t in totals] + [day])
+        day += timedelta(days=1)
+
+
+def _load_batch(b: _Batch) -> DatagenStats:
+    # One transaction per batch of users; runs in a worker process with --workers.
+    stats = DatagenStats()
+    users, profiles, workouts, sets, meals, items = [], [], [], [], [], []
+    for ordinal in b.ordinals:
+        rng = random.Random(f"{b.seed}/{ordinal}")
+        height = rng.randint(150, 200)
+        weight = rng.randint(45, 120)
+        users.append([f"User {ordinal}", rng.randint(16, 80), rng.choice(["F", "M", "X"]), height, weight,
+                      round(weight / (height * height) * 10000, 2)])
+        user_workouts, user_sets, user_meals, user_items = [], [], [], []
+        _user_history(rng, b, user_workouts, user_sets, user_meals, user_items)
+        user_index = len(profiles)
+        profiles.append(user_index)
+        # Shift the user's positional ids past the rows already in the batch and
+        # prefix the user's position; real ids are assigned below.
+        workout_base, meal_base = len(workouts), len(meals)
+        workouts.extend([user_index, workout_base + row[0]] + row[1:] for row in user_workouts)
+        sets.extend([workout_base + row[0]] + row[1:] for row in user_sets)
+        meals.extend([user_index, meal_base + row[0]] + row[1:] for row in user_meals)
+        items.extend([meal_base + row[0]] + row[1:] for row in user_items)
+
+    with get_connection() as conn, conn.cursor() as cur:
+        user_ids = db.allocate_ids(cur, "users", len(users))
+        workout_ids = db.allocate_ids(cur, "workout_logs", len(workouts)) if workouts else []
+        meal_ids = db.allocate_ids(cur, "meal_logs", len(meals)) if meals else []
+        joined = b.start
+
+        stats.users = copy_rows(
+            cur, "users", ["id", "name", "age", "gender", "height_cm", "weight_kg", "bmi"],
+            ([user_ids[i]] + row for i, row in enumerate(users)),
+        )
+        copy_rows(
+            cur, "user_profiles", ["user_id", "email", "password_hash", "date_joined"],
+            ((user_ids[i], f"user{user_ids[i]}@{b.domain}", b.password_hash, joined)
+             for i in profiles),
+        )
+        stats.workouts = copy_rows(
+            cur, "workout_logs",
+            ["user_id", "id", "workout_type", "duration_min", "intensity", "calories_burned", "workout_date"],
+            ([user_ids[r[0]], workout_ids[r[1]]] + r[2:] for r in workouts),
+        )
+        stats.workout_exercises = copy_rows(
+            cur, "workout_exercises", ["workout_id", "exercise_id", "sets", "reps", "weight_used_kg", "workout_date"],
+            ([workout_ids[r[0]]] + r[1:] for r in sets),
+        )
+        stats.meals = copy_rows(
+            cur, "meal_logs",
+            ["user_id", "id", "meal_type", "calories", "protein_g", "carbs_g", "fats_g", "meal_date"],
+            ([user_ids[r[0]], meal_ids[r[1]]] + r[2:] for r in meals),
+        )
+        stats.meal_foods = copy_rows(
+            cur, "meal_foods", ["meal_id", "food_id", "quantity", "meal_date"],
+            ([meal_ids[r[0]]] + r[1:] for r in items),
+        )
+        conn.commit()
+    return stats
+
+
+def generate(
+    users: int,
+    years: float = 1,
+    seed: int = 1,
+    foods: int = 2000,
+    exercises: int = 150,
+    workers: int = 1,
+    batch_users: int = DATAGEN_BATCH_USERS,
+    end: date = None,
+    progress=print,
+    domain: str = DATAGEN_DOMAIN,
+) -> DatagenStats:
+    started = time.perf_counter()
+    end = end or date.today()
+    start = end - timedelta(days=int(365 * years) - 1)
+
+    with get_connection() as conn, conn.cursor() as cur:
+        stats = generate_catalog(cur, seed, foods, exercises)
+        conn.commit()
+        food_rows, exercise_ids = _load_catalog(cur)
+
+    # Ordinals continue after users generated earlier, so reruns add new people.
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM user_profiles WHERE email LIKE %s;", (f"%@{domain}",))
+        first_ordinal = cur.fetchone()[0]
+
+    password_hash = hash_password(DATAGEN_PASSWORD)
+    batches = [
+        _Batch(range(i, min(i + batch_users, first_ordinal + users)), seed, start, end, food_rows, exercise_ids,
+               password_hash, domain)
+        for i in range(first_ordinal, first_ordinal + users, batch_users)
+    ]
+
+    if workers > 1:
+        db.close_pool()  # forked workers open their own pools
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_load_batch, batches)
+            for done, result in enumerate(results, 1):
+                stats.add(result)
+                if progress:
+                    progress(f"  batch {done}/{len(batches)}: {stats.users} users, {stats.meals} meals")
+    else:
+        for done, batch in enumerate(batches, 1):
+            stats.add(_load_batch(batch))
+            if progress:
+                progress(f"  batch {done}/{len(batches)}: {stats.users} users, {stats.meals} meals")
+
+    if progress:
+        progress("Rebuilding daily summaries and rollups ...")
+    summaries.rebuild()
+    with get_connection() as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE;")
+        conn.autocommit = False
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def clean(domain: str = DATAGEN_DOMAIN) -> int:
+    # Users cascade to their profiles, logs and summaries; catalogs are kept.
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM users WHERE id IN (SELECT user_id FROM user_profiles WHERE email LIKE %s);",
+            (f"%@{domain}",),
+        )
+        deleted = cur.rowcount
+        conn.commit()
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic users, catalogs and history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_gen = sub.add_parser("generate", help="add generated data (COPY)")
+    p_gen.add_argument("--users", type=int, default=1000)
+    p_gen.add_argument("--years", type=float, default=1.0, help="history length per user")
+    p_gen.add_argument("--seed", type=int, default=1)
+    p_gen.add_argument("--foods", type=int, default=2000, help="new foods to add to the catalog")
+    p_gen.add_argument("--exercises", type=int, default=150, help="new exercises to add to the catalog")
+    p_gen.add_argument("--workers", type=int, default=1, help="parallel generator processes")
+    p_gen.add_argument("--batch-users", type=int, default=DATAGEN_BATCH_USERS, help="users per transaction")
+    p_gen.add_argument("--end", type=date.fromisoformat, help="last day of history (default today)")
+    sub.add_parser("clean", help=f"delete users with @{DATAGEN_DOMAIN} emails")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        stats = generate(
+            args.users, args.years, args.seed, args.foods, args.exercises, args.workers, args.batch_users, args.end
+        )
+        rows = sum(getattr(stats, f.name) for f in fields(stats) if f.name != "seconds")
+        print(
+            f"Generated {stats.users} users, {stats.workouts} workouts ({stats.workout_exercises} exercises), "
+            f"{stats.meals} meals ({stats.meal_foods} foods), {stats.foods} foods and "
+            f"{stats.exercises} exercises in {stats.seconds:.1f} s ({rows / stats.seconds:,.0f} rows/s)."
+        )
+        print(f"Log in as user<id>@{DATAGEN_DOMAIN} / {DATAGEN_PASSWORD}.")
+    elif args.command == "clean":
+        print(f"Deleted {clean()} generated users.")
+
+
+if __name__ == "__main__":
+    main()
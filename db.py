@@ -1,18 +1,581 @@
 # db.py
+import atexit
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterable, List, Optional
+
 import psycopg2
+from psycopg2 import extensions
+
+import sqlite_backend
 
 DB_NAME = "fitness_tracker"
 DB_USER = "postgres" # change if needed
 DB_PASSWORD = "" # see report for setup
 DB_HOST = "localhost"
 DB_PORT = "5432"
+DB_DSN = None                # libpq DSN/URI of the primary; overrides the settings above
+
+# ---- Read replicas ----
+# get_connection(readonly=True) goes to these, round-robin; with none it is the primary.
+DB_REPLICA_DSNS: List[str] = []
+REPLICA_RETRY_AFTER = 10.0   # seconds an unreachable replica is skipped
+READ_YOUR_WRITES_MAX_SESSIONS = 100_000
+
+# ---- Storage backend ----
+BACKENDS = ("postgres", "sqlite")
+DB_BACKEND = "postgres"      # "sqlite" = embedded file, see sqlite_backend.py
+SQLITE_PATH = "fitness_tracker.db"
+
+# ---- Connection pool settings ----
+POOL_MIN_SIZE = 1            # connections kept open even when idle
+POOL_MAX_SIZE = 10           # hard cap on open connections
+POOL_TIMEOUT = 30.0          # seconds to wait for a free connection
+POOL_IDLE_TIMEOUT = 300.0    # idle connections above min size are closed after this
+POOL_HEALTH_CHECK_AFTER = 30.0  # ping connections that sat idle longer than this
+
+# psycopg2 connection class for new connections (instrument.enable() sets it)
+CONNECTION_FACTORY = None
+
+
+class PoolError(Exception):
+    pass
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class PoolClosed(PoolError):
+    pass
 
 
-def get_connection():
+@dataclass
+class PoolStats:
+    size: int
+    idle: int
+    in_use: int
+    checkouts: int
+    waits: int
+    wait_time: float
+    timeouts: int
+    created: int
+    closed: int
+    evicted: int
+    failed_health_checks: int
+
+
+@dataclass
+class ReplicaStats:
+    server: str              # host:port/dbname
+    up: bool
+    reads: int
+    failures: int
+    behind: int              # skipped: had not replayed a read-your-writes session's commits
+
+
+def allocate_ids(cur, table: str, n: int) -> List[int]:
+    # Reserve n identity values up front so a multi-row insert knows its ids (and
+    # child rows can reference them) without relying on RETURNING order.
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s);",
+        (table, n),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def configure_backend(name: str, sqlite_path: str = None):
+    # Call before the first get_connection(); an existing pool is closed.
+    global DB_BACKEND, SQLITE_PATH
+    if name not in BACKENDS:
+        raise ValueError(f"unknown backend {name!r} (expected one of {BACKENDS})")
+    DB_BACKEND = name
+    if sqlite_path:
+        SQLITE_PATH = sqlite_path
+    close_pool()
+
+
+def backend() -> str:
+    return DB_BACKEND
+
+
+def connect(dsn: str = None, **kwargs):
+    # kwargs go to psycopg2.connect, e.g. connection_factory. SQLite connections
+    # take none (and are not instrumented).
+    if DB_BACKEND == "sqlite":
+        return sqlite_backend.connect(SQLITE_PATH)
+    kwargs.setdefault("connection_factory", CONNECTION_FACTORY)
+    dsn = dsn or DB_DSN
+    if dsn:
+        return psycopg2.connect(dsn, **kwargs)
     return psycopg2.connect(
         dbname=DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD,
         host=DB_HOST,
         port=DB_PORT,
+        **kwargs,
     )
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect=connect,
+        min_size: int = POOL_MIN_SIZE,
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_TIMEOUT,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        health_check_after: float = POOL_HEALTH_CHECK_AFTER,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        # (conn, last_used) pairs; most recently returned on the right
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._closed_count = 0
+        self._evicted = 0
+        self._failed_health_checks = 0
+
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+            self._size += 1
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _close_connection(self, conn):
+        with self._cond:
+            self._closed_count += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle_locked(self):
+        # Oldest idle connections sit on the left; drop them while we are above min size.
+        now = time.monotonic()
+        evicted = []
+        while self._idle and self._size > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._evicted += 1
+            evicted.append(conn)
+        return evicted
+
+    def getconn(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosed("connection pool is closed")
+                if self._idle:
+                    # LIFO keeps a warm working set and lets the rest idle out
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+
+                if not waited:
+                    waited = True
+                    self._waits += 1
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - start
+                    raise PoolTimeout(
+                        f"no connection available within {timeout:.1f}s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+            if waited:
+                self._wait_time += time.monotonic() - start
+            self._checkouts += 1
+            evicted = self._evict_idle_locked()
+
+        for old in evicted:
+            self._close_connection(old)
+
+        if conn is not None and (
+            conn.closed
+            or (time.monotonic() - last_used > self.health_check_after and not self._is_healthy(conn))
+        ):
+            with self._cond:
+                self._failed_health_checks += 1
+            self._close_connection(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._new_connection()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                to_close = [conn]
+            else:
+                self._idle.append((conn, time.monotonic()))
+                to_close = []
+            to_close.extend(self._evict_idle_locked())
+            self._cond.notify()
+
+        for c in to_close:
+            self._close_connection(c)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        # Same transaction semantics as `with psycopg2.connect(...) as conn`:
+        # commit on success, roll back on error. The socket goes back to the pool.
+        with self.lease(self.getconn(timeout)) as conn:
+            yield conn
+
+    @contextmanager
+    def lease(self, conn):
+        # connection() for a connection already taken with getconn().
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def evict_idle(self):
+        with self._cond:
+            evicted = self._evict_idle_locked()
+        for conn in evicted:
+            self._close_connection(conn)
+        return len(evicted)
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            return PoolStats(
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                checkouts=self._checkouts,
+                waits=self._waits,
+                wait_time=self._wait_time,
+                timeouts=self._timeouts,
+                created=self._created,
+                closed=self._closed_count,
+                evicted=self._evicted,
+                failed_health_checks=self._failed_health_checks,
+            )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        # Checked-out connections are closed when they are returned.
+        for conn in idle:
+            self._close_connection(conn)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class Replica:
+    # One read-only server: its own pool, plus what routing has learnt about it.
+    def __init__(self, dsn: str, max_size: int):
+        self.dsn = dsn
+        self.pool = ConnectionPool(
+            connect=partial(connect, dsn, options="-c default_transaction_read_only=on"),
+            min_size=0,
+            max_size=max_size,
+        )
+        self._lock = threading.Lock()    # request threads share a replica; guards the counters
+        self.down_until = 0.0
+        self.replayed = 0        # highest WAL replay position seen, see _lsn()
+        self.reads = 0
+        self.failures = 0
+        self.behind = 0
+
+    def checkout(self, timeout: Optional[float], min_lsn: int):
+        # A connection, or None while the replica is unreachable or has not yet
+        # replayed min_lsn. A full pool still raises PoolTimeout, as on the primary.
+        if time.monotonic() < self.down_until:
+            return None
+        try:
+            conn = self.pool.getconn(timeout)
+        except psycopg2.OperationalError:
+            self._mark_down()
+            return None
+        if min_lsn > self.replayed:
+            try:
+                with conn.cursor() as cur:
+                    # A server that is not in recovery (a stand-in) reports its own position.
+                    cur.execute("SELECT COALESCE(pg_last_wal_replay_lsn(), pg_current_wal_lsn());")
+                    replayed = _lsn(cur.fetchone()[0])
+                with self._lock:
+                    self.replayed = max(self.replayed, replayed)
+            except psycopg2.Error:
+                self.pool.putconn(conn, discard=True)
+                self._mark_down()
+                return None
+            if min_lsn > self.replayed:
+                with self._lock:
+                    self.behind += 1
+                self.pool.putconn(conn)
+                return None
+        with self._lock:
+            self.reads += 1
+        return conn
+
+    def _mark_down(self):
+        with self._lock:
+            self.failures += 1
+        self.down_until = time.monotonic() + REPLICA_RETRY_AFTER
+
+    def stats(self) -> ReplicaStats:
+        with self._lock:
+            return ReplicaStats(
+                server=_describe(self.dsn),
+                up=time.monotonic() >= self.down_until,
+                reads=self.reads,
+                failures=self.failures,
+                behind=self.behind,
+            )
+
+
+def _describe(dsn: str) -> str:
+    # For stats: no credentials.
+    params = extensions.parse_dsn(dsn)
+    return f"{params.get('host', 'localhost')}:{params.get('port', '5432')}/{params.get('dbname', '')}"
+
+
+def _lsn(text: str) -> int:
+    # '16/B374D848' -> an integer that orders like the WAL position.
+    high, _, low = text.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_replicas: List[Replica] = []    # created and closed together with _pool
+_replica_turn = itertools.count()
+# Pools inherited through fork(): their sockets belong to the parent, so a child
+# must neither use nor close them. Kept referenced so they are never finalized.
+_inherited_pools = []
+
+# Read-your-writes: session key -> WAL position after its last commit on the
+# primary, least recently written first.
+_session_key: ContextVar = ContextVar("read_your_writes", default=None)
+_written = OrderedDict()
+_written_lock = threading.Lock()
+
+
+def _new_replicas(max_size: int) -> List[Replica]:
+    if DB_BACKEND != "postgres":
+        return []
+    return [Replica(dsn, max_size) for dsn in DB_REPLICA_DSNS]
+
+
+def _retire(pool: ConnectionPool, replicas: List[Replica], pid: int):
+    for p in [pool] + [r.pool for r in replicas]:
+        if pid == os.getpid():
+            p.close()
+        else:
+            _inherited_pools.append(p)
+
+
+def configure_pool(**kwargs) -> ConnectionPool:
+    global _pool, _pool_pid, _replicas
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(**kwargs)
+        old_replicas, _replicas = _replicas, _new_replicas(_pool.max_size)
+        old_pid, _pool_pid = _pool_pid, os.getpid()
+    if old is not None:
+        _retire(old, old_replicas, old_pid)
+    return _pool
+
+
+def configure_replicas(replicas: Iterable[str], primary: str = None):
+    # Call before the first get_connection(); existing pools are closed.
+    global DB_REPLICA_DSNS, DB_DSN
+    DB_REPLICA_DSNS = list(replicas)
+    if primary:
+        DB_DSN = primary
+    close_pool()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool, _pool_pid, _replicas
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is not None and _pool_pid != os.getpid():
+                _inherited_pools.append(_pool)
+                _inherited_pools.extend(r.pool for r in _replicas)
+                _pool = None
+            if _pool is None:
+                _pool = ConnectionPool()
+                _replicas = _new_replicas(_pool.max_size)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def get_replicas() -> List[Replica]:
+    get_pool()
+    return _replicas
+
+
+def get_connection(timeout: float = None, readonly: bool = False):
+    # readonly=True may be served by a replica: the block must not write, and it
+    # may miss the latest commits unless it runs inside read_your_writes().
+    if DB_REPLICA_DSNS and DB_BACKEND == "postgres":
+        if readonly:
+            return _replica_connection(timeout)
+        if _session_key.get() is not None:
+            return _primary_connection(timeout)
+    return get_pool().connection(timeout)
+
+
+@contextmanager
+def _primary_connection(timeout: Optional[float]):
+    with get_pool().connection(timeout) as conn:
+        yield conn
+        conn.commit()
+        note_writes(conn, [_session_key.get()])
+
+
+@contextmanager
+def _replica_connection(timeout: Optional[float]):
+    key = _session_key.get()
+    with _written_lock:
+        min_lsn = _written.get(key, 0) if key is not None else 0
+    replicas = get_replicas()
+    first = next(_replica_turn)
+    for i in range(len(replicas)):
+        replica = replicas[(first + i) % len(replicas)]
+        conn = replica.checkout(timeout, min_lsn)
+        if conn is not None:
+            with replica.pool.lease(conn) as conn:
+                yield conn
+            return
+    # Every replica is down or behind this session: read from the primary.
+    with get_pool().connection(timeout) as conn:
+        yield conn
+
+
+@contextmanager
+def read_your_writes(key):
+    # Opt-in per session (key: e.g. a session token; None leaves it off). Commits
+    # made on the primary inside the block are remembered under the key, and
+    # readonly connections then come only from replicas that have replayed them.
+    token = _session_key.set(key)
+    try:
+        yield
+    finally:
+        _session_key.reset(token)
+
+
+def consistency_key():
+    return _session_key.get()
+
+
+def note_writes(conn, keys: Iterable):
+    # Call after a commit on conn (a primary connection): every session key in
+    # keys must now see at least the primary's current WAL position.
+    keys = [k for k in keys if k is not None]
+    if not keys or not DB_REPLICA_DSNS or DB_BACKEND != "postgres":
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_current_wal_lsn();")
+        lsn = _lsn(cur.fetchone()[0])
+    with _written_lock:
+        for key in keys:
+            _written[key] = max(lsn, _written.get(key, 0))
+            _written.move_to_end(key)
+        while len(_written) > READ_YOUR_WRITES_MAX_SESSIONS:
+            _written.popitem(last=False)
+
+
+def pool_stats() -> PoolStats:
+    return get_pool().stats()
+
+
+def replica_stats() -> List[ReplicaStats]:
+    return [r.stats() for r in get_replicas()]
+
+
+def close_pool():
+    global _pool, _replicas
+    with _pool_lock:
+        pool, _pool = _pool, None
+        replicas, _replicas = _replicas, []
+    if pool is not None:
+        _retire(pool, replicas, _pool_pid)
+
+
+atexit.register(close_pool)
@@ -0,0 +1,497 @@
+# exporter.py
+# Streaming export/import. Each section is read through a named (server-side)
+# cursor in batches of `batch_size` rows and written straight to the output file,
+# so memory stays bounded by one batch however much history a user has.
+#
+# Layouts:
+#   nested (default, version 2) - every workout/meal appears once with its
+#       exercises/foods embedded; this is what `import` reads back.
+#   flat (legacy) - the original four sections, where workout_exercises and
+#       meal_foods repeat the parent columns for every child row.
+import argparse
+import json
+import os
+import sys
+from contextlib import nullcontext
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, TextIO, Tuple
+
+from psycopg2.extras import DictCursor, execute_values
+
+import db
+import summaries
+from db import get_connection
+from models import ValidationError
+
+EXPORT_BATCH_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+FORMATS = ("json", "ndjson")
+LAYOUTS = ("nested", "flat")
+EXPORT_FORMAT_NAME = "fitness-tracker-export"
+EXPORT_VERSION = 2
+
+# (section, query). %(since)s is applied to the log date of each row.
+_FLAT_SECTIONS = [
+    (
+        "workouts",
+        """
+        SELECT * FROM workout_logs
+        WHERE user_id = %(user_id)s AND workout_date >= %(since)s
+        ORDER BY workout_date, id;
+        """,
+    ),
+    (
+        "workout_exercises",
+        """
+        SELECT wl.*, we.exercise_id, we.sets, we.reps, we.weight_used_kg
+        FROM workout_logs wl
+        LEFT JOIN workout_exercises we ON wl.id = we.workout_id
+        WHERE wl.user_id = %(user_id)s AND wl.workout_date >= %(since)s
+        ORDER BY wl.workout_date, wl.id;
+        """,
+    ),
+    (
+        "meals",
+        """
+        SELECT * FROM meal_logs
+        WHERE user_id = %(user_id)s AND meal_date >= %(since)s
+        ORDER BY meal_date, id;
+        """,
+    ),
+    (
+        "meal_foods",
+        """
+        SELECT ml.*, mf.food_id, mf.quantity
+        FROM meal_logs ml
+        LEFT JOIN meal_foods mf ON ml.id = mf.meal_id
+        WHERE ml.user_id = %(user_id)s AND ml.meal_date >= %(since)s
+        ORDER BY ml.meal_date, ml.id;
+        """,
+    ),
+]
+
+# Children are aggregated server-side, so each parent row crosses the wire once.
+_NESTED_SECTIONS = [
+    (
+        "workouts",
+        """
+        SELECT wl.id, wl.workout_date, wl.workout_type, wl.duration_min,
+               wl.intensity, wl.calories_burned,
+               COALESCE((
+                   SELECT json_agg(json_build_object(
+                              'exercise_id', we.exercise_id,
+                              'exercise_name', e.exercise_name,
+                              'sets', we.sets,
+                              'reps', we.reps,
+                              'weight_used_kg', we.weight_used_kg)
+                          ORDER BY we.exercise_id)
+                   FROM workout_exercises we
+                   JOIN exercises e ON e.id = we.exercise_id
+                   WHERE we.workout_id = wl.id
+               ), '[]'::json) AS exercises
+        FROM workout_logs wl
+        WHERE wl.user_id = %(user_id)s AND wl.workout_date >= %(since)s
+        ORDER BY wl.workout_date, wl.id;
+        """,
+    ),
+    (
+        "meals",
+        """
+        SELECT ml.id, ml.meal_date, ml.meal_type,
+               ml.calories, ml.protein_g, ml.carbs_g, ml.fats_g,
+               COALESCE((
+                   SELECT json_agg(json_build_object(
+                              'food_id', mf.food_id,
+                              'food_name', f.food_name,
+                              'quantity', mf.quantity)
+                          ORDER BY mf.food_id)
+                   FROM meal_foods mf
+                   JOIN foods f ON f.id = mf.food_id
+                   WHERE mf.meal_id = ml.id
+               ), '[]'::json) AS foods
+        FROM meal_logs ml
+        WHERE ml.user_id = %(user_id)s AND ml.meal_date >= %(since)s
+        ORDER BY ml.meal_date, ml.id;
+        """,
+    ),
+]
+
+
+# SQLite has no json_agg: json_group_array over an ordered subquery, returned as
+# text and parsed in stream_export. Section name -> (query, JSON column).
+_NESTED_SECTIONS_SQLITE = {
+    "workouts": (
+        """
+        SELECT wl.id, wl.workout_date, wl.workout_type, wl.duration_min,
+               wl.intensity, wl.calories_burned,
+               (
+                   SELECT json_group_array(json_object(
+                              'exercise_id', c.exercise_id,
+                              'exercise_name', c.exercise_name,
+                              'sets', c.sets,
+                              'reps', c.reps,
+                              'weight_used_kg', c.weight_used_kg))
+                   FROM (
+                       SELECT we.exercise_id, e.exercise_name, we.sets, we.reps, we.weight_used_kg
+                       FROM workout_exercises we
+                       JOIN exercises e ON e.id = we.exercise_id
+                       WHERE we.workout_id = wl.id
+                       ORDER BY we.exercise_id
+                   ) c
+               ) AS exercises
+        FROM workout_logs wl
+        WHERE wl.user_id = %(user_id)s AND wl.workout_date >= %(since)s
+        ORDER BY wl.workout_date, wl.id;
+        """,
+        "exercises",
+    ),
+    "meals": (
+        """
+        SELECT ml.id, ml.meal_date, ml.meal_type,
+               ml.calories, ml.protein_g, ml.carbs_g, ml.fats_g,
+               (
+                   SELECT json_group_array(json_object(
+                              'food_id', c.food_id,
+                              'food_name', c.food_name,
+                              'quantity', c.quantity))
+                   FROM (
+                       SELECT mf.food_id, f.food_name, mf.quantity
+                       FROM meal_foods mf
+                       JOIN foods f ON f.id = mf.food_id
+                       WHERE mf.meal_id = ml.id
+                       ORDER BY mf.food_id
+                   ) c
+               ) AS foods
+        FROM meal_logs ml
+        WHERE ml.user_id = %(user_id)s AND ml.meal_date >= %(since)s
+        ORDER BY ml.meal_date, ml.id;
+        """,
+        "foods",
+    ),
+}
+
+
+def _nested_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def write_export(
+    out: TextIO,
+    fmt: str,
+    header: dict,
+    sections: Iterable[Tuple[str, Iterable[dict]]],
+    layout: str = "nested",
+) -> Dict[str, int]:
+    # Shared by stream_export and bench/export_format.py.
+    default = _nested_default if layout == "nested" else str
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, default=default)
+
+    if fmt == "ndjson":
+        out.write(dumps({"type": "header", **header}) + "\n")
+    else:
+        out.write("{" + ", ".join(f"{dumps(k)}: {dumps(v)}" for k, v in header.items()))
+
+    counts = {}
+    for name, rows in sections:
+        n = 0
+        if fmt == "json":
+            out.write(f', "{name}": [')
+        for row in rows:
+            if fmt == "ndjson":
+                out.write(dumps({"type": name, "row": row}) + "\n")
+            else:
+                out.write(("\n" if n == 0 else ",\n") + dumps(row))
+            n += 1
+        if fmt == "json":
+            out.write("]")
+        counts[name] = n
+
+    if fmt == "json":
+        out.write("}\n")
+    return counts
+
+
+def _iter_section(conn, name: str, sql: str, params: dict, batch_size: int):
+    with conn.cursor(name=f"export_{name}", cursor_factory=DictCursor) as cur:
+        cur.itersize = batch_size
+        cur.execute(sql, params)
+        for row in cur:
+            yield dict(row)
+
+
+def _parse_json_column(rows: Iterable[dict], column: str):
+    for row in rows:
+        row[column] = json.loads(row[column])
+        yield row
+
+
+def stream_export(
+    user_id: int,
+    out: TextIO,
+    fmt: str = "json",
+    since: Optional[date] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    layout: str = "nested",
+    conn=None,
+) -> Dict[str, int]:
+    # Uses `conn` when given (left open, transaction untouched), else a pooled one.
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {FORMATS})")
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown export layout {layout!r} (expected one of {LAYOUTS})")
+
+    params = {"user_id": user_id, "since": since or date.min}
+    if layout == "nested":
+        header = {
+            "format": EXPORT_FORMAT_NAME,
+            "version": EXPORT_VERSION,
+            "user_id": user_id,
+            "since": since,
+        }
+        queries = _NESTED_SECTIONS
+    else:
+        header = {"user_id": user_id, "since": since}
+        queries = _FLAT_SECTIONS
+
+    with nullcontext(conn) if conn is not None else get_connection(readonly=True) as conn:
+        # Generators: each named cursor is opened only when its section is written.
+        if layout == "nested" and db.backend() == "sqlite":
+            sections = [
+                (name, _parse_json_column(_iter_section(conn, name, sql, params, batch_size), column))
+                for name, (sql, column) in _NESTED_SECTIONS_SQLITE.items()
+            ]
+        else:
+            sections = [(name, _iter_section(conn, name, sql, params, batch_size)) for name, sql in queries]
+        return write_export(out, fmt, header, sections, layout)
+
+
+def export_to_path(
+    user_id: int,
+    path: str,
+    fmt: str = "json",
+    since: Optional[date] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    layout: str = "nested",
+    conn=None,
+) -> Dict[str, int]:
+    # Write to a temporary name first so a failed export never leaves half a file.
+    tmp_path = path + ".part"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            counts = stream_export(user_id, f, fmt, since, batch_size, layout, conn)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return counts
+
+
+def default_filename(user_id: int, fmt: str = "json") -> str:
+    return f"user_{user_id}_export.{fmt}"
+
+
+# ---- IMPORT -------------------------------------------------------------
+
+
+def _read_export(path: str):
+    # Returns (header, iterator of (section, row)) for either format.
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+    try:
+        head = json.loads(first)
+    except ValueError:
+        head = None
+
+    if isinstance(head, dict) and head.get("type") == "header":
+        def records():
+            with open(path, encoding="utf-8") as f:
+                next(f)
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield record["type"], record["row"]
+
+        header = {k: v for k, v in head.items() if k != "type"}
+        return header, records()
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    header = {k: v for k, v in data.items() if not isinstance(v, list)}
+    return header, ((name, row) for name in ("workouts", "meals") for row in data.get(name, []))
+
+
+def _resolve(ref: dict, id_key: str, name_key: str, by_name: dict, ids: set) -> Optional[int]:
+    # Catalog ids differ between databases, so prefer the unique name.
+    name = ref.get(name_key)
+    if name is not None and name in by_name:
+        return by_name[name]
+    if name is None and ref.get(id_key) in ids:
+        return ref[id_key]
+    return None
+
+
+def _catalog(cur, table: str, name_col: str):
+    cur.execute(f"SELECT id, {name_col} FROM {table};")
+    rows = cur.fetchall()
+    return {r[1]: r[0] for r in rows}, {r[0] for r in rows}
+
+
+def _flush_workouts(cur, user_id, batch, exercises_by_name, exercise_ids, stats):
+    ids = db.allocate_ids(cur, "workout_logs", len(batch))
+    execute_values(
+        cur,
+        """
+        INSERT INTO workout_logs
+            (id, user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+        OVERRIDING SYSTEM VALUE VALUES %s;
+        """,
+        [
+            (new_id, user_id, w.get("workout_type"), w.get("duration_min"), w.get("intensity"),
+             w.get("calories_burned"), w["workout_date"])
+            for new_id, w in zip(ids, batch)
+        ],
+    )
+    children = []
+    for new_id, w in zip(ids, batch):
+        for ex in w.get("exercises") or []:
+            exercise_id = _resolve(ex, "exercise_id", "exercise_name", exercises_by_name, exercise_ids)
+            if exercise_id is None:
+                stats["unresolved_exercises"] += 1
+                continue
+            children.append(
+                (new_id, exercise_id, ex.get("sets"), ex.get("reps"), ex.get("weight_used_kg"), w["workout_date"])
+            )
+    if children:
+        execute_values(
+            cur,
+            """
+            INSERT INTO workout_exercises (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date)
+            VALUES %s ON CONFLICT (workout_id, exercise_id) DO NOTHING;
+            """,
+            children,
+        )
+    stats["workouts"] += len(batch)
+    stats["workout_exercises"] += len(children)
+
+
+def _flush_meals(cur, user_id, batch, foods_by_name, food_ids, stats):
+    ids = db.allocate_ids(cur, "meal_logs", len(batch))
+    execute_values(
+        cur,
+        """
+        INSERT INTO meal_logs
+            (id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g)
+        OVERRIDING SYSTEM VALUE VALUES %s;
+        """,
+        [
+            (new_id, user_id, m.get("meal_type"), m["meal_date"], m.get("calories"),
+             m.get("protein_g"), m.get("carbs_g"), m.get("fats_g"))
+            for new_id, m in zip(ids, batch)
+        ],
+    )
+    children = []
+    for new_id, m in zip(ids, batch):
+        for food in m.get("foods") or []:
+            food_id = _resolve(food, "food_id", "food_name", foods_by_name, food_ids)
+            if food_id is None:
+                stats["unresolved_foods"] += 1
+                continue
+            children.append((new_id, food_id, food.get("quantity"), m["meal_date"]))
+    if children:
+        execute_values(
+            cur,
+            """
+            INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date)
+            VALUES %s ON CONFLICT (meal_id, food_id) DO NOTHING;
+            """,
+            children,
+        )
+    stats["meals"] += len(batch)
+    stats["meal_foods"] += len(children)
+
+
+def import_export(path: str, user_id: Optional[int] = None, batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, int]:
+    # Loads a nested export into `user_id` (default: the exporting user) in one
+    # transaction. Meal totals are taken from the file, not recomputed.
+    header, records = _read_export(path)
+    if header.get("format") != EXPORT_FORMAT_NAME or header.get("version") != EXPORT_VERSION:
+        raise ValidationError("Only nested (version 2) exports can be imported; re-export with --layout nested.")
+    user_id = user_id or header.get("user_id")
+    if not user_id:
+        raise ValidationError("No target user id given and none recorded in the export.")
+
+    stats = {k: 0 for k in ("workouts", "workout_exercises", "meals", "meal_foods",
+                            "unresolved_exercises", "unresolved_foods")}
+
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM users WHERE id = %s;", (user_id,))
+        if not cur.fetchone():
+            raise ValidationError(f"User {user_id} does not exist.")
+
+        exercises_by_name, exercise_ids = _catalog(cur, "exercises", "exercise_name")
+        foods_by_name, food_ids = _catalog(cur, "foods", "food_name")
+
+        workouts, meals = [], []
+        for section, row in records:
+            if section == "workouts":
+                workouts.append(row)
+                if len(workouts) >= batch_size:
+                    _flush_workouts(cur, user_id, workouts, exercises_by_name, exercise_ids, stats)
+                    workouts = []
+            elif section == "meals":
+                meals.append(row)
+                if len(meals) >= batch_size:
+                    _flush_meals(cur, user_id, meals, foods_by_name, food_ids, stats)
+                    meals = []
+        if workouts:
+            _flush_workouts(cur, user_id, workouts, exercises_by_name, exercise_ids, stats)
+        if meals:
+            _flush_meals(cur, user_id, meals, foods_by_name, food_ids, stats)
+
+        summaries.rebuild_user(cur, user_id)
+        conn.commit()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a user's data, or import a nested export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="stream a user's data to JSON or NDJSON")
+    p_export.add_argument("user_id", type=int)
+    p_export.add_argument("--format", choices=FORMATS, default="json")
+    p_export.add_argument("--layout", choices=LAYOUTS, default="nested")
+    p_export.add_argument("--since", type=date.fromisoformat, help="only logs on/after YYYY-MM-DD")
+    p_export.add_argument("--output", help="output file (default user_<id>_export.<format>)")
+    p_export.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+
+    p_import = sub.add_parser("import", help="load a nested export (JSON or NDJSON)")
+    p_import.add_argument("path")
+    p_import.add_argument("--user-id", type=int, help="target user (default: the exporting user)")
+    p_import.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    argv = sys.argv[1:]
+    if argv and argv[0].isdigit():
+        argv.insert(0, "export")  # the original `python exporter.py USER_ID [options]`
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        path = args.output or default_filename(args.user_id, args.format)
+        counts = export_to_path(args.user_id, path, args.format, args.since, args.batch_size, args.layout)
+        summary = ", ".join(f"{k}={v}" for k, v in counts.items())
+        print(f"Data exported to {path} ({summary})")
+    else:
+        stats = import_export(args.path, args.user_id, args.batch_size)
+        print("Imported " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
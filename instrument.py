@@ -0,0 +1,315 @@
+# instrument.py
+# Query instrumentation. With enable(), pooled connections are created as
+# InstrumentedConnection, whose cursors (whatever cursor_factory the caller asks
+# for) time every statement and count rows returned and round trips. Figures are
+# grouped by operation: the outermost `with operation(name)` block (the HTTP
+# server names each request after its route handler), otherwise the outermost
+# services/exporter/analytics function on the stack, e.g. "add_food_to_meal".
+#
+# Statements slower than the threshold are appended to a JSON-lines log with
+# their EXPLAIN plan; render_metrics() returns every counter in the Prometheus
+# text format (served as GET /metrics by server.py --instrument).
+import json
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import psycopg2
+from psycopg2 import extensions
+
+import db
+
+SLOW_QUERY_MS = 200.0
+SLOW_QUERY_LOG = "slow_queries.log"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+OPERATION_MODULES = ("services", "exporter", "analytics", "batch_reports")
+
+_EXPLAINABLE = re.compile(rb"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_MAX_LOGGED_QUERY = 4000
+
+
+@dataclass
+class OperationStats:
+    calls: int = 0            # operation() blocks finished
+    seconds: float = 0.0      # time spent inside them
+    statements: int = 0
+    statement_seconds: float = 0.0
+    rows: int = 0             # rows returned (result sets and COPY)
+    round_trips: int = 0      # statements plus commits/rollbacks
+    slow: int = 0
+    errors: int = 0           # statements that raised
+    buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+
+
+@dataclass
+class _Settings:
+    enabled: bool = False
+    slow_ms: float = SLOW_QUERY_MS
+    log_path: Optional[str] = SLOW_QUERY_LOG
+    explain: bool = True
+
+
+_settings = _Settings()
+_stats: Dict[str, OperationStats] = {}
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_current: ContextVar[Optional[str]] = ContextVar("instrument_operation", default=None)
+
+
+def enable(slow_ms: float = SLOW_QUERY_MS, log_path: Optional[str] = SLOW_QUERY_LOG, explain: bool = True):
+    # Call before the pool hands out connections: only connections created
+    # afterwards are instrumented.
+    _settings.slow_ms = slow_ms
+    _settings.log_path = log_path
+    _settings.explain = explain
+    _settings.enabled = True
+    db.CONNECTION_FACTORY = InstrumentedConnection
+
+
+def disable():
+    _settings.enabled = False
+    db.CONNECTION_FACTORY = None
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def snapshot() -> Dict[str, OperationStats]:
+    with _lock:
+        return {name: OperationStats(**{**vars(s), "buckets": list(s.buckets)}) for name, s in _stats.items()}
+
+
+def totals() -> OperationStats:
+    total = OperationStats()
+    for s in snapshot().values():
+        for name in ("calls", "seconds", "statements", "statement_seconds", "rows", "round_trips", "slow", "errors"):
+            setattr(total, name, getattr(total, name) + getattr(s, name))
+        total.buckets = [a + b for a, b in zip(total.buckets, s.buckets)]
+    return total
+
+
+def _get(name: str) -> OperationStats:
+    # Caller holds _lock.
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = OperationStats()
+    return stats
+
+
+@contextmanager
+def operation(name: str):
+    # Nested blocks keep the outer name, so a route calling several services is
+    # reported once, under the route.
+    if not _settings.enabled or _current.get() is not None:
+        yield
+        return
+    token = _current.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _current.reset(token)
+        with _lock:
+            stats = _get(name)
+            stats.calls += 1
+            stats.seconds += elapsed
+
+
+def current_operation() -> str:
+    name = _current.get()
+    if name is not None:
+        return name
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get("__name__") in OPERATION_MODULES and not frame.f_code.co_name.startswith("<"):
+            name = frame.f_code.co_name
+        frame = frame.f_back
+    return name or "other"
+
+
+# ---- cursors and connections -------------------------------------------------
+
+
+def _record(cur, started: float, round_trips: int = 1, rows: Optional[int] = None, failed: bool = False):
+    elapsed = time.perf_counter() - started
+    name = current_operation()
+    if rows is None:
+        rows = max(cur.rowcount, 0) if cur.description is not None else 0
+    slow = elapsed * 1000 >= _settings.slow_ms and not failed
+    with _lock:
+        stats = _get(name)
+        stats.statements += 1
+        stats.statement_seconds += elapsed
+        stats.rows += rows
+        stats.round_trips += round_trips
+        stats.slow += slow
+        stats.errors += failed
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                stats.buckets[i] += 1
+                break
+    if slow:
+        _log_slow(cur, name, elapsed, rows)
+
+
+def _explain(conn, query: bytes) -> Optional[str]:
+    if not _EXPLAINABLE.match(query):
+        return None
+    status = conn.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_INERROR:
+        return None
+    in_transaction = status == extensions.TRANSACTION_STATUS_INTRANS
+    # A plain cursor: the EXPLAIN itself must not be instrumented. The savepoint
+    # keeps a failing EXPLAIN from aborting the caller's transaction.
+    with extensions.cursor(conn) as cur:
+        if in_transaction:
+            cur.execute("SAVEPOINT instrument_explain;")
+        try:
+            cur.execute(b"EXPLAIN " + query)
+            plan = "\n".join(r[0] for r in cur.fetchall())
+        except psycopg2.Error as e:
+            if in_transaction:
+                cur.execute("ROLLBACK TO SAVEPOINT instrument_explain;")
+            return f"EXPLAIN failed: {str(e).strip()}"
+        if in_transaction:
+            cur.execute("RELEASE SAVEPOINT instrument_explain;")
+    return plan
+
+
+def _log_slow(cur, name: str, elapsed: float, rows: int):
+    if not _settings.log_path:
+        return
+    query = cur.query or b""
+    plan = _explain(cur.connection, query) if _settings.explain else None
+    entry = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "operation": name,
+        "ms": round(elapsed * 1000, 2),
+        "rows": rows,
+        "query": query.decode(cur.connection.encoding, "replace")[:_MAX_LOGGED_QUERY],
+        "plan": plan,
+    }
+    with _log_lock, open(_settings.log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+@lru_cache(maxsize=None)
+def _instrumented(factory):
+    # Subclass of the cursor class the caller asked for (plain, DictCursor ...).
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            result = factory.execute(self, query, vars)
+        except Exception:
+            _record(self, started, rows=0, failed=True)
+            raise
+        _record(self, started)
+        return result
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        started = time.perf_counter()
+        try:
+            result = factory.executemany(self, query, vars_list)
+        except Exception:
+            _record(self, started, len(vars_list), rows=0, failed=True)
+            raise
+        _record(self, started, len(vars_list), rows=0)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            result = factory.copy_expert(self, sql, file, size)
+        except Exception:
+            _record(self, started, rows=0, failed=True)
+            raise
+        _record(self, started, rows=max(self.rowcount, 0))
+        return result
+
+    return type(
+        f"Instrumented{factory.__name__}", (factory,),
+        {"execute": execute, "executemany": executemany, "copy_expert": copy_expert},
+    )
+
+
+class InstrumentedConnection(extensions.connection):
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop("cursor_factory", None) or self.cursor_factory or extensions.cursor
+        return super().cursor(*args, cursor_factory=_instrumented(factory), **kwargs)
+
+    def _end(self, end):
+        # Commits and rollbacks with nothing to end send nothing to the server.
+        if self.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE:
+            return end()
+        result = end()
+        with _lock:
+            _get(current_operation()).round_trips += 1
+        return result
+
+    def commit(self):
+        return self._end(super().commit)
+
+    def rollback(self):
+        return self._end(super().rollback)
+
+
+# ---- Prometheus text format ---------------------------------------------------------
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric(lines: list, name: str, kind: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        rendered = ",".join(f'{k}="{_label(str(v))}"' for k, v in labels.items())
+        lines.append(f"{name}{{{rendered}}} {value}" if rendered else f"{name} {value}")
+
+
+def render_metrics() -> str:
+    ops = sorted(snapshot().items())
+    lines = []
+
+    def per_op(attr):
+        return [({"operation": name}, getattr(s, attr)) for name, s in ops]
+
+    _metric(lines, "fitness_operation_calls_total", "counter", "Finished operations (HTTP routes).", per_op("calls"))
+    _metric(lines, "fitness_operation_seconds_total", "counter", "Time spent in operations.", per_op("seconds"))
+    _metric(lines, "fitness_db_round_trips_total", "counter", "Statements, commits and rollbacks sent.", per_op("round_trips"))
+    _metric(lines, "fitness_db_rows_total", "counter", "Rows returned by statements.", per_op("rows"))
+    _metric(lines, "fitness_db_slow_statements_total", "counter", "Statements above the slow-query threshold.", per_op("slow"))
+    _metric(lines, "fitness_db_statement_errors_total", "counter", "Statements that raised.", per_op("errors"))
+
+    lines.append("# HELP fitness_db_statement_seconds Statement latency.")
+    lines.append("# TYPE fitness_db_statement_seconds histogram")
+    for name, s in ops:
+        op = _label(name)
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, s.buckets):
+            cumulative += n
+            lines.append(f'fitness_db_statement_seconds_bucket{{operation="{op}",le="{bound:g}"}} {cumulative}')
+        lines.append(f'fitness_db_statement_seconds_bucket{{operation="{op}",le="+Inf"}} {s.statements}')
+        lines.append(f'fitness_db_statement_seconds_sum{{operation="{op}"}} {s.statement_seconds}')
+        lines.append(f'fitness_db_statement_seconds_count{{operation="{op}"}} {s.statements}')
+
+    pool = db.pool_stats()
+    _metric(lines, "fitness_db_pool_connections", "gauge", "Pooled connections by state.",
+            [({"state": "idle"}, pool.idle), ({"state": "in_use"}, pool.in_use)])
+    _metric(lines, "fitness_db_pool_waits_total", "counter", "Checkouts that had to wait.", [({}, pool.waits)])
+    _metric(lines, "fitness_db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.",
+            [({}, pool.wait_time)])
+    _metric(lines, "fitness_db_pool_timeouts_total", "counter", "Checkouts that timed out.", [({}, pool.timeouts)])
+    return "\n".join(lines) + "\n"
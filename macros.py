@@ -0,0 +1,131 @@
+# macros.py
+# Meal macro totals (meal_logs.calories/protein_g/carbs_g/fats_g). Adding or
+# changing one food re-sums that meal's totals from meal_foods; the set-wise
+# recompute does the same for many meals at once (after a food's macros change,
+# or as maintenance via `python macros.py recompute`).
+import argparse
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+
+from psycopg2.extras import DictCursor
+
+import summaries
+from db import get_connection
+
+# Totals are always summed from meal_foods and rounded once, so a meal built up
+# food by food ends with exactly the values a recompute would give it.
+_TOTALS = """
+               ROUND(SUM(f.calories_per_serv * mf.quantity), 2) AS total_cal,
+               ROUND(SUM(f.protein_g * mf.quantity), 2)         AS total_protein,
+               ROUND(SUM(f.carbs_g * mf.quantity), 2)           AS total_carbs,
+               ROUND(SUM(f.fats_g * mf.quantity), 2)            AS total_fats"""
+
+_MEAL_TOTALS_SQL = f"""
+    UPDATE meal_logs ml
+    SET calories  = sub.total_cal,
+        protein_g = sub.total_protein,
+        carbs_g   = sub.total_carbs,
+        fats_g    = sub.total_fats
+    FROM (
+        SELECT mf.meal_id,{_TOTALS}
+        FROM meal_foods mf
+        JOIN foods f ON f.id = mf.food_id
+        WHERE mf.meal_id = %(meal_id)s
+        GROUP BY mf.meal_id
+    ) sub
+    WHERE ml.id = sub.meal_id AND ml.meal_date = %(meal_date)s
+    RETURNING ml.id, ml.user_id, ml.meal_type, ml.meal_date,
+              ml.calories, ml.protein_g, ml.carbs_g, ml.fats_g;
+"""
+
+# {{meal_filter}} restricts which meals are recomputed (see the callers below).
+# Meals whose stored totals already match are left untouched.
+_RECOMPUTE_SQL = f"""
+    UPDATE meal_logs ml
+    SET calories  = sub.total_cal,
+        protein_g = sub.total_protein,
+        carbs_g   = sub.total_carbs,
+        fats_g    = sub.total_fats
+    FROM (
+        SELECT mf.meal_id,{_TOTALS}
+        FROM meal_foods mf
+        JOIN foods f ON f.id = mf.food_id
+        WHERE {{meal_filter}}
+        GROUP BY mf.meal_id
+    ) sub
+    WHERE ml.id = sub.meal_id
+      AND (ml.calories, ml.protein_g, ml.carbs_g, ml.fats_g)
+          IS DISTINCT FROM (sub.total_cal, sub.total_protein, sub.total_carbs, sub.total_fats)
+    RETURNING ml.user_id, ml.meal_date;
+"""
+
+
+def set_food_quantity(cur, meal_id: int, food_id: int, quantity: float, meal_date: date):
+    # Upserts one meal_foods row and re-sums that meal's totals. The caller must
+    # hold the meal_logs row lock (SELECT ... FOR UPDATE) so concurrent edits of
+    # the same meal see each other's rows.
+    quantity = Decimal(str(quantity)).quantize(Decimal("0.001"))  # meal_foods.quantity is DECIMAL(8,3)
+    cur.execute(
+        """
+        INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (meal_id, food_id)
+        DO UPDATE SET quantity = EXCLUDED.quantity;
+        """,
+        (meal_id, food_id, quantity, meal_date),
+    )
+    cur.execute(_MEAL_TOTALS_SQL, {"meal_id": meal_id, "meal_date": meal_date})
+    return cur.fetchone()
+
+
+def _recompute(cur, meal_filter: str, params: Optional[dict] = None) -> List[Tuple[int, date]]:
+    cur.execute(_RECOMPUTE_SQL.format(meal_filter=meal_filter), params)
+    return [(r[0], r[1]) for r in cur.fetchall()]
+
+
+def recompute_meals(cur, meal_ids: Iterable[int]) -> List[Tuple[int, date]]:
+    # Returns the (user_id, meal_date) of every meal whose totals changed.
+    return _recompute(cur, "mf.meal_id = ANY(%(ids)s)", {"ids": list(meal_ids)})
+
+
+def recompute_for_foods(cur, food_ids: Iterable[int]) -> List[Tuple[int, date]]:
+    return _recompute(
+        cur,
+        "mf.meal_id IN (SELECT meal_id FROM meal_foods WHERE food_id = ANY(%(ids)s))",
+        {"ids": list(food_ids)},
+    )
+
+
+def recompute_all(cur) -> List[Tuple[int, date]]:
+    return _recompute(cur, "TRUE")
+
+
+def recompute(food_ids: Optional[List[int]] = None) -> int:
+    # Maintenance entry point: recompute (all meals or those using food_ids) and
+    # refresh the daily summaries of every day that changed, in one transaction.
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        changed = recompute_for_foods(cur, food_ids) if food_ids else recompute_all(cur)
+        summaries.refresh_days(cur, changed)
+        conn.commit()
+    return len(changed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain meal macro totals")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_recompute = sub.add_parser("recompute", help="rebuild meal totals from meal_foods and foods")
+    p_recompute.add_argument(
+        "--food", type=int, action="append", dest="foods",
+        help="only meals containing this food id (repeatable)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "recompute":
+        n = recompute(args.foods)
+        scope = f"food(s) {', '.join(map(str, args.foods))}" if args.foods else "all meals"
+        print(f"Recomputed totals for {scope}: {n} meal(s) changed.")
+
+
+if __name__ == "__main__":
+    main()
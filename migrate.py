@@ -0,0 +1,267 @@
+# migrate.py
+# Forward-only schema migrations. Files in migrations/ are named NNNN_name.sql and
+# applied in version order, each in its own transaction, with the applied version
+# recorded in schema_migrations. schema.sql stays the bootstrap for a brand-new
+# database; run this afterwards (and on every deploy) to bring it up to date.
+import argparse
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from psycopg2.extras import DictCursor
+
+import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_FILENAME_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+_LOCK_KEY = 0x46495431  # serialises concurrent runners (pg_advisory_lock)
+
+# Hot queries whose plans are printed before and after migrating.
+EXPLAIN_CHECKS = [
+    (
+        "daily report (summary lookup)",
+        "SELECT * FROM daily_summaries WHERE user_id = %(user_id)s AND day = %(day)s",
+    ),
+    (
+        "workouts by date range",
+        "SELECT id FROM workout_logs "
+        "WHERE user_id = %(user_id)s AND workout_date BETWEEN %(week_start)s AND %(day)s",
+    ),
+    (
+        "meals by date",
+        "SELECT id FROM meal_logs WHERE user_id = %(user_id)s AND meal_date = %(day)s",
+    ),
+    (
+        "weekly report",
+        "SELECT * FROM daily_summaries "
+        "WHERE user_id = %(user_id)s AND day BETWEEN %(week_start)s AND %(day)s",
+    ),
+    (
+        "monthly trend (rollups)",
+        "SELECT * FROM summary_rollups "
+        "WHERE user_id = %(user_id)s AND period = 'month' AND period_start <= %(day)s",
+    ),
+    (
+        "workout type search",
+        "SELECT id FROM workout_logs "
+        "WHERE user_id = %(user_id)s AND COALESCE(workout_type, '') ILIKE %(term)s",
+    ),
+    (
+        "meals containing a food",
+        "SELECT DISTINCT meal_id FROM meal_foods WHERE food_id = %(food_id)s",
+    ),
+    (
+        "food catalog page (keyset)",
+        "SELECT id FROM foods WHERE id > %(after_id)s ORDER BY id LIMIT 50",
+    ),
+    (
+        "food name prefix search",
+        "SELECT id FROM foods WHERE lower(food_name) COLLATE \"C\" LIKE 'chi%%' "
+        "ORDER BY lower(food_name) COLLATE \"C\", id LIMIT 50",
+    ),
+    (
+        "food name search",
+        "SELECT id FROM foods WHERE food_name ILIKE %(term)s",
+    ),
+]
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: str
+
+    @property
+    def sql(self) -> str:
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        m = _FILENAME_RE.match(filename)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version in migrations:
+            raise SystemExit(f"Duplicate migration version {version:04d}: {filename}")
+        migrations[version] = Migration(version, m.group(2), os.path.join(directory, filename))
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def _ensure_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       VARCHAR(120) NOT NULL,
+            checksum   CHAR(64) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+
+
+def _applied(cur) -> Dict[int, dict]:
+    cur.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version;")
+    return {r["version"]: dict(r) for r in cur.fetchall()}
+
+
+def _plan_summary(plan: dict) -> str:
+    scans = []
+
+    def walk(node):
+        node_type = node["Node Type"]
+        if "Scan" in node_type:
+            target = node.get("Index Name") or node.get("Relation Name") or ""
+            scans.append(f"{node_type} {target}".strip())
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return f"cost={plan['Total Cost']:.2f} " + ", ".join(scans)
+
+
+def explain_checks(conn) -> Dict[str, str]:
+    with conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute("SELECT COALESCE(MIN(id), 0) AS id FROM users;")
+        user_id = cur.fetchone()["id"]
+        cur.execute("SELECT COALESCE(MIN(id), 0) AS id FROM foods;")
+        food_id = cur.fetchone()["id"]
+    today = date.today()
+    params = {
+        "user_id": user_id,
+        "food_id": food_id,
+        "after_id": food_id,      # keyset cursor: the page after the first food
+        "day": today,
+        "week_start": today - timedelta(days=6),
+        "term": "%chick%",
+    }
+
+    results = {}
+    for label, sql in EXPLAIN_CHECKS:
+        with conn.cursor() as cur:
+            try:
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                results[label] = _plan_summary(cur.fetchone()[0][0]["Plan"])
+            except Exception as e:
+                results[label] = f"n/a ({str(e).strip().splitlines()[0]})"
+        conn.rollback()
+    return results
+
+
+def _print_explain(before: Dict[str, str], after: Dict[str, str]):
+    print("\nQuery plans (before -> after):")
+    for label, _ in EXPLAIN_CHECKS:
+        print(f"  {label}")
+        print(f"    before: {before.get(label, '-')}")
+        print(f"    after : {after.get(label, '-')}")
+    print("  (tiny tables may still choose a sequential scan; check against real data)")
+
+
+def status():
+    conn = db.connect()
+    try:
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            _ensure_table(cur)
+            applied = _applied(cur)
+        conn.commit()
+    finally:
+        conn.close()
+
+    for m in discover():
+        row = applied.get(m.version)
+        if row is None:
+            state = "pending"
+        elif row["checksum"] != m.checksum:
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M} (FILE CHANGED SINCE)"
+        else:
+            state = f"applied {row['applied_at']:%Y-%m-%d %H:%M}"
+        print(f"{m.version:04d} {m.name:<40} {state}")
+
+
+def migrate(target: Optional[int] = None, dry_run: bool = False, explain: bool = False) -> List[Migration]:
+    conn = db.connect()
+    done = []
+    try:
+        with conn.cursor(cursor_factory=DictCursor) as cur:
+            cur.execute("SELECT pg_advisory_lock(%s);", (_LOCK_KEY,))
+            _ensure_table(cur)
+            conn.commit()
+            applied = _applied(cur)
+
+        for version, row in applied.items():
+            current = next((m for m in discover() if m.version == version), None)
+            if current and current.checksum != row["checksum"]:
+                print(f"warning: migration {version:04d} was edited after it was applied")
+
+        pending = [
+            m for m in discover()
+            if m.version not in applied and (target is None or m.version <= target)
+        ]
+        if not pending:
+            print("Database is up to date.")
+            return done
+
+        before = explain_checks(conn) if explain else None
+
+        for m in pending:
+            print(f"Applying {m.version:04d}_{m.name} ...", end=" ", flush=True)
+            if dry_run:
+                print("skipped (dry run)")
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(m.sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+                        (m.version, m.name, m.checksum),
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print("FAILED")
+                raise
+            print("ok")
+            done.append(m)
+
+        if explain:
+            _print_explain(before, explain_checks(conn))
+    finally:
+        if not conn.closed:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s);", (_LOCK_KEY,))
+            conn.commit()
+            conn.close()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply forward-only schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    parser.add_argument("--dry-run", action="store_true", help="show what would be applied")
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN of key queries before/after")
+    args = parser.parse_args()
+
+    if args.status:
+        status()
+        return
+
+    done = migrate(args.target, args.dry_run, args.explain)
+    if done:
+        print(f"Applied {len(done)} migration(s); now at version {done[-1].version:04d}.")
+
+
+if __name__ == "__main__":
+    main()
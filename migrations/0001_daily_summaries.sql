@@ -0,0 +1,44 @@
+-- 0001: per-user daily totals (see summaries.py), backfilled from the raw logs.
+
+CREATE TABLE IF NOT EXISTS daily_summaries (
+    user_id       BIGINT NOT NULL,
+    day           DATE NOT NULL,
+    calories_in   DECIMAL(9,2) NOT NULL DEFAULT 0,
+    protein_g     DECIMAL(8,2) NOT NULL DEFAULT 0,
+    carbs_g       DECIMAL(8,2) NOT NULL DEFAULT 0,
+    fats_g        DECIMAL(8,2) NOT NULL DEFAULT 0,
+    meal_count    INTEGER NOT NULL DEFAULT 0,
+    calories_out  DECIMAL(9,2) NOT NULL DEFAULT 0,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day),
+    CONSTRAINT fk_daily_summaries_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+INSERT INTO daily_summaries
+    (user_id, day, calories_in, protein_g, carbs_g, fats_g, meal_count,
+     calories_out, workout_count)
+SELECT COALESCE(m.user_id, w.user_id),
+       COALESCE(m.day, w.day),
+       COALESCE(m.calories, 0), COALESCE(m.protein_g, 0),
+       COALESCE(m.carbs_g, 0), COALESCE(m.fats_g, 0), COALESCE(m.n, 0),
+       COALESCE(w.calories_out, 0), COALESCE(w.n, 0)
+FROM (
+  SELECT user_id, meal_date AS day,
+         COALESCE(SUM(calories), 0)  AS calories,
+         COALESCE(SUM(protein_g), 0) AS protein_g,
+         COALESCE(SUM(carbs_g), 0)   AS carbs_g,
+         COALESCE(SUM(fats_g), 0)    AS fats_g,
+         COUNT(*)                    AS n
+  FROM meal_logs
+  GROUP BY user_id, meal_date
+) m
+FULL OUTER JOIN (
+  SELECT user_id, workout_date AS day,
+         COALESCE(SUM(calories_burned), 0) AS calories_out,
+         COUNT(*)                          AS n
+  FROM workout_logs
+  GROUP BY user_id, workout_date
+) w ON w.user_id = m.user_id AND w.day = m.day
+ON CONFLICT (user_id, day) DO NOTHING;
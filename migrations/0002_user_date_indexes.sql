@@ -0,0 +1,8 @@
+-- 0002: composite (user_id, date) indexes for the per-user date lookups in
+-- search_workouts/search_meals, the reports and the daily summary refresh.
+
+CREATE INDEX IF NOT EXISTS idx_workout_logs_user_date
+    ON workout_logs (user_id, workout_date);
+
+CREATE INDEX IF NOT EXISTS idx_meal_logs_user_date
+    ON meal_logs (user_id, meal_date);
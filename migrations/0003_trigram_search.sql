@@ -0,0 +1,11 @@
+-- 0003: trigram indexes so the ILIKE '%term%' searches on food names and
+-- workout types can use an index instead of scanning the table.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_foods_name_trgm
+    ON foods USING gin (food_name gin_trgm_ops);
+
+-- Matches the COALESCE(wl.workout_type, '') ILIKE predicate in search_workouts.
+CREATE INDEX IF NOT EXISTS idx_workout_logs_type_trgm
+    ON workout_logs USING gin ((COALESCE(workout_type, '')) gin_trgm_ops);
@@ -0,0 +1,5 @@
+-- 0004: meal_foods is keyed (meal_id, food_id); the macro recompute after a
+-- food's macros change looks meals up by food_id (macros.recompute_for_foods).
+
+CREATE INDEX IF NOT EXISTS idx_meal_foods_food
+    ON meal_foods (food_id);
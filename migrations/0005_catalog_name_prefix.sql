@@ -0,0 +1,9 @@
+-- 0005: case-insensitive prefix search with keyset pagination over the catalogs
+-- (services.search_foods / search_exercises). A "C"-collated btree on the
+-- lower-cased name serves both LIKE 'term%' and ORDER BY name, id.
+
+CREATE INDEX IF NOT EXISTS idx_foods_name_prefix
+    ON foods ((lower(food_name) COLLATE "C"), id);
+
+CREATE INDEX IF NOT EXISTS idx_exercises_name_prefix
+    ON exercises ((lower(exercise_name) COLLATE "C"), id);
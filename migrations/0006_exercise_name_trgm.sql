@@ -0,0 +1,6 @@
+-- 0006: trigram index for fuzzy exercise search (foods got one in 0003).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_exercises_name_trgm
+    ON exercises USING gin (exercise_name gin_trgm_ops);
@@ -0,0 +1,34 @@
+-- 0007: weekly and monthly rollups of daily_summaries (see summaries.py) for the
+-- trend report, backfilled from the existing daily rows.
+
+CREATE TABLE IF NOT EXISTS summary_rollups (
+    user_id       BIGINT NOT NULL,
+    period        TEXT NOT NULL CHECK (period IN ('week', 'month')),
+    period_start  DATE NOT NULL,
+    days_logged   INTEGER NOT NULL DEFAULT 0,
+    meal_days     INTEGER NOT NULL DEFAULT 0,
+    calories_in   DECIMAL(11,2) NOT NULL DEFAULT 0,
+    protein_g     DECIMAL(10,2) NOT NULL DEFAULT 0,
+    carbs_g       DECIMAL(10,2) NOT NULL DEFAULT 0,
+    fats_g        DECIMAL(10,2) NOT NULL DEFAULT 0,
+    meal_count    INTEGER NOT NULL DEFAULT 0,
+    calories_out  DECIMAL(11,2) NOT NULL DEFAULT 0,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, period, period_start),
+    CONSTRAINT fk_summary_rollups_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+INSERT INTO summary_rollups
+    (user_id, period, period_start, days_logged, meal_days, calories_in,
+     protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+SELECT user_id, p.period, date_trunc(p.period, day)::date,
+       COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0),
+       COUNT(*) FILTER (WHERE meal_count > 0),
+       SUM(calories_in), SUM(protein_g), SUM(carbs_g), SUM(fats_g),
+       SUM(meal_count), SUM(calories_out), SUM(workout_count)
+FROM daily_summaries
+CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+GROUP BY user_id, p.period, date_trunc(p.period, day)
+ON CONFLICT (user_id, period, period_start) DO NOTHING;
@@ -0,0 +1,169 @@
+-- 0008: workout_logs and meal_logs become range-partitioned by month on
+-- workout_date / meal_date, so date-bounded queries (searches, reports, summary
+-- refreshes) only touch the months they ask for, and old months can be detached
+-- and archived (partitions.py). Partitions exist from the first logged month to
+-- three months ahead; rows outside that range land in the DEFAULT partition until
+-- `python partitions.py ensure` creates their month.
+--
+-- A unique key on a partitioned table must contain the partition key, so the
+-- primary keys become (id, date). ids still come from one identity sequence. The
+-- child tables keep their (workout_id, exercise_id) / (meal_id, food_id) keys and
+-- gain the parent's date, so that their ON DELETE CASCADE foreign keys can point
+-- at (id, date). The application passes the date on insert; a row trigger fills it
+-- in for inserts that leave it out (looking the parent up by id alone, which has
+-- to probe every partition).
+--
+-- Needs PostgreSQL 12 or later (foreign keys to a partitioned table). A
+-- workout/meal is never moved to another date with a plain UPDATE: before
+-- PostgreSQL 15 a cross-partition UPDATE runs as DELETE + INSERT, and the delete
+-- would cascade to its exercises/foods. services.update_workout/update_meal insert
+-- the row under the new date, re-point the children and delete the old row.
+
+ALTER TABLE workout_exercises DROP CONSTRAINT fk_we_workout;
+ALTER TABLE meal_foods DROP CONSTRAINT fk_mf_meal;
+
+ALTER TABLE workout_logs RENAME TO workout_logs_heap;
+ALTER INDEX workout_logs_pkey RENAME TO workout_logs_heap_pkey;
+ALTER INDEX IF EXISTS idx_workout_logs_user_date RENAME TO idx_workout_logs_heap_user_date;
+DROP INDEX IF EXISTS idx_workout_logs_type_trgm;
+ALTER TABLE meal_logs RENAME TO meal_logs_heap;
+ALTER INDEX meal_logs_pkey RENAME TO meal_logs_heap_pkey;
+ALTER INDEX IF EXISTS idx_meal_logs_user_date RENAME TO idx_meal_logs_heap_user_date;
+
+CREATE TABLE workout_logs (
+    id              BIGINT GENERATED ALWAYS AS IDENTITY,
+    user_id         BIGINT NOT NULL,
+    workout_type    VARCHAR(60),
+    duration_min    DECIMAL(5,2) CHECK (duration_min >= 0),
+    intensity       VARCHAR(30),
+    calories_burned DECIMAL(7,2) CHECK (calories_burned >= 0),
+    workout_date    DATE NOT NULL DEFAULT CURRENT_DATE,
+    PRIMARY KEY (id, workout_date),
+    CONSTRAINT fk_workout_logs_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+) PARTITION BY RANGE (workout_date);
+
+CREATE TABLE meal_logs (
+    id         BIGINT GENERATED ALWAYS AS IDENTITY,
+    user_id    BIGINT NOT NULL,
+    meal_type  VARCHAR(40),
+    calories   DECIMAL(7,2),
+    protein_g  DECIMAL(6,2),
+    carbs_g    DECIMAL(6,2),
+    fats_g     DECIMAL(6,2),
+    meal_date  DATE NOT NULL DEFAULT CURRENT_DATE,
+    PRIMARY KEY (id, meal_date),
+    CONSTRAINT fk_meal_logs_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+) PARTITION BY RANGE (meal_date);
+
+CREATE INDEX idx_workout_logs_user_date ON workout_logs (user_id, workout_date);
+CREATE INDEX idx_meal_logs_user_date ON meal_logs (user_id, meal_date);
+
+-- Same names as partitions.partition_name(): <table>_pYYYY_MM.
+DO $$
+DECLARE
+    t record;
+    first_month date;
+    month date;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES ('workout_logs', 'workout_date'), ('meal_logs', 'meal_date')) AS v(name, col)
+    LOOP
+        EXECUTE format('SELECT date_trunc(''month'', LEAST(MIN(%I), CURRENT_DATE))::date FROM %I',
+                       t.col, t.name || '_heap')
+            INTO first_month;
+        month := first_month;
+        WHILE month <= date_trunc('month', CURRENT_DATE) + interval '3 months' LOOP
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           t.name || to_char(month, '"_p"YYYY_MM'), t.name,
+                           month, (month + interval '1 month')::date);
+            month := (month + interval '1 month')::date;
+        END LOOP;
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', t.name || '_default', t.name);
+    END LOOP;
+END $$;
+
+-- A missing date was CURRENT_DATE's job all along; it is now required.
+INSERT INTO workout_logs OVERRIDING SYSTEM VALUE
+SELECT id, user_id, workout_type, duration_min, intensity, calories_burned,
+       COALESCE(workout_date, CURRENT_DATE)
+FROM workout_logs_heap;
+
+INSERT INTO meal_logs OVERRIDING SYSTEM VALUE
+SELECT id, user_id, meal_type, calories, protein_g, carbs_g, fats_g,
+       COALESCE(meal_date, CURRENT_DATE)
+FROM meal_logs_heap;
+
+SELECT setval(pg_get_serial_sequence('workout_logs', 'id'),
+              (SELECT COALESCE(MAX(id), 0) + 1 FROM workout_logs_heap), false);
+SELECT setval(pg_get_serial_sequence('meal_logs', 'id'),
+              (SELECT COALESCE(MAX(id), 0) + 1 FROM meal_logs_heap), false);
+
+ALTER TABLE workout_exercises ADD COLUMN workout_date DATE;
+UPDATE workout_exercises we
+SET workout_date = wl.workout_date
+FROM workout_logs wl
+WHERE wl.id = we.workout_id;
+ALTER TABLE workout_exercises ALTER COLUMN workout_date SET NOT NULL;
+
+ALTER TABLE meal_foods ADD COLUMN meal_date DATE;
+UPDATE meal_foods mf
+SET meal_date = ml.meal_date
+FROM meal_logs ml
+WHERE ml.id = mf.meal_id;
+ALTER TABLE meal_foods ALTER COLUMN meal_date SET NOT NULL;
+
+DROP TABLE workout_logs_heap;
+DROP TABLE meal_logs_heap;
+
+ALTER TABLE workout_exercises
+    ADD CONSTRAINT fk_we_workout
+        FOREIGN KEY (workout_id, workout_date) REFERENCES workout_logs (id, workout_date)
+        ON DELETE CASCADE ON UPDATE CASCADE;
+ALTER TABLE meal_foods
+    ADD CONSTRAINT fk_mf_meal
+        FOREIGN KEY (meal_id, meal_date) REFERENCES meal_logs (id, meal_date)
+        ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- Archiving a month removes its child rows by date (partitions.archive_month).
+CREATE INDEX idx_workout_exercises_date ON workout_exercises (workout_date);
+CREATE INDEX idx_meal_foods_date ON meal_foods (meal_date);
+
+CREATE OR REPLACE FUNCTION workout_exercises_fill_date() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.workout_date IS NULL THEN
+        SELECT workout_date INTO NEW.workout_date FROM workout_logs WHERE id = NEW.workout_id;
+    END IF;
+    RETURN NEW;
+END $$;
+
+CREATE OR REPLACE FUNCTION meal_foods_fill_date() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.meal_date IS NULL THEN
+        SELECT meal_date INTO NEW.meal_date FROM meal_logs WHERE id = NEW.meal_id;
+    END IF;
+    RETURN NEW;
+END $$;
+
+CREATE TRIGGER trg_workout_exercises_fill_date
+    BEFORE INSERT ON workout_exercises
+    FOR EACH ROW EXECUTE FUNCTION workout_exercises_fill_date();
+CREATE TRIGGER trg_meal_foods_fill_date
+    BEFORE INSERT ON meal_foods
+    FOR EACH ROW EXECUTE FUNCTION meal_foods_fill_date();
+
+-- 0003's trigram index, where pg_trgm is installed.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX idx_workout_logs_type_trgm
+            ON workout_logs USING gin ((COALESCE(workout_type, '')) gin_trgm_ops);
+    END IF;
+END $$;
+
+ANALYZE workout_logs;
+ANALYZE meal_logs;
+ANALYZE workout_exercises;
+ANALYZE meal_foods;
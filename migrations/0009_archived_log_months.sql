@@ -0,0 +1,9 @@
+-- 0009: months whose workout_logs/meal_logs partitions partitions.py has archived
+-- (detached and dropped). Their daily_summaries/summary_rollups rows are all that
+-- is left in the database, so summaries.py never re-sums or deletes those days.
+
+CREATE TABLE IF NOT EXISTS archived_log_months (
+    month       DATE PRIMARY KEY,            -- first day of the month
+    month_end   DATE NOT NULL,               -- first day of the next month
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,189 @@
+# models.py
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional
+
+
+class ServiceError(Exception):
+    pass
+
+
+class NotFoundError(ServiceError):
+    pass
+
+
+class ValidationError(ServiceError):
+    pass
+
+
+class UnsupportedError(ServiceError):
+    # The operation needs a feature the configured storage backend lacks.
+    pass
+
+
+class BusyError(ServiceError):
+    # A bounded resource (hashing workers, write queue) stayed full; retry later.
+    pass
+
+
+@dataclass
+class User:
+    id: int
+    name: str
+
+
+@dataclass
+class Exercise:
+    id: int
+    exercise_name: str
+    category: Optional[str] = None
+    muscle_group: Optional[str] = None
+    equipment: Optional[str] = None
+
+
+@dataclass
+class Food:
+    id: int
+    food_name: str
+    serving_size: Optional[str] = None
+    calories_per_serv: float = 0.0
+    protein_g: float = 0.0
+    carbs_g: float = 0.0
+    fats_g: float = 0.0
+
+
+@dataclass
+class WorkoutExercise:
+    exercise_id: int
+    exercise_name: Optional[str]
+    sets: int = 0
+    reps: int = 0
+    weight_used_kg: float = 0.0
+
+
+@dataclass
+class Workout:
+    id: int
+    user_id: int
+    workout_type: Optional[str]
+    duration_min: float
+    intensity: Optional[str]
+    calories_burned: float
+    workout_date: date
+    exercises: List[WorkoutExercise] = field(default_factory=list)
+
+
+@dataclass
+class MealFood:
+    food_id: int
+    food_name: Optional[str]
+    quantity: float = 1.0
+
+
+@dataclass
+class Meal:
+    id: int
+    user_id: int
+    meal_type: Optional[str]
+    meal_date: date
+    calories: float = 0.0
+    protein_g: float = 0.0
+    carbs_g: float = 0.0
+    fats_g: float = 0.0
+    foods: List[MealFood] = field(default_factory=list)
+
+
+@dataclass
+class WorkoutSearch:
+    start: Optional[date] = None
+    end: Optional[date] = None
+    workout_type: Optional[str] = None
+
+
+@dataclass
+class MealSearch:
+    meal_date: Optional[date] = None
+    food_name: Optional[str] = None
+
+
+@dataclass
+class CatalogPage:
+    # One page of foods/exercises; pass next_cursor back as `after` for the next.
+    items: list
+    next_cursor: Optional[str] = None
+
+
+@dataclass
+class Suggestion:
+    id: int
+    name: str
+
+
+@dataclass
+class DailyReport:
+    day: date
+    calories_in: float
+    calories_out: float
+    protein_g: float = 0.0
+    carbs_g: float = 0.0
+    fats_g: float = 0.0
+
+    @property
+    def balance(self) -> float:
+        return self.calories_in - self.calories_out
+
+
+@dataclass
+class WeeklyReport:
+    # Per-day averages: intake over the days with a meal, calories out over the
+    # days with any log.
+    start: date
+    end: date
+    avg_calories: Optional[float]
+    avg_protein_g: Optional[float]
+    avg_carbs_g: Optional[float]
+    avg_fats_g: Optional[float]
+    avg_calories_out: Optional[float] = None
+    meal_days: int = 0
+    days_logged: int = 0
+
+    @property
+    def has_data(self) -> bool:
+        return self.days_logged > 0
+
+
+@dataclass
+class TrendPoint:
+    # Totals for one day/week/month bucket (start..end inclusive, clipped to the
+    # report range).
+    start: date
+    end: date
+    days_logged: int = 0
+    meal_days: int = 0
+    calories_in: float = 0.0
+    calories_out: float = 0.0
+    protein_g: float = 0.0
+    carbs_g: float = 0.0
+    fats_g: float = 0.0
+    meal_count: int = 0
+    workout_count: int = 0
+
+    @property
+    def avg_calories_in(self) -> Optional[float]:
+        return self.calories_in / self.meal_days if self.meal_days else None
+
+    @property
+    def avg_calories_out(self) -> Optional[float]:
+        return self.calories_out / self.days_logged if self.days_logged else None
+
+    @property
+    def balance(self) -> float:
+        return self.calories_in - self.calories_out
+
+
+@dataclass
+class TrendReport:
+    start: date
+    end: date
+    bucket: str
+    points: List[TrendPoint] = field(default_factory=list)
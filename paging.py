@@ -0,0 +1,60 @@
+# paging.py
+# Console pager for the keyset-paginated catalog listings (foods, exercises) and
+# a name-autocomplete picker for entering catalog ids.
+from typing import Callable, Optional
+
+from models import ServiceError
+
+PAGE_SIZE = 20
+SUGGESTIONS = 10
+
+
+def browse(browse_fn: Callable, search_fn: Callable, describe: Callable):
+    # browse_fn(after, limit) and search_fn(term, fuzzy=, after=, limit=) return
+    # a CatalogPage; describe(item) formats one line.
+    term, fuzzy, after = None, False, None
+
+    while True:
+        try:
+            if term:
+                page = search_fn(term, fuzzy=fuzzy, after=after, limit=PAGE_SIZE)
+            else:
+                page = browse_fn(after, PAGE_SIZE)
+        except ServiceError as e:
+            print(f"{e}\n")
+            if not term:
+                return
+            term, fuzzy, after = None, False, None
+            continue
+
+        if not page.items:
+            print("No matches.")
+        for item in page.items:
+            print(describe(item))
+
+        more = "Enter = next page, " if page.next_cursor else ""
+        cmd = input(f"\n[{more}text = name prefix, ~text = fuzzy, q = back]: ").strip()
+        print("")
+        if cmd.lower() == "q" or (not cmd and not page.next_cursor):
+            return
+        if cmd:
+            fuzzy = cmd.startswith("~")
+            term = cmd.lstrip("~").strip() or None
+            after = None
+        else:
+            after = page.next_cursor
+
+
+def pick(suggest_fn: Callable, what: str) -> Optional[int]:
+    # Accepts an id directly; any other text lists matching names to choose from.
+    while True:
+        answer = input(f"{what} id (or part of its name): ").strip()
+        if not answer:
+            return None
+        if answer.isdigit():
+            return int(answer)
+        matches = suggest_fn(answer, SUGGESTIONS)
+        if not matches:
+            print("No matches.")
+        for s in matches:
+            print(f"  {s.id}: {s.name}")
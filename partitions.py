@@ -0,0 +1,421 @@
+# partitions.py
+# Monthly range partitions of workout_logs and meal_logs (migration 0008). Each
+# month is <table>_pYYYY_MM; dates without a partition go to <table>_default.
+#
+#   python partitions.py ensure [--ahead 3]        create this month and the next N
+#   python partitions.py list
+#   python partitions.py archive --before 2025-07 [--dir archive]
+#   python partitions.py restore --month 2025-01 [--dir archive]
+#   python partitions.py explain                   show pruning in the report queries
+#
+# Run `ensure` from cron (e.g. daily); rows that landed in the default partition
+# for a month it creates are moved into the new partition with their children.
+#
+# `archive` writes each month before the cutoff to gzip'd CSV (the partition and
+# its workout_exercises / meal_foods rows), then deletes those child rows and
+# detaches and drops the partition. The month is recorded in archived_log_months
+# (migration 0009), whose days summaries.py leaves alone: daily_summaries and
+# summary_rollups keep the archived totals through refreshes and rebuilds, so
+# reports still cover the month. A workout or meal logged on an archived day is
+# stored (in the default partition) but not added to that day's summary until the
+# month is restored. `restore` loads the files back, re-attaches the month and
+# re-sums the days that gained rows while it was archived.
+import argparse
+import gzip
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from psycopg2 import sql
+from psycopg2.extras import DictCursor
+
+import exporter
+import summaries
+from db import get_connection
+
+PARTITIONS_AHEAD = 3
+ARCHIVE_DIR = "archive"
+
+_BOUND_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+@dataclass
+class LogTable:
+    name: str
+    date_column: str         # partition key; the child table has a copy of it
+    child: str
+
+
+TABLES = [
+    LogTable("workout_logs", "workout_date", "workout_exercises"),
+    LogTable("meal_logs", "meal_date", "meal_foods"),
+]
+
+
+@dataclass
+class Partition:
+    table: str
+    name: str
+    start: Optional[date]    # None for the default partition
+    end: Optional[date]
+    rows: int                # planner estimate (pg_class.reltuples)
+
+
+@dataclass
+class ArchivedMonth:
+    table: str
+    partition: str
+    rows: int
+    child_rows: int
+    path: str
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _archive_paths(directory: str, t: LogTable, month: date):
+    return (
+        os.path.join(directory, f"{partition_name(t.name, month)}.csv.gz"),
+        os.path.join(directory, f"{partition_name(t.child, month)}.csv.gz"),
+    )
+
+
+def list_partitions(cur, t: LogTable) -> List[Partition]:
+    cur.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass;
+        """,
+        (t.name,),
+    )
+    parts = []
+    for name, bound, rows in cur.fetchall():
+        m = _BOUND_RE.search(bound)
+        start, end = (date.fromisoformat(m.group(1)), date.fromisoformat(m.group(2))) if m else (None, None)
+        parts.append(Partition(t.name, name, start, end, max(int(rows), 0)))
+    return sorted(parts, key=lambda p: (p.start is None, p.start or date.min))
+
+
+def _moving_default_rows(cur, t: LogTable, start: date, end: date, attach: Callable):
+    # CREATE/ATTACH PARTITION fails while the default partition holds rows of the
+    # new range. Those rows (and their child rows, which the delete cascades to)
+    # are set aside, the partition is attached, and they are inserted back through
+    # the parent, landing in it. Returns (rows moved, their (user_id, date) pairs).
+    params = {"start": start, "end": end}
+    cur.execute(
+        sql.SQL(
+            "CREATE TEMP TABLE moved_logs AS SELECT * FROM {} WHERE {col} >= %(start)s AND {col} < %(end)s;"
+        ).format(sql.Identifier(f"{t.name}_default"), col=sql.Identifier(t.date_column)),
+        params,
+    )
+    moved = cur.rowcount
+    if moved:
+        cur.execute(
+            sql.SQL(
+                "CREATE TEMP TABLE moved_children AS SELECT * FROM {} WHERE {col} >= %(start)s AND {col} < %(end)s;"
+            ).format(sql.Identifier(t.child), col=sql.Identifier(t.date_column)),
+            params,
+        )
+        cur.execute(
+            sql.SQL("DELETE FROM {} WHERE {col} >= %(start)s AND {col} < %(end)s;").format(
+                sql.Identifier(f"{t.name}_default"), col=sql.Identifier(t.date_column)
+            ),
+            params,
+        )
+    attach()
+    keys = []
+    if moved:
+        cur.execute(
+            sql.SQL("INSERT INTO {} OVERRIDING SYSTEM VALUE SELECT * FROM moved_logs;").format(sql.Identifier(t.name))
+        )
+        cur.execute(sql.SQL("INSERT INTO {} SELECT * FROM moved_children;").format(sql.Identifier(t.child)))
+        cur.execute("DROP TABLE moved_children;")
+        cur.execute(
+            sql.SQL("SELECT DISTINCT user_id, {} FROM moved_logs;").format(sql.Identifier(t.date_column))
+        )
+        keys = [tuple(r) for r in cur.fetchall()]
+    cur.execute("DROP TABLE moved_logs;")
+    return moved, keys
+
+
+def create_partition(cur, t: LogTable, month: date) -> int:
+    # Returns how many rows moved in from the default partition.
+    def attach():
+        cur.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s);").format(
+                sql.Identifier(partition_name(t.name, month)), sql.Identifier(t.name)
+            ),
+            (month, next_month(month)),
+        )
+
+    return _moving_default_rows(cur, t, month, next_month(month), attach)[0]
+
+
+def ensure_partitions(ahead: int = PARTITIONS_AHEAD, today: Optional[date] = None) -> List[str]:
+    # Creates any missing month from the current one to `ahead` months later.
+    month = month_start(today or date.today())
+    wanted = [month]
+    for _ in range(ahead):
+        wanted.append(next_month(wanted[-1]))
+
+    created = []
+    with get_connection() as conn, conn.cursor() as cur:
+        for t in TABLES:
+            existing = {p.start for p in list_partitions(cur, t)}
+            for m in wanted:
+                if m not in existing:
+                    moved = create_partition(cur, t, m)
+                    conn.commit()
+                    created.append(partition_name(t.name, m) + (f" ({moved} rows from default)" if moved else ""))
+    return created
+
+
+def archive_month(cur, t: LogTable, month: date, directory: str) -> ArchivedMonth:
+    # The files are complete on disk before anything is deleted; the caller commits.
+    name = partition_name(t.name, month)
+    path, child_path = _archive_paths(directory, t, month)
+    os.makedirs(directory, exist_ok=True)
+    bounds = sql.SQL("{col} >= {start} AND {col} < {end}").format(
+        col=sql.Identifier(t.date_column), start=sql.Literal(month), end=sql.Literal(next_month(month))
+    )
+    for target, query in (
+        (child_path, sql.SQL("SELECT * FROM {} WHERE {}").format(sql.Identifier(t.child), bounds)),
+        (path, sql.SQL("SELECT * FROM {}").format(sql.Identifier(name))),
+    ):
+        tmp = target + ".tmp"
+        with gzip.open(tmp, "wb") as f:
+            cur.copy_expert(
+                sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)").format(query).as_string(cur), f
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        if target == child_path:
+            child_rows = cur.rowcount
+        else:
+            rows = cur.rowcount
+
+    cur.execute(sql.SQL("DELETE FROM {} WHERE {};").format(sql.Identifier(t.child), bounds))
+    cur.execute(
+        sql.SQL("ALTER TABLE {} DETACH PARTITION {};").format(sql.Identifier(t.name), sql.Identifier(name))
+    )
+    cur.execute(sql.SQL("DROP TABLE {};").format(sql.Identifier(name)))
+    cur.execute(
+        "INSERT INTO archived_log_months (month, month_end) VALUES (%s, %s) ON CONFLICT (month) DO NOTHING;",
+        (month, next_month(month)),
+    )
+    return ArchivedMonth(t.name, name, rows, child_rows, path)
+
+
+def archive(before: date, directory: str = ARCHIVE_DIR) -> List[ArchivedMonth]:
+    # Every monthly partition that ends on or before `before` (a month start, at
+    # most the current month), one transaction per partition.
+    if before.day != 1 or before > month_start(date.today()):
+        raise ValueError("--before must be the first day of a month, no later than this month.")
+    done = []
+    with get_connection() as conn, conn.cursor() as cur:
+        for t in TABLES:
+            for p in list_partitions(cur, t):
+                if p.end is not None and p.end <= before:
+                    done.append(archive_month(cur, t, p.start, directory))
+                    conn.commit()
+    return done
+
+
+def restore_month(month: date, directory: str = ARCHIVE_DIR) -> Dict[str, int]:
+    # Re-attaches an archived month of both tables, in one transaction:
+    # {partition: rows restored}.
+    month = month_start(month)
+    restored = {}
+    moved = []
+    with get_connection() as conn, conn.cursor() as cur:
+        for t in TABLES:
+            path, child_path = _archive_paths(directory, t, month)
+            if not os.path.exists(path):
+                continue
+            name = partition_name(t.name, month)
+            if any(p.start == month for p in list_partitions(cur, t)):
+                raise ValueError(f"{name} is attached already; archive it first or remove {path}.")
+
+            # Loaded while detached; the CHECK lets ATTACH skip re-validating every row.
+            cur.execute(
+                sql.SQL(
+                    "CREATE TABLE {part} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+                    "CONSTRAINT {check} CHECK ({col} >= %s AND {col} < %s));"
+                ).format(
+                    part=sql.Identifier(name),
+                    parent=sql.Identifier(t.name),
+                    check=sql.Identifier(f"{name}_bounds"),
+                    col=sql.Identifier(t.date_column),
+                ),
+                (month, next_month(month)),
+            )
+            with gzip.open(path, "rb") as f:
+                cur.copy_expert(
+                    sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv, HEADER)").format(sql.Identifier(name)).as_string(cur),
+                    f,
+                )
+            restored[name] = cur.rowcount
+
+            def attach():
+                cur.execute(
+                    sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s);").format(
+                        sql.Identifier(t.name), sql.Identifier(name)
+                    ),
+                    (month, next_month(month)),
+                )
+                cur.execute(
+                    sql.SQL("ALTER TABLE {} DROP CONSTRAINT {};").format(
+                        sql.Identifier(name), sql.Identifier(f"{name}_bounds")
+                    )
+                )
+
+            moved += _moving_default_rows(cur, t, month, next_month(month), attach)[1]
+            if os.path.exists(child_path):
+                with gzip.open(child_path, "rb") as f:
+                    cur.copy_expert(
+                        sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv, HEADER)").format(
+                            sql.Identifier(t.child)
+                        ).as_string(cur),
+                        f,
+                    )
+        if restored:
+            # The month's summaries are live again; days logged while it was
+            # archived now have all their rows to be re-summed from.
+            cur.execute("DELETE FROM archived_log_months WHERE month = %s;", (month,))
+            summaries.refresh_days(cur, moved)
+            conn.commit()
+    return restored
+
+
+# Report queries (as the services issue them) whose plans should only touch the
+# partitions of the dates they ask for.
+PRUNING_CHECKS = [
+    (
+        "search workouts (date range)",
+        """
+        SELECT wl.id, e.exercise_name
+        FROM workout_logs wl
+        LEFT JOIN workout_exercises we ON we.workout_id = wl.id
+        LEFT JOIN exercises e ON e.id = we.exercise_id
+        WHERE wl.user_id = %(user_id)s AND wl.workout_date BETWEEN %(week_start)s AND %(day)s
+        ORDER BY wl.workout_date, wl.id
+        """,
+    ),
+    (
+        "search meals (date)",
+        """
+        SELECT ml.id, f.food_name
+        FROM meal_logs ml
+        LEFT JOIN meal_foods mf ON mf.meal_id = ml.id
+        LEFT JOIN foods f ON f.id = mf.food_id
+        WHERE ml.user_id = %(user_id)s AND ml.meal_date = %(day)s
+        """,
+    ),
+    ("daily summary refresh", summaries._REFRESH_DAY_SQL),
+    ("export since", dict(exporter._FLAT_SECTIONS)["workouts"]),
+    (
+        "analytics history",
+        """
+        SELECT meal_date, calories FROM meal_logs
+        WHERE user_id = %(user_id)s AND meal_date BETWEEN %(week_start)s AND %(day)s
+        """,
+    ),
+]
+
+
+def _scanned(plan: dict, prefixes) -> List[str]:
+    found = []
+
+    def walk(node):
+        relation = node.get("Relation Name") or ""
+        if relation.startswith(prefixes):
+            found.append(relation)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return found
+
+
+def explain_pruning(day: Optional[date] = None) -> List[tuple]:
+    # [(label, partitions scanned, partitions in total)]
+    day = day or date.today()
+    results = []
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute("SELECT COALESCE(MIN(id), 0) AS id FROM users;")
+        params = {
+            "user_id": cur.fetchone()["id"],
+            "day": day,
+            "week_start": day - timedelta(days=6),  # as compute_weekly_report
+            "since": day.replace(day=1),
+        }
+        total = sum(len(list_partitions(cur, t)) for t in TABLES)
+        prefixes = tuple(f"{t.name}_" for t in TABLES)
+        for label, query in PRUNING_CHECKS:
+            cur.execute("EXPLAIN (FORMAT JSON) " + query.strip().rstrip(";"), params)
+            results.append((label, _scanned(cur.fetchone()[0][0]["Plan"], prefixes), total))
+        conn.rollback()
+    return results
+
+
+def _month(value: str) -> date:
+    return date.fromisoformat(value + "-01" if len(value) == 7 else value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of workout_logs and meal_logs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ensure = sub.add_parser("ensure", help="create partitions for this month and the next --ahead")
+    p_ensure.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD)
+    sub.add_parser("list", help="list partitions with estimated row counts")
+    p_archive = sub.add_parser("archive", help="detach months before --before into compressed files")
+    p_archive.add_argument("--before", type=_month, required=True, help="YYYY-MM (exclusive)")
+    p_archive.add_argument("--dir", default=ARCHIVE_DIR)
+    p_restore = sub.add_parser("restore", help="re-attach an archived month")
+    p_restore.add_argument("--month", type=_month, required=True, help="YYYY-MM")
+    p_restore.add_argument("--dir", default=ARCHIVE_DIR)
+    sub.add_parser("explain", help="partitions scanned by the report queries")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "ensure":
+            created = ensure_partitions(args.ahead)
+            print("\n".join(f"Created {name}" for name in created) or "All partitions exist.")
+        elif args.command == "list":
+            with get_connection() as conn, conn.cursor() as cur:
+                for t in TABLES:
+                    for p in list_partitions(cur, t):
+                        span = f"{p.start} .. {p.end}" if p.start else "default"
+                        print(f"{p.name:<28} {span:<26} ~{p.rows} rows")
+        elif args.command == "archive":
+            for a in archive(args.before, args.dir):
+                print(f"Archived {a.partition}: {a.rows} rows, {a.child_rows} child rows -> {a.path}")
+        elif args.command == "restore":
+            restored = restore_month(args.month, args.dir)
+            if not restored:
+                print(f"No archive for {args.month:%Y-%m} in {args.dir}.")
+            for name, rows in restored.items():
+                print(f"Restored {name}: {rows} rows")
+        elif args.command == "explain":
+            for label, scanned, total in explain_pruning():
+                print(f"{label:<30} {len(scanned)} of {total} partitions: {', '.join(scanned) or '-'}")
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
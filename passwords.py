@@ -0,0 +1,116 @@
+# passwords.py
+# Password hashing with scrypt (memory-hard, stdlib hashlib). Hashes are stored as
+#   scrypt$<n>$<r>$<p>$<salt>$<key>      (salt and key urlsafe base64, unpadded)
+# which fits user_profiles.password_hash. Older rows hold the unsalted SHA-256 hex
+# digest; verify() still accepts those and reports that they need rehashing.
+#
+# A hash costs tens of milliseconds of CPU, so hashing and verification run on a
+# small process pool: request threads only wait on a future and never hold the
+# GIL for the KDF. At most HASH_MAX_PENDING calls are queued; beyond that callers
+# wait up to HASH_QUEUE_TIMEOUT and then get a BusyError (503 from the server).
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import re
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+from models import BusyError
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_KEY_LEN = 32
+SALT_BYTES = 16
+
+HASH_WORKERS = min(4, os.cpu_count() or 1)   # 0 hashes inline on the calling thread
+HASH_MAX_PENDING = 64
+HASH_QUEUE_TIMEOUT = 5.0
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_MAX_PENDING)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=SCRYPT_KEY_LEN
+    )
+
+
+def hash_now(password: str) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def verify_now(password: str, stored: str) -> Tuple[bool, bool]:
+    # (matches, needs rehash). Unknown formats never match.
+    if _LEGACY_SHA256.match(stored):
+        legacy = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    try:
+        scheme, n, r, p, salt, key = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+    except ValueError:
+        return False, False
+    if scheme != "scrypt":
+        return False, False
+    matches = hmac.compare_digest(_scrypt(password, _unb64(salt), n, r, p), _unb64(key))
+    return matches, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def _get_executor():
+    # One pool per process; a forked child starts its own (see db.get_pool). The
+    # workers come from a forkserver, not from this (threaded) process.
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(
+                    max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _run(fn, *args):
+    if HASH_WORKERS == 0:
+        return fn(*args)
+    if not _slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        raise BusyError("Server busy, try again shortly.")
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(hash_now, password)
+
+
+def verify_password(password: str, stored: str) -> Tuple[bool, bool]:
+    return _run(verify_now, password, stored)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown()
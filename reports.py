@@ -1,126 +1,111 @@
 # reports.py
-import json
-from datetime import date, timedelta
-
-from psycopg2.extras import DictCursor
-
-from db import get_connection
+import analytics
+import services
+from models import ServiceError
 
 
 def daily_report(user_id: int):
     print("\n=== Daily Report ===")
     date_str = input("Date (YYYY-MM-DD, blank = today): ").strip()
-    day = date_str or date.today().isoformat()
-
-    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
-        # calories in
-        cur.execute(
-            """
-            SELECT COALESCE(SUM(calories), 0)
-            FROM meal_logs
-            WHERE user_id = %s AND meal_date = %s;
-            """,
-            (user_id, day),
-        )
-        calories_in = cur.fetchone()[0]
-
-        # calories out
-        cur.execute(
-            """
-            SELECT COALESCE(SUM(calories_burned), 0)
-            FROM workout_logs
-            WHERE user_id = %s AND workout_date = %s;
-            """,
-            (user_id, day),
-        )
-        calories_out = cur.fetchone()[0]
-
-    balance = calories_in - calories_out
-    print(f"Date: {day}")
-    print(f"Calories in : {calories_in:.2f}")
-    print(f"Calories out: {calories_out:.2f}")
-    print(f"Balance     : {balance:.2f} (positive = surplus)\n")
+
+    try:
+        report = services.compute_daily_report(user_id, date_str or None)
+    except ServiceError as e:
+        print(f"{e}\n")
+        return
+
+    print(f"Date: {report.day}")
+    print(f"Calories in : {report.calories_in:.2f}")
+    print(f"Calories out: {report.calories_out:.2f}")
+    print(f"Balance     : {report.balance:.2f} (positive = surplus)")
+    print(f"Macros      : P={report.protein_g:.1f} g  C={report.carbs_g:.1f} g  F={report.fats_g:.1f} g\n")
 
 
 def weekly_report(user_id: int):
     print("\n=== Weekly Report (last 7 days) ===")
-    end = date.today()
-    start = end - timedelta(days=6)
-
-    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
-        cur.execute(
-            """
-            SELECT
-                AVG(calories)  AS avg_cal,
-                AVG(protein_g) AS avg_protein,
-                AVG(carbs_g)   AS avg_carbs,
-                AVG(fats_g)    AS avg_fats
-            FROM meal_logs
-            WHERE user_id = %s AND meal_date BETWEEN %s AND %s;
-            """,
-            (user_id, start, end),
-        )
-        row = cur.fetchone()
-
-    print(f"From {start} to {end}")
-    if row and any(row):
-        print(f"Avg calories: {row['avg_cal'] or 0:.2f}")
-        print(f"Avg protein : {row['avg_protein'] or 0:.2f} g")
-        print(f"Avg carbs   : {row['avg_carbs'] or 0:.2f} g")
-        print(f"Avg fats    : {row['avg_fats'] or 0:.2f} g\n")
+    report = services.compute_weekly_report(user_id)
+
+    print(f"From {report.start} to {report.end}")
+    if report.has_data:
+        print(f"Days logged : {report.days_logged} ({report.meal_days} with meals)")
+        print(f"Avg calories: {report.avg_calories or 0:.2f} per day")
+        print(f"Avg protein : {report.avg_protein_g or 0:.2f} g")
+        print(f"Avg carbs   : {report.avg_carbs_g or 0:.2f} g")
+        print(f"Avg fats    : {report.avg_fats_g or 0:.2f} g")
+        print(f"Avg burned  : {report.avg_calories_out or 0:.2f} per day\n")
     else:
-        print("No meal data in this range.\n")
+        print("No data in this range.\n")
+
+
+def trend_report(user_id: int):
+    print("\n=== Trend Report ===")
+    start = input("Start date (YYYY-MM-DD, blank = 30 days ago): ").strip()
+    end = input("End date (YYYY-MM-DD, blank = today): ").strip()
+    bucket = input("Bucket (day/week/month, blank = day): ").strip().lower() or "day"
+
+    try:
+        report = services.compute_trend_report(user_id, start or None, end or None, bucket)
+    except ServiceError as e:
+        print(f"{e}\n")
+        return
+
+    print(f"{'from':<11} {'to':<11} {'days':>4} {'avg in':>8} {'avg out':>8} {'balance':>9}")
+    for p in report.points:
+        avg_in = f"{p.avg_calories_in:.0f}" if p.avg_calories_in is not None else "-"
+        avg_out = f"{p.avg_calories_out:.0f}" if p.avg_calories_out is not None else "-"
+        print(f"{p.start!s:<11} {p.end!s:<11} {p.days_logged:>4} {avg_in:>8} {avg_out:>8} {p.balance:>9.0f}")
+    print("")
+
+
+def analytics_report(user_id: int):
+    print("\n=== Analytics (full history) ===")
+    targets = {}
+    for macro in analytics.MACROS:
+        value = input(f"Daily {macro} target (blank = skip): ").strip()
+        if value:
+            targets[macro] = float(value)
+
+    try:
+        report = analytics.report(user_id, targets=targets)
+    except ServiceError as e:
+        print(f"{e}\n")
+        return
+
+    if not report["days_logged"]:
+        print("No data yet.\n")
+        return
+
+    rolling = report["rolling"]
+    print(f"From {report['start']} to {report['end']}, {report['days_logged']} days logged")
+    print(f"{report['window']}-day average as of {rolling['days'][-1]}:")
+    for key in ("calories_in", "calories_out", "protein_g", "carbs_g", "fats_g"):
+        value = rolling[key][-1]
+        print(f"  {key:<13}: {value:.1f}" if value is not None else f"  {key:<13}: -")
+
+    if report["exercises"]:
+        print(f"\n{'exercise':<28} {'sessions':>8} {'volume kg':>12} {'best 1RM':>9}")
+        for e in report["exercises"][:10]:
+            print(f"{(e['exercise_name'] or e['exercise_id'])!s:<28} {e['sessions']:>8} "
+                  f"{e['total_volume']:>12.0f} {e['best_1rm']:>9.1f}")
+
+    if report["adherence"]:
+        print(f"\nTarget adherence (within {analytics.ADHERENCE_TOLERANCE:.0%}):")
+    for a in report["adherence"]:
+        if a["days"]:
+            print(f"  {a['macro']:<9}: {a['hit_rate']:.0%} of {a['days']} meal days "
+                  f"(on average {a['mean_ratio']:.0%} of {a['target']:g})")
+    print("")
 
 
 def export_data(user_id: int):
     print("\n=== Export Data ===")
-    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
-        cur.execute(
-            "SELECT * FROM workout_logs WHERE user_id = %s ORDER BY workout_date;",
-            (user_id,),
-        )
-        workouts = [dict(r) for r in cur.fetchall()]
-
-        cur.execute(
-            """
-            SELECT wl.*, we.exercise_id, we.sets, we.reps, we.weight_used_kg
-            FROM workout_logs wl
-            LEFT JOIN workout_exercises we ON wl.id = we.workout_id
-            WHERE wl.user_id = %s
-            ORDER BY wl.workout_date, wl.id;
-            """,
-            (user_id,),
-        )
-        workout_exercises = [dict(r) for r in cur.fetchall()]
-
-        cur.execute(
-            "SELECT * FROM meal_logs WHERE user_id = %s ORDER BY meal_date;",
-            (user_id,),
-        )
-        meals = [dict(r) for r in cur.fetchall()]
-
-        cur.execute(
-            """
-            SELECT ml.*, mf.food_id, mf.quantity
-            FROM meal_logs ml
-            LEFT JOIN meal_foods mf ON ml.id = mf.meal_id
-            WHERE ml.user_id = %s
-            ORDER BY ml.meal_date, ml.id;
-            """,
-            (user_id,),
-        )
-        meal_foods_rows = [dict(r) for r in cur.fetchall()]
-
-    data = {
-        "user_id": user_id,
-        "workouts": workouts,
-        "workout_exercises": workout_exercises,
-        "meals": meals,
-        "meal_foods": meal_foods_rows,
-    }
-
-    filename = f"user_{user_id}_export.json"
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, default=str, indent=2)
+    fmt = input("Format (json/ndjson, blank = json): ").strip().lower() or "json"
+    since = input("Only logs since YYYY-MM-DD (blank = everything): ").strip()
+
+    try:
+        filename = services.export_to_file(user_id, fmt=fmt, since=since or None)
+    except ServiceError as e:
+        print(f"{e}\n")
+        return
 
     print(f"Data exported to {filename}\n")
@@ -1,6 +1,8 @@
 #!/usr/bin/env bash
 set -e
 
+# Needs PostgreSQL 12 or later (see README.md).
+
 # ---- CONFIG: edit these for your environment ----
 DB_NAME="fitness_tracker"
 DB_USER="postgres"    # change if needed
@@ -20,5 +22,8 @@ python -m venv .venv
 source .venv/bin/activate
 pip install -r requirements.txt
 
+echo "Applying migrations..."
+python migrate.py
+
 echo "Starting CLI app..."
 python app.py
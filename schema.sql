@@ -1,6 +1,12 @@
 -- schema.sql
 -- Fitness & Nutrition Logger schema (PostgreSQL)
+-- Bootstrap for a NEW database only: it drops everything first. Existing
+-- databases are evolved with `python migrate.py` (see migrations/).
 
+DROP TABLE IF EXISTS schema_migrations CASCADE;
+DROP TABLE IF EXISTS archived_log_months CASCADE;
+DROP TABLE IF EXISTS summary_rollups CASCADE;
+DROP TABLE IF EXISTS daily_summaries CASCADE;
 DROP TABLE IF EXISTS meal_foods CASCADE;
 DROP TABLE IF EXISTS meal_logs CASCADE;
 DROP TABLE IF EXISTS foods CASCADE;
@@ -44,6 +50,8 @@ CREATE TABLE exercises (
 );
 
 -- WORKOUT LOGGING --------------------------------------------------
+-- Migration 0008 turns workout_logs and meal_logs into monthly partitions
+-- (see partitions.py) and gives the child tables the parent's date.
 
 CREATE TABLE workout_logs (
     id              BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
@@ -112,6 +120,59 @@ CREATE TABLE meal_foods (
         ON DELETE RESTRICT
 );
 
+-- DAILY SUMMARIES --------------------------------------------------
+-- One row per user and day, maintained by the service layer on every
+-- meal/workout write (see summaries.py; `python summaries.py rebuild`).
+
+CREATE TABLE daily_summaries (
+    user_id       BIGINT NOT NULL,
+    day           DATE NOT NULL,
+    calories_in   DECIMAL(9,2) NOT NULL DEFAULT 0,
+    protein_g     DECIMAL(8,2) NOT NULL DEFAULT 0,
+    carbs_g       DECIMAL(8,2) NOT NULL DEFAULT 0,
+    fats_g        DECIMAL(8,2) NOT NULL DEFAULT 0,
+    meal_count    INTEGER NOT NULL DEFAULT 0,
+    calories_out  DECIMAL(9,2) NOT NULL DEFAULT 0,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day),
+    CONSTRAINT fk_daily_summaries_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+-- SUMMARY ROLLUPS --------------------------------------------------
+-- Weekly and monthly sums of daily_summaries per user (period_start is the
+-- Monday / first of the month), re-summed whenever one of their days changes.
+
+CREATE TABLE summary_rollups (
+    user_id       BIGINT NOT NULL,
+    period        TEXT NOT NULL CHECK (period IN ('week', 'month')),
+    period_start  DATE NOT NULL,
+    days_logged   INTEGER NOT NULL DEFAULT 0,
+    meal_days     INTEGER NOT NULL DEFAULT 0,
+    calories_in   DECIMAL(11,2) NOT NULL DEFAULT 0,
+    protein_g     DECIMAL(10,2) NOT NULL DEFAULT 0,
+    carbs_g       DECIMAL(10,2) NOT NULL DEFAULT 0,
+    fats_g        DECIMAL(10,2) NOT NULL DEFAULT 0,
+    meal_count    INTEGER NOT NULL DEFAULT 0,
+    calories_out  DECIMAL(11,2) NOT NULL DEFAULT 0,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, period, period_start),
+    CONSTRAINT fk_summary_rollups_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+-- ARCHIVED LOG MONTHS ----------------------------------------------
+-- Months partitions.py has moved out to archive files; their summaries are
+-- kept as they were (see summaries.py).
+
+CREATE TABLE archived_log_months (
+    month       DATE PRIMARY KEY,
+    month_end   DATE NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- SAMPLE DATA ------------------------------------------------------
 
 INSERT INTO users (name, age, gender, height_cm, weight_kg, bmi)
@@ -176,4 +237,42 @@ FROM (
   JOIN foods f ON f.id = mf.food_id
   GROUP BY mf.meal_id
 ) sub
-WHERE ml.id = sub.meal_id;
\ No newline at end of file
+WHERE ml.id = sub.meal_id;
+
+INSERT INTO daily_summaries
+    (user_id, day, calories_in, protein_g, carbs_g, fats_g, meal_count,
+     calories_out, workout_count)
+SELECT COALESCE(m.user_id, w.user_id),
+       COALESCE(m.day, w.day),
+       COALESCE(m.calories, 0), COALESCE(m.protein_g, 0),
+       COALESCE(m.carbs_g, 0), COALESCE(m.fats_g, 0), COALESCE(m.n, 0),
+       COALESCE(w.calories_out, 0), COALESCE(w.n, 0)
+FROM (
+  SELECT user_id, meal_date AS day,
+         COALESCE(SUM(calories), 0)  AS calories,
+         COALESCE(SUM(protein_g), 0) AS protein_g,
+         COALESCE(SUM(carbs_g), 0)   AS carbs_g,
+         COALESCE(SUM(fats_g), 0)    AS fats_g,
+         COUNT(*)                    AS n
+  FROM meal_logs
+  GROUP BY user_id, meal_date
+) m
+FULL OUTER JOIN (
+  SELECT user_id, workout_date AS day,
+         COALESCE(SUM(calories_burned), 0) AS calories_out,
+         COUNT(*)                          AS n
+  FROM workout_logs
+  GROUP BY user_id, workout_date
+) w ON w.user_id = m.user_id AND w.day = m.day;
+
+INSERT INTO summary_rollups
+    (user_id, period, period_start, days_logged, meal_days, calories_in,
+     protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+SELECT user_id, p.period, date_trunc(p.period, day)::date,
+       COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0),
+       COUNT(*) FILTER (WHERE meal_count > 0),
+       SUM(calories_in), SUM(protein_g), SUM(carbs_g), SUM(fats_g),
+       SUM(meal_count), SUM(calories_out), SUM(workout_count)
+FROM daily_summaries
+CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+GROUP BY user_id, p.period, date_trunc(p.period, day);
@@ -0,0 +1,307 @@
+-- schema_sqlite.sql
+-- Fitness & Nutrition Logger schema (embedded SQLite, see sqlite_backend.py)
+-- Same tables, constraints and sample data as schema.sql, with the indexes that
+-- migrations/ adds on Postgres (except the pg_trgm ones). Bootstrap for a NEW
+-- database file only: it drops everything first.
+--
+-- Column types keep their Postgres names: DATE, TIMESTAMP and DECIMAL values are
+-- converted back to date/datetime/Decimal when read, as psycopg2 does.
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+
+DROP TABLE IF EXISTS archived_log_months;
+DROP TABLE IF EXISTS summary_rollups;
+DROP TABLE IF EXISTS daily_summaries;
+DROP TABLE IF EXISTS meal_foods;
+DROP TABLE IF EXISTS meal_logs;
+DROP TABLE IF EXISTS foods;
+DROP TABLE IF EXISTS workout_exercises;
+DROP TABLE IF EXISTS workout_logs;
+DROP TABLE IF EXISTS exercises;
+DROP TABLE IF EXISTS user_profiles;
+DROP TABLE IF EXISTS users;
+
+-- USERS ------------------------------------------------------------
+
+CREATE TABLE users (
+    id          INTEGER PRIMARY KEY,
+    name        VARCHAR(120) NOT NULL,
+    age         SMALLINT CHECK (age BETWEEN 5 AND 120),
+    gender      VARCHAR(20),
+    height_cm   DECIMAL(5,2),
+    weight_kg   DECIMAL(6,2),
+    bmi         DECIMAL(5,2),
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE user_profiles (
+    user_id       BIGINT PRIMARY KEY,
+    email         VARCHAR(255) NOT NULL UNIQUE,
+    password_hash VARCHAR(100) NOT NULL,
+    date_joined   DATE DEFAULT CURRENT_DATE,
+    CONSTRAINT fk_user_profiles_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+-- EXERCISES --------------------------------------------------------
+
+CREATE TABLE exercises (
+    id            INTEGER PRIMARY KEY,
+    exercise_name VARCHAR(120) NOT NULL UNIQUE,
+    category      VARCHAR(60),
+    muscle_group  VARCHAR(60),
+    equipment     VARCHAR(80)
+);
+
+-- WORKOUT LOGGING --------------------------------------------------
+
+CREATE TABLE workout_logs (
+    id              INTEGER PRIMARY KEY,
+    user_id         BIGINT NOT NULL,
+    workout_type    VARCHAR(60),
+    duration_min    DECIMAL(5,2) CHECK (duration_min >= 0),
+    intensity       VARCHAR(30),
+    calories_burned DECIMAL(7,2) CHECK (calories_burned >= 0),
+    workout_date    DATE DEFAULT CURRENT_DATE,
+    CONSTRAINT fk_workout_logs_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE workout_exercises (
+    workout_id    BIGINT NOT NULL,
+    exercise_id   BIGINT NOT NULL,
+    sets          SMALLINT CHECK (sets >= 0),
+    reps          SMALLINT CHECK (reps >= 0),
+    weight_used_kg DECIMAL(6,2) CHECK (weight_used_kg >= 0),
+    workout_date  DATE,
+    PRIMARY KEY (workout_id, exercise_id),
+    CONSTRAINT fk_we_workout
+        FOREIGN KEY (workout_id) REFERENCES workout_logs(id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_we_exercise
+        FOREIGN KEY (exercise_id) REFERENCES exercises(id)
+        ON DELETE RESTRICT
+);
+
+-- FOODS & MEALS ----------------------------------------------------
+
+CREATE TABLE foods (
+    id               INTEGER PRIMARY KEY,
+    food_name        VARCHAR(160) NOT NULL UNIQUE,
+    serving_size     VARCHAR(60),
+    calories_per_serv DECIMAL(7,2) CHECK (calories_per_serv >= 0),
+    protein_g        DECIMAL(6,2) CHECK (protein_g >= 0),
+    carbs_g          DECIMAL(6,2) CHECK (carbs_g >= 0),
+    fats_g           DECIMAL(6,2) CHECK (fats_g >= 0)
+);
+
+CREATE TABLE meal_logs (
+    id         INTEGER PRIMARY KEY,
+    user_id    BIGINT NOT NULL,
+    meal_type  VARCHAR(40),
+    calories   DECIMAL(7,2),
+    protein_g  DECIMAL(6,2),
+    carbs_g    DECIMAL(6,2),
+    fats_g     DECIMAL(6,2),
+    meal_date  DATE DEFAULT CURRENT_DATE,
+    CONSTRAINT fk_meal_logs_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE meal_foods (
+    meal_id  BIGINT NOT NULL,
+    food_id  BIGINT NOT NULL,
+    quantity DECIMAL(8,3) DEFAULT 1 CHECK (quantity > 0),
+    meal_date DATE,
+    PRIMARY KEY (meal_id, food_id),
+    CONSTRAINT fk_mf_meal
+        FOREIGN KEY (meal_id) REFERENCES meal_logs(id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_mf_food
+        FOREIGN KEY (food_id) REFERENCES foods(id)
+        ON DELETE RESTRICT
+);
+
+-- DAILY SUMMARIES --------------------------------------------------
+
+CREATE TABLE daily_summaries (
+    user_id       BIGINT NOT NULL,
+    day           DATE NOT NULL,
+    calories_in   DECIMAL(9,2) NOT NULL DEFAULT 0,
+    protein_g     DECIMAL(8,2) NOT NULL DEFAULT 0,
+    carbs_g       DECIMAL(8,2) NOT NULL DEFAULT 0,
+    fats_g        DECIMAL(8,2) NOT NULL DEFAULT 0,
+    meal_count    INTEGER NOT NULL DEFAULT 0,
+    calories_out  DECIMAL(9,2) NOT NULL DEFAULT 0,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day),
+    CONSTRAINT fk_daily_summaries_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+-- SUMMARY ROLLUPS --------------------------------------------------
+
+CREATE TABLE summary_rollups (
+    user_id       BIGINT NOT NULL,
+    period        TEXT NOT NULL CHECK (period IN ('week', 'month')),
+    period_start  DATE NOT NULL,
+    days_logged   INTEGER NOT NULL DEFAULT 0,
+    meal_days     INTEGER NOT NULL DEFAULT 0,
+    calories_in   DECIMAL(11,2) NOT NULL DEFAULT 0,
+    protein_g     DECIMAL(10,2) NOT NULL DEFAULT 0,
+    carbs_g       DECIMAL(10,2) NOT NULL DEFAULT 0,
+    fats_g        DECIMAL(10,2) NOT NULL DEFAULT 0,
+    meal_count    INTEGER NOT NULL DEFAULT 0,
+    calories_out  DECIMAL(11,2) NOT NULL DEFAULT 0,
+    workout_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, period, period_start),
+    CONSTRAINT fk_summary_rollups_user
+        FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+-- ARCHIVED LOG MONTHS (migration 0009) -----------------------------
+-- Always empty here (nothing is partitioned); the summary SQL checks it.
+
+CREATE TABLE archived_log_months (
+    month       DATE PRIMARY KEY,
+    month_end   DATE NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- LOG DATES ON CHILD ROWS (migration 0008) -------------------------
+-- Postgres partitions the logs by date and keys the children on (id, date);
+-- here the copy is only kept in step, so the same inserts work on both.
+
+CREATE TRIGGER trg_workout_logs_date AFTER UPDATE OF workout_date ON workout_logs
+BEGIN
+    UPDATE workout_exercises SET workout_date = NEW.workout_date WHERE workout_id = NEW.id;
+END;
+
+CREATE TRIGGER trg_meal_logs_date AFTER UPDATE OF meal_date ON meal_logs
+BEGIN
+    UPDATE meal_foods SET meal_date = NEW.meal_date WHERE meal_id = NEW.id;
+END;
+
+-- INDEXES (migrations 0002, 0004, 0005) -----------------------------
+
+CREATE INDEX idx_workout_logs_user_date ON workout_logs (user_id, workout_date);
+CREATE INDEX idx_meal_logs_user_date ON meal_logs (user_id, meal_date);
+CREATE INDEX idx_meal_foods_food ON meal_foods (food_id);
+CREATE INDEX idx_foods_name_prefix ON foods (lower(food_name) COLLATE BINARY, id);
+CREATE INDEX idx_exercises_name_prefix ON exercises (lower(exercise_name) COLLATE BINARY, id);
+
+-- SAMPLE DATA ------------------------------------------------------
+
+INSERT INTO users (name, age, gender, height_cm, weight_kg, bmi)
+VALUES ('Demo User', 20, 'M', 178, 76, ROUND(76/(178*178)*10000,2));
+
+INSERT INTO user_profiles (user_id, email, password_hash)
+VALUES (
+  (SELECT id FROM users WHERE name = 'Demo User'),
+  'demo@example.com',
+  'ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f'
+);
+
+INSERT INTO exercises (exercise_name, category, muscle_group, equipment) VALUES
+('Bench Press','Strength','Chest','Barbell'),
+('Squat','Strength','Legs','Barbell'),
+('Running','Cardio','Full Body','Treadmill');
+
+INSERT INTO foods (food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g) VALUES
+('Chicken Breast','100g',165,31,0,3.6),
+('White Rice','1 cup (158g)',205,4.3,44.5,0.4),
+('Olive Oil','1 tbsp',119,0,0,13.5);
+
+INSERT INTO workout_logs (user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+VALUES (
+  (SELECT id FROM users WHERE name = 'Demo User'),
+  'Upper Body', 45, 'Moderate', 350, CURRENT_DATE
+);
+
+INSERT INTO workout_exercises (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date)
+VALUES (
+  (SELECT id FROM workout_logs WHERE user_id = (SELECT id FROM users WHERE name = 'Demo User') ORDER BY id DESC LIMIT 1),
+  (SELECT id FROM exercises WHERE exercise_name = 'Bench Press'),
+  4, 8, 60, CURRENT_DATE
+);
+
+INSERT INTO meal_logs (user_id, meal_type, meal_date)
+VALUES (
+  (SELECT id FROM users WHERE name = 'Demo User'),
+  'Lunch',
+  CURRENT_DATE
+);
+
+INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date) VALUES
+(
+  (SELECT id FROM meal_logs WHERE user_id = (SELECT id FROM users WHERE name = 'Demo User') ORDER BY id DESC LIMIT 1),
+  (SELECT id FROM foods WHERE food_name = 'Chicken Breast'),
+  2.0, CURRENT_DATE
+);
+
+UPDATE meal_logs AS ml
+SET calories  = sub.total_cal,
+    protein_g = sub.total_protein,
+    carbs_g   = sub.total_carbs,
+    fats_g    = sub.total_fats
+FROM (
+  SELECT mf.meal_id,
+         SUM(f.calories_per_serv * mf.quantity) AS total_cal,
+         SUM(f.protein_g * mf.quantity)        AS total_protein,
+         SUM(f.carbs_g * mf.quantity)          AS total_carbs,
+         SUM(f.fats_g * mf.quantity)           AS total_fats
+  FROM meal_foods mf
+  JOIN foods f ON f.id = mf.food_id
+  GROUP BY mf.meal_id
+) sub
+WHERE ml.id = sub.meal_id;
+
+INSERT INTO daily_summaries
+    (user_id, day, calories_in, protein_g, carbs_g, fats_g, meal_count,
+     calories_out, workout_count)
+SELECT COALESCE(m.user_id, w.user_id),
+       COALESCE(m.day, w.day),
+       COALESCE(m.calories, 0), COALESCE(m.protein_g, 0),
+       COALESCE(m.carbs_g, 0), COALESCE(m.fats_g, 0), COALESCE(m.n, 0),
+       COALESCE(w.calories_out, 0), COALESCE(w.n, 0)
+FROM (
+  SELECT user_id, meal_date AS day,
+         COALESCE(SUM(calories), 0)  AS calories,
+         COALESCE(SUM(protein_g), 0) AS protein_g,
+         COALESCE(SUM(carbs_g), 0)   AS carbs_g,
+         COALESCE(SUM(fats_g), 0)    AS fats_g,
+         COUNT(*)                    AS n
+  FROM meal_logs
+  GROUP BY user_id, meal_date
+) m
+FULL OUTER JOIN (
+  SELECT user_id, workout_date AS day,
+         COALESCE(SUM(calories_burned), 0) AS calories_out,
+         COUNT(*)                          AS n
+  FROM workout_logs
+  GROUP BY user_id, workout_date
+) w ON w.user_id = m.user_id AND w.day = m.day;
+
+-- Weeks start on Monday: 'weekday 0' moves to the next Sunday (or stays on one).
+INSERT INTO summary_rollups
+    (user_id, period, period_start, days_logged, meal_days, calories_in,
+     protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+SELECT user_id, period, start,
+       COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0),
+       COUNT(*) FILTER (WHERE meal_count > 0),
+       SUM(calories_in), SUM(protein_g), SUM(carbs_g), SUM(fats_g),
+       SUM(meal_count), SUM(calories_out), SUM(workout_count)
+FROM (
+  SELECT d.*, p.period,
+         CASE p.period WHEN 'week' THEN date(d.day, 'weekday 0', '-6 days')
+                       ELSE date(d.day, 'start of month') END AS start
+  FROM daily_summaries d
+  CROSS JOIN (SELECT 'week' AS period UNION ALL SELECT 'month') AS p
+) x
+GROUP BY user_id, period, start;
@@ -0,0 +1,710 @@
+# server.py
+# HTTP/JSON front end over services.py. Connections are accepted on the main
+# thread and handed to a fixed pool of worker threads through a bounded queue;
+# when the queue is full the client gets 503 + Retry-After instead of waiting.
+import argparse
+import base64
+import binascii
+import json
+import queue
+import re
+import socket
+import threading
+from dataclasses import asdict, is_dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import psycopg2
+import psycopg2.errors
+
+import analytics
+import autocomplete
+import catalog
+import db
+import exporter
+import instrument
+import passwords
+import services
+import sessions
+import writequeue
+from models import BusyError, MealSearch, NotFoundError, ServiceError, User, ValidationError, WorkoutSearch
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 64
+REQUEST_TIMEOUT = 30          # seconds a client may take to send its request
+MAX_BODY_BYTES = 1024 * 1024
+WRITE_QUEUE = False           # --write-queue: log writes go through writequeue (group commit)
+ADMIN_USER_IDS = frozenset()  # --admin: users allowed to change shared catalog entries
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _to_jsonable(obj):
+    if is_dataclass(obj):
+        return asdict(obj)
+    if isinstance(obj, list):
+        return [_to_jsonable(o) for o in obj]
+    return obj
+
+
+# ---- ROUTES -------------------------------------------------------------
+# Each handler takes (handler, user, match) and returns (status, payload), or
+# (None, None) when it has already written the response itself (streaming).
+
+_routes = []
+
+
+def route(method: str, pattern: str, auth: bool = True):
+    regex = re.compile(f"^{pattern}$")
+
+    def decorator(func):
+        _routes.append((method, regex, func, auth))
+        return func
+
+    return decorator
+
+
+def _writes():
+    # writequeue mirrors the service calls used by the POST handlers below.
+    return writequeue if WRITE_QUEUE else services
+
+
+def _int(value, what: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{what} must be an integer.") from None
+
+
+def _float(value, what: str, default=None):
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{what} must be a number.") from None
+
+
+def _db_error(e: Exception) -> str:
+    lines = str(e).strip().splitlines()
+    return lines[0] if lines else type(e).__name__
+
+
+def _items(body: dict, key: str) -> Optional[list]:
+    items = body.get(key)
+    if items is None:
+        return None
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        raise ValidationError(f"{key} must be a list of objects.")
+    return items
+
+
+@route("GET", "/health", auth=False)
+def health(h, user, m):
+    return HTTPStatus.OK, {
+        "status": "ok",
+        "pool": asdict(db.pool_stats()),
+        "replicas": [asdict(r) for r in db.replica_stats()],
+        "catalog": {name: asdict(s) for name, s in catalog.stats().items()},
+        "autocomplete": {
+            "foods": {"ready": autocomplete.foods.ready, "size": len(autocomplete.foods)},
+            "exercises": {"ready": autocomplete.exercises.ready, "size": len(autocomplete.exercises)},
+        },
+        "sessions": asdict(sessions.store.stats()),
+    }
+
+
+@route("GET", "/metrics", auth=False)
+def metrics(h, user, m):
+    # Prometheus text format; counters stay empty unless started with --instrument.
+    body = instrument.render_metrics().encode("utf-8")
+    h.send_response(HTTPStatus.OK)
+    h.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    h.send_header("Content-Length", str(len(body)))
+    h.end_headers()
+    h.wfile.write(body)
+    return None, None
+
+
+@route("POST", "/sessions", auth=False)
+def create_session(h, user, m):
+    # Exchange email/password for a bearer token; the password is checked once.
+    # "read_your_writes": true makes reports and searches on this session see its
+    # own writes even when they are served by a lagging replica.
+    body = h.json_body()
+    session = sessions.login(
+        body.get("email") or "", body.get("password") or "", bool(body.get("read_your_writes"))
+    )
+    if session is None:
+        raise HttpError(HTTPStatus.UNAUTHORIZED, "Invalid email or password.")
+    return HTTPStatus.CREATED, {
+        "token": session.token,
+        "user_id": session.user_id,
+        "expires_in": int(session.expires - session.created),
+        "read_your_writes": session.read_your_writes,
+    }
+
+
+@route("DELETE", "/sessions/current")
+def delete_session(h, user, m):
+    _, _, token = h.headers.get("Authorization", "").partition(" ")
+    sessions.logout(token.strip())
+    return HTTPStatus.NO_CONTENT, None
+
+
+@route("POST", "/register", auth=False)
+def register(h, user, m):
+    body = h.json_body()
+    age = body.get("age")
+    user_id = services.register_user(
+        body.get("name"),
+        body.get("email"),
+        body.get("password"),
+        _int(age, "age") if age not in (None, "") else None,
+        body.get("gender"),
+        _float(body.get("height_cm"), "height_cm"),
+        _float(body.get("weight_kg"), "weight_kg"),
+    )
+    return HTTPStatus.CREATED, {"id": user_id}
+
+
+@route("POST", "/workouts")
+def create_workout(h, user, m):
+    # An optional "exercises" list creates the workout and its exercises in one go.
+    body = h.json_body()
+    fields = dict(
+        workout_type=body.get("workout_type"),
+        duration_min=_float(body.get("duration_min"), "duration_min", 0),
+        intensity=body.get("intensity"),
+        calories_burned=_float(body.get("calories_burned"), "calories_burned", 0),
+        workout_date=body.get("workout_date"),
+    )
+    exercises = _items(body, "exercises")
+    if exercises is None:
+        workout = _writes().create_workout(user.id, **fields)
+    else:
+        rows = [
+            (
+                _int(e.get("exercise_id"), "exercise_id"),
+                _int(e.get("sets", 0), "sets"),
+                _int(e.get("reps", 0), "reps"),
+                _float(e.get("weight_used_kg"), "weight_used_kg", 0),
+            )
+            for e in exercises
+        ]
+        workout = _writes().log_workout(user.id, exercises=rows, **fields)
+    return HTTPStatus.CREATED, workout
+
+
+@route("GET", "/workouts")
+def search_workouts(h, user, m):
+    q = h.query
+    criteria = WorkoutSearch(start=q.get("start"), end=q.get("end"), workout_type=q.get("type"))
+    return HTTPStatus.OK, services.search_workouts(user.id, criteria)
+
+
+@route("PATCH", r"/workouts/(\d+)")
+def update_workout(h, user, m):
+    body = h.json_body()
+    workout = services.update_workout(
+        user.id,
+        int(m.group(1)),
+        workout_type=body.get("workout_type"),
+        duration_min=_float(body.get("duration_min"), "duration_min"),
+        intensity=body.get("intensity"),
+        calories_burned=_float(body.get("calories_burned"), "calories_burned"),
+        workout_date=body.get("workout_date"),
+    )
+    return HTTPStatus.OK, workout
+
+
+@route("DELETE", r"/workouts/(\d+)")
+def delete_workout(h, user, m):
+    services.delete_workout(user.id, int(m.group(1)))
+    return HTTPStatus.NO_CONTENT, None
+
+
+@route("POST", r"/workouts/(\d+)/exercises")
+def add_exercise_to_workout(h, user, m):
+    body = h.json_body()
+    item = _writes().add_exercise_to_workout(
+        user.id,
+        int(m.group(1)),
+        _int(body.get("exercise_id"), "exercise_id"),
+        _int(body.get("sets", 0), "sets"),
+        _int(body.get("reps", 0), "reps"),
+        _float(body.get("weight_used_kg"), "weight_used_kg", 0),
+    )
+    return HTTPStatus.CREATED, item
+
+
+@route("POST", "/meals")
+def create_meal(h, user, m):
+    # An optional "foods" list creates the meal with its foods and totals in one go.
+    body = h.json_body()
+    foods = _items(body, "foods")
+    if foods is None:
+        meal = _writes().create_meal(user.id, body.get("meal_type"), body.get("meal_date"))
+    else:
+        rows = [(_int(f.get("food_id"), "food_id"), _float(f.get("quantity"), "quantity", 1.0)) for f in foods]
+        meal = _writes().log_meal(user.id, body.get("meal_type"), rows, body.get("meal_date"))
+    return HTTPStatus.CREATED, meal
+
+
+@route("GET", "/meals")
+def search_meals(h, user, m):
+    q = h.query
+    criteria = MealSearch(meal_date=q.get("date"), food_name=q.get("food"))
+    return HTTPStatus.OK, services.search_meals(user.id, criteria)
+
+
+@route("PATCH", r"/meals/(\d+)")
+def update_meal(h, user, m):
+    body = h.json_body()
+    meal = services.update_meal(
+        user.id,
+        int(m.group(1)),
+        meal_type=body.get("meal_type"),
+        meal_date=body.get("meal_date"),
+        calories=_float(body.get("calories"), "calories"),
+        protein_g=_float(body.get("protein_g"), "protein_g"),
+        carbs_g=_float(body.get("carbs_g"), "carbs_g"),
+        fats_g=_float(body.get("fats_g"), "fats_g"),
+    )
+    return HTTPStatus.OK, meal
+
+
+@route("DELETE", r"/meals/(\d+)")
+def delete_meal(h, user, m):
+    services.delete_meal(user.id, int(m.group(1)))
+    return HTTPStatus.NO_CONTENT, None
+
+
+@route("POST", r"/meals/(\d+)/foods")
+def add_food_to_meal(h, user, m):
+    body = h.json_body()
+    meal = _writes().add_food_to_meal(
+        user.id,
+        int(m.group(1)),
+        _int(body.get("food_id"), "food_id"),
+        _float(body.get("quantity"), "quantity", 1.0),
+    )
+    return HTTPStatus.CREATED, meal
+
+
+def _catalog_page(h, browse, search):
+    # ?q=<prefix> searches by name (&fuzzy=1 for trigram similarity); without q
+    # the catalog is paged by id. Pass the returned next_cursor as ?after=.
+    q = h.query
+    limit = _int(q["limit"], "limit") if q.get("limit") else None
+    if q.get("q"):
+        fuzzy = q.get("fuzzy", "").lower() in ("1", "true", "yes")
+        return HTTPStatus.OK, search(q["q"], fuzzy=fuzzy, after=q.get("after"), limit=limit)
+    return HTTPStatus.OK, browse(q.get("after"), limit)
+
+
+@route("GET", "/exercises/suggest")
+def suggest_exercises(h, user, m):
+    k = _int(h.query.get("k", 10), "k")
+    return HTTPStatus.OK, services.suggest_exercises(h.query.get("q", ""), k)
+
+
+@route("GET", "/exercises")
+def list_exercises(h, user, m):
+    return _catalog_page(h, services.browse_exercises, services.search_exercises)
+
+
+@route("POST", "/exercises")
+def create_exercise(h, user, m):
+    body = h.json_body()
+    exercise = services.create_exercise(
+        body.get("exercise_name"),
+        body.get("category"),
+        body.get("muscle_group"),
+        body.get("equipment"),
+    )
+    if exercise is None:
+        raise HttpError(HTTPStatus.CONFLICT, "Exercise already exists (by name).")
+    return HTTPStatus.CREATED, exercise
+
+
+@route("GET", "/foods/suggest")
+def suggest_foods(h, user, m):
+    k = _int(h.query.get("k", 10), "k")
+    return HTTPStatus.OK, services.suggest_foods(h.query.get("q", ""), k)
+
+
+@route("GET", "/foods")
+def list_foods(h, user, m):
+    return _catalog_page(h, services.browse_foods, services.search_foods)
+
+
+@route("POST", "/foods")
+def create_food(h, user, m):
+    body = h.json_body()
+    food = services.create_food(
+        body.get("food_name"),
+        body.get("serving_size"),
+        _float(body.get("calories_per_serv"), "calories_per_serv", 0),
+        _float(body.get("protein_g"), "protein_g", 0),
+        _float(body.get("carbs_g"), "carbs_g", 0),
+        _float(body.get("fats_g"), "fats_g", 0),
+    )
+    if food is None:
+        raise HttpError(HTTPStatus.CONFLICT, "Food already exists (by name).")
+    return HTTPStatus.CREATED, food
+
+
+@route("PATCH", r"/foods/(\d+)")
+def update_food(h, user, m):
+    # Rewrites the macros of every user's meals that use the food: admins only.
+    if user.id not in ADMIN_USER_IDS:
+        raise HttpError(HTTPStatus.FORBIDDEN, "Only administrators can change catalog foods.")
+    body = h.json_body()
+    food = services.update_food(
+        int(m.group(1)),
+        serving_size=body.get("serving_size"),
+        calories_per_serv=_float(body.get("calories_per_serv"), "calories_per_serv"),
+        protein_g=_float(body.get("protein_g"), "protein_g"),
+        carbs_g=_float(body.get("carbs_g"), "carbs_g"),
+        fats_g=_float(body.get("fats_g"), "fats_g"),
+    )
+    return HTTPStatus.OK, food
+
+
+@route("GET", "/reports/daily")
+def daily_report(h, user, m):
+    report = services.compute_daily_report(user.id, h.query.get("date"))
+    return HTTPStatus.OK, {**asdict(report), "balance": report.balance}
+
+
+@route("GET", "/reports/weekly")
+def weekly_report(h, user, m):
+    report = services.compute_weekly_report(user.id, h.query.get("end"))
+    return HTTPStatus.OK, report
+
+
+@route("GET", "/reports/analytics")
+def analytics_report(h, user, m):
+    # ?start=&end=&window=7 plus optional macro targets, e.g. &calories=2200&protein_g=150
+    q = h.query
+    targets = {k: _float(q[k], k) for k in analytics.MACROS if q.get(k)}
+    window = _int(q["window"], "window") if q.get("window") else analytics.ROLLING_WINDOW
+    return HTTPStatus.OK, analytics.report(user.id, q.get("start"), q.get("end"), window, targets)
+
+
+@route("GET", "/reports/trend")
+def trend_report(h, user, m):
+    # ?start=&end=&bucket=day|week|month
+    q = h.query
+    report = services.compute_trend_report(user.id, q.get("start"), q.get("end"), q.get("bucket", "day"))
+    points = [
+        {
+            **asdict(p),
+            "avg_calories_in": p.avg_calories_in,
+            "avg_calories_out": p.avg_calories_out,
+            "balance": p.balance,
+        }
+        for p in report.points
+    ]
+    return HTTPStatus.OK, {**asdict(report), "points": points}
+
+
+@route("GET", "/export")
+def export(h, user, m):
+    fmt = h.query.get("format", "json")
+    layout = h.query.get("layout", "nested")
+    if fmt not in exporter.FORMATS:
+        raise ValidationError(f"format must be one of {', '.join(exporter.FORMATS)}.")
+    if layout not in exporter.LAYOUTS:
+        raise ValidationError(f"layout must be one of {', '.join(exporter.LAYOUTS)}.")
+    since = services._as_date(h.query["since"], "since date") if h.query.get("since") else None
+
+    # Streamed without Content-Length; the connection closes at the end (HTTP/1.0).
+    # The connection is taken before the status line, so a busy pool is still a 503;
+    # once the body has started, a failure can only cut the connection short.
+    streaming = False
+    try:
+        with db.get_connection(readonly=True) as conn:
+            h.send_response(HTTPStatus.OK)
+            h.send_header("Content-Type", "application/x-ndjson" if fmt == "ndjson" else "application/json")
+            h.end_headers()
+            streaming = True
+            out = _ChunkWriter(h.wfile)
+            exporter.stream_export(user.id, out, fmt, since, layout=layout, conn=conn)
+            out.flush()
+    except Exception as e:
+        if not streaming:
+            raise
+        h.log_error("export for user %s aborted mid-stream: %r", user.id, e)
+        h.abort_connection()
+    return None, None
+
+
+# ---- HTTP PLUMBING ------------------------------------------------------
+
+
+class _ChunkWriter:
+    # Text sink for exporter.stream_export that writes to the socket in ~64 KB chunks.
+    def __init__(self, wfile, chunk_size: int = 64 * 1024):
+        self._wfile = wfile
+        self._chunk_size = chunk_size
+        self._parts = []
+        self._size = 0
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self._parts.append(data)
+        self._size += len(data)
+        if self._size >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self._wfile.write(b"".join(self._parts))
+            self._parts.clear()
+            self._size = 0
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "FitnessTracker/1.0"
+    timeout = REQUEST_TIMEOUT
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def json_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON.") from None
+        if not isinstance(body, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object.")
+        return body
+
+    def _authenticate(self):
+        # Bearer tokens come from POST /sessions; Basic checks the password each time.
+        header = self.headers.get("Authorization", "")
+        scheme, _, credentials = header.partition(" ")
+        if scheme.lower() == "bearer":
+            session = sessions.resolve(credentials.strip())
+            if session and session.read_your_writes:
+                self.consistency_key = session.token
+            return User(id=session.user_id, name=session.name) if session else None
+        if scheme.lower() != "basic":
+            return None
+        try:
+            email, _, password = base64.b64decode(credentials).decode("utf-8").partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+        return services.authenticate(email, password)
+
+    def abort_connection(self):
+        # Drop the socket without a response, e.g. when a streamed body fails
+        # part-way; the client sees a truncated body rather than a second response.
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _send_json(self, status: HTTPStatus, payload, headers=None):
+        body = b"" if payload is None else json.dumps(_to_jsonable(payload), default=str).encode("utf-8")
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        parts = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.consistency_key = None
+
+        allowed = []
+        for r_method, regex, func, needs_auth in _routes:
+            m = regex.match(parts.path)
+            if not m:
+                continue
+            if r_method != method:
+                allowed.append(r_method)
+                continue
+            try:
+                with instrument.operation(func.__name__):
+                    user = None
+                    if needs_auth:
+                        user = self._authenticate()
+                        if user is None:
+                            raise HttpError(HTTPStatus.UNAUTHORIZED, "Authentication required.")
+                    with db.read_your_writes(self.consistency_key):
+                        status, payload = func(self, user, m)
+            except HttpError as e:
+                headers = {"WWW-Authenticate": 'Basic realm="fitness"'} if e.status == HTTPStatus.UNAUTHORIZED else None
+                self._send_json(e.status, {"error": str(e)}, headers)
+            except NotFoundError as e:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": str(e)})
+            except BusyError as e:
+                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}, {"Retry-After": "1"})
+            except (ValidationError, ServiceError) as e:
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            except db.PoolTimeout:
+                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Database busy."}, {"Retry-After": "1"})
+            except psycopg2.errors.UniqueViolation:
+                self._send_json(HTTPStatus.CONFLICT, {"error": "Already exists."})
+            except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                # Constraint or type errors the services did not catch: bad input, not a bug.
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": f"Invalid data: {_db_error(e)}"})
+            except Exception:
+                self.log_error("unhandled error on %s %s", method, self.path)
+                self.server.handle_error(self.request, self.client_address)
+                self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."})
+            else:
+                if status is not None:  # None: the route already wrote its response
+                    self._send_json(status, payload)
+            return
+
+        if allowed:
+            self._send_json(HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Method not allowed."},
+                            {"Allow": ", ".join(sorted(set(allowed)))})
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+_BUSY_RESPONSE = (
+    b"HTTP/1.0 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Retry-After: 1\r\n"
+    b"Content-Length: 28\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b'{"error": "Server is busy."}'
+)
+
+
+class WorkerPoolHTTPServer(HTTPServer):
+    def __init__(self, address, handler_class, workers: int = DEFAULT_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, quiet: bool = False):
+        super().__init__(address, handler_class)
+        self.quiet = quiet
+        self.rejected = 0
+        self._requests = queue.Queue(maxsize=queue_size)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"api-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._workers:
+            t.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            self.rejected += 1
+            try:
+                request.sendall(_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+        for t in self._workers:
+            t.join()
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS,
+                queue_size: int = DEFAULT_QUEUE_SIZE, quiet: bool = False) -> WorkerPoolHTTPServer:
+    # One pooled connection per worker, so workers never wait on each other for the DB.
+    db.configure_pool(min_size=min(db.POOL_MIN_SIZE, workers), max_size=max(workers, 1))
+    autocomplete.start_background_load()
+    return WorkerPoolHTTPServer((host, port), ApiHandler, workers=workers,
+                                queue_size=queue_size, quiet=quiet)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fitness & Nutrition Logger HTTP API")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    parser.add_argument("--instrument", action="store_true", help="time queries per route, serve /metrics")
+    parser.add_argument("--slow-query-ms", type=float, default=instrument.SLOW_QUERY_MS)
+    parser.add_argument("--slow-query-log", default=instrument.SLOW_QUERY_LOG)
+    parser.add_argument("--write-queue", action="store_true", help="group-commit workout/meal logging")
+    parser.add_argument("--db-dsn", help="primary database DSN (default: the settings in db.py)")
+    parser.add_argument("--replica-dsn", action="append", default=[], dest="replica_dsns",
+                        help="read-only replica for reports and searches (repeatable)")
+    parser.add_argument("--admin", type=int, action="append", default=[], metavar="USER_ID",
+                        help="user allowed to edit catalog foods (repeatable)")
+    args = parser.parse_args()
+
+    if args.instrument:
+        instrument.enable(args.slow_query_ms, args.slow_query_log)
+    global WRITE_QUEUE, ADMIN_USER_IDS
+    WRITE_QUEUE = args.write_queue
+    ADMIN_USER_IDS = frozenset(args.admin)
+    if args.db_dsn or args.replica_dsns:
+        db.configure_replicas(args.replica_dsns, args.db_dsn)
+
+    httpd = make_server(args.host, args.port, args.workers, args.queue_size, args.quiet)
+    print(f"Serving on http://{args.host}:{httpd.server_port} with {args.workers} workers")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        httpd.server_close()
+        writequeue.shutdown()
+        db.close_pool()
+        passwords.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1255 @@
+# services.py
+# Programmatic API for the tracker. No input()/print() here: every function takes
+# plain arguments, returns objects from models.py and raises ServiceError subclasses.
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import psycopg2.errors
+from psycopg2.extras import DictCursor
+
+import autocomplete
+import catalog
+import db
+import exporter
+import macros
+import passwords
+import summaries
+from db import get_connection
+from models import (
+    CatalogPage,
+    DailyReport,
+    Exercise,
+    Food,
+    Meal,
+    MealFood,
+    MealSearch,
+    NotFoundError,
+    ServiceError,
+    Suggestion,
+    TrendPoint,
+    TrendReport,
+    User,
+    ValidationError,
+    WeeklyReport,
+    Workout,
+    WorkoutExercise,
+    WorkoutSearch,
+)
+
+
+def hash_password(password: str) -> str:
+    return passwords.hash_password(password)
+
+
+def _as_date(value, what: str = "date") -> date:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValidationError(f"Invalid {what} (expected YYYY-MM-DD): {value!r}") from None
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+def _opt_num(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _values_list(cur, template: str, rows) -> str:
+    # Multi-row VALUES body, rendered the way psycopg2.extras.execute_values does.
+    return b",".join(cur.mogrify(template, row) for row in rows).decode(cur.connection.encoding)
+
+
+def _check_workout(duration_min, calories_burned):
+    # Limits of the workout_logs columns (DECIMAL(5,2), DECIMAL(7,2), >= 0).
+    if not 0 <= (duration_min or 0) < 1000:
+        raise ValidationError("Duration must be between 0 and 999.99 minutes.")
+    if not 0 <= (calories_burned or 0) < 100000:
+        raise ValidationError("Calories burned must be between 0 and 99999.99.")
+
+
+def _check_sets(sets, reps, weight_used_kg):
+    # Limits of the workout_exercises columns (SMALLINT, DECIMAL(6,2), >= 0).
+    if min(sets or 0, reps or 0, weight_used_kg or 0) < 0:
+        raise ValidationError("Sets, reps and weight cannot be negative.")
+    if max(sets or 0, reps or 0) > 32767 or (weight_used_kg or 0) >= 10000:
+        raise ValidationError("Sets, reps or weight out of range.")
+
+
+def _check_quantity(quantity):
+    # meal_foods.quantity is DECIMAL(8,3) and must be positive.
+    if not 0 < quantity < 100000:
+        raise ValidationError("Quantity must be greater than zero (and below 100000).")
+
+
+@contextmanager
+def _catalog_checked(cache, ids, what: str):
+    # The ids were checked against the catalog cache, which may still hold an
+    # entry deleted since; the insert then fails its foreign key instead.
+    try:
+        yield
+    except psycopg2.errors.ForeignKeyViolation:
+        for entry_id in ids:
+            cache.invalidate(entry_id)
+        raise ValidationError(f"Invalid {what} id {', '.join(map(str, ids))}.") from None
+
+
+def _insert_workout_sqlite(cur, params: tuple, exercises):
+    # log_workout without a data-modifying CTE (SQLite has none): a statement
+    # per table, still in the caller's transaction.
+    cur.execute(
+        """
+        INSERT INTO workout_logs
+        (user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id, user_id, workout_type, duration_min, intensity,
+                  calories_burned, workout_date;
+        """,
+        params,
+    )
+    row = cur.fetchone()
+    cur.executemany(
+        "INSERT INTO workout_exercises (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date) "
+        "VALUES (%s, %s, %s, %s, %s, %s);",
+        [(row["id"], *e, row["workout_date"]) for e in exercises],
+    )
+    return row
+
+
+def _insert_meal_sqlite(cur, params: tuple, foods):
+    # log_meal for SQLite: the totals are summed from meal_foods once it is filled.
+    cur.execute(
+        "INSERT INTO meal_logs (user_id, meal_type, meal_date) VALUES (%s, %s, %s) RETURNING id, meal_date;", params
+    )
+    meal = cur.fetchone()
+    meal_id = meal["id"]
+    cur.executemany(
+        "INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date) VALUES (%s, %s, %s, %s);",
+        [(meal_id, food_id, quantity, meal["meal_date"]) for food_id, quantity in foods],
+    )
+    macros.recompute_meals(cur, [meal_id])
+    cur.execute(
+        "SELECT id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g FROM meal_logs WHERE id = %s;",
+        (meal_id,),
+    )
+    return cur.fetchone()
+
+
+# ---- AUTH ---------------------------------------------------------------
+
+
+def register_user(
+    name: str,
+    email: str,
+    password: str,
+    age: int,
+    gender: str,
+    height_cm: float,
+    weight_kg: float,
+) -> int:
+    if not name or not email or not password:
+        raise ValidationError("Name, email and password are required.")
+    if age is not None and not 5 <= age <= 120:
+        raise ValidationError("Age must be between 5 and 120.")
+    if not height_cm or height_cm <= 0:
+        raise ValidationError("Height must be a positive number.")
+    if not weight_kg or weight_kg <= 0:
+        raise ValidationError("Weight must be a positive number.")
+    bmi = weight_kg / height_cm / height_cm * 10000
+    password_hash = hash_password(password)
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            "INSERT INTO users (name, age, gender, height_cm, weight_kg, bmi) "
+            "VALUES (%s, %s, %s, %s, %s, %s) RETURNING id;",
+            (name, age, gender, height_cm, weight_kg, bmi),
+        )
+        user_id = cur.fetchone()["id"]
+
+        cur.execute(
+            """
+            INSERT INTO user_profiles (user_id, email, password_hash)
+            VALUES (%s, %s, %s);
+            """,
+            (user_id, email, password_hash),
+        )
+        conn.commit()
+
+    return user_id
+
+
+# Verified when the email is unknown, so both failures take about as long.
+_DUMMY_HASH = "scrypt$16384$8$1$AAAAAAAAAAAAAAAAAAAAAA$AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+
+def authenticate(email: str, password: str) -> Optional[User]:
+    # The KDF runs after the connection is back in the pool. Legacy SHA-256
+    # hashes are replaced with scrypt on the first successful login.
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            SELECT u.id, u.name, up.password_hash
+            FROM user_profiles up
+            JOIN users u ON u.id = up.user_id
+            WHERE up.email = %s;
+            """,
+            (email,),
+        )
+        row = cur.fetchone()
+
+    if not row:
+        passwords.verify_password(password, _DUMMY_HASH)
+        return None
+    matches, needs_rehash = passwords.verify_password(password, row["password_hash"])
+    if not matches:
+        return None
+
+    if needs_rehash:
+        new_hash = hash_password(password)
+        with get_connection() as conn, conn.cursor() as cur:
+            # Only if nobody changed the hash meanwhile.
+            cur.execute(
+                "UPDATE user_profiles SET password_hash = %s WHERE user_id = %s AND password_hash = %s;",
+                (new_hash, row["id"], row["password_hash"]),
+            )
+            conn.commit()
+    return User(id=row["id"], name=row["name"])
+
+
+# ---- WORKOUTS -----------------------------------------------------------
+
+
+def _workout_from_row(r) -> Workout:
+    return Workout(
+        id=r["id"],
+        user_id=r["user_id"],
+        workout_type=r["workout_type"],
+        duration_min=_num(r["duration_min"]),
+        intensity=r["intensity"],
+        calories_burned=_num(r["calories_burned"]),
+        workout_date=_as_date(r["workout_date"]),
+    )
+
+
+def create_workout(
+    user_id: int,
+    workout_type: Optional[str],
+    duration_min: float = 0,
+    intensity: Optional[str] = None,
+    calories_burned: float = 0,
+    workout_date=None,
+) -> Workout:
+    _check_workout(duration_min, calories_burned)
+    workout_date = _as_date(workout_date or date.today(), "workout date")
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            INSERT INTO workout_logs
+            (user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING id, user_id, workout_type, duration_min, intensity,
+                      calories_burned, workout_date;
+            """,
+            (
+                user_id,
+                workout_type,
+                duration_min,
+                intensity,
+                calories_burned,
+                workout_date,
+            ),
+        )
+        workout = _workout_from_row(cur.fetchone())
+        summaries.refresh_day(cur, user_id, workout.workout_date)
+        conn.commit()
+
+    return workout
+
+
+def log_workout(
+    user_id: int,
+    workout_type: Optional[str],
+    exercises: Sequence[Tuple[int, int, int, float]],
+    duration_min: float = 0,
+    intensity: Optional[str] = None,
+    calories_burned: float = 0,
+    workout_date=None,
+) -> Workout:
+    # Creates a workout with all of its (exercise_id, sets, reps, weight_used_kg)
+    # rows in one statement and one transaction. A repeated exercise id keeps the
+    # last row, as repeated add_exercise_to_workout calls would.
+    workout_date = _as_date(workout_date or date.today(), "workout date")
+    items = {int(e[0]): (int(e[0]), int(e[1]), int(e[2]), float(e[3])) for e in exercises}
+    if not items:
+        raise ValidationError("A workout needs at least one exercise.")
+    for _, sets, reps, weight in items.values():
+        _check_sets(sets, reps, weight)
+    _check_workout(duration_min, calories_burned)
+
+    with _catalog_checked(catalog.exercises, items, "exercise"), get_connection() as conn, \
+            conn.cursor(cursor_factory=DictCursor) as cur:
+        names = {}
+        for exercise_id in items:
+            exercise = catalog.exercises.get(exercise_id, cur)
+            if not exercise:
+                raise ValidationError(f"Invalid exercise id {exercise_id}.")
+            names[exercise_id] = exercise.exercise_name
+
+        params = (user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+        if db.backend() == "sqlite":
+            row = _insert_workout_sqlite(cur, params, items.values())
+        else:
+            values = _values_list(cur, "(%s::bigint, %s::smallint, %s::smallint, %s::numeric(6,2))", items.values())
+            cur.execute(
+                f"""
+                WITH items (exercise_id, sets, reps, weight_used_kg) AS (VALUES {values}),
+                workout AS (
+                    INSERT INTO workout_logs
+                    (user_id, workout_type, duration_min, intensity, calories_burned, workout_date)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id, user_id, workout_type, duration_min, intensity,
+                              calories_burned, workout_date
+                ),
+                linked AS (
+                    INSERT INTO workout_exercises
+                        (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date)
+                    SELECT workout.id, items.exercise_id, items.sets, items.reps, items.weight_used_kg,
+                           workout.workout_date
+                    FROM workout, items
+                )
+                SELECT * FROM workout;
+                """,
+                params,
+            )
+            row = cur.fetchone()
+        workout = _workout_from_row(row)
+        summaries.refresh_day(cur, user_id, workout.workout_date)
+        conn.commit()
+
+    workout.exercises = [
+        WorkoutExercise(exercise_id, names[exercise_id], sets, reps, weight)
+        for exercise_id, sets, reps, weight in items.values()
+    ]
+    return workout
+
+
+def create_exercise(
+    name: str,
+    category: Optional[str] = None,
+    muscle_group: Optional[str] = None,
+    equipment: Optional[str] = None,
+) -> Optional[Exercise]:
+    # Returns None when an exercise with that name already exists.
+    if not name:
+        raise ValidationError("Exercise name is required.")
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            INSERT INTO exercises (exercise_name, category, muscle_group, equipment)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (exercise_name) DO NOTHING
+            RETURNING id, exercise_name, category, muscle_group, equipment;
+            """,
+            (name, category, muscle_group, equipment),
+        )
+        row = cur.fetchone()
+        conn.commit()
+
+    if not row:
+        return None
+    exercise = catalog.exercise_from_row(row)
+    catalog.exercises.put(exercise)
+    return exercise
+
+
+def list_exercises() -> List[Exercise]:
+    return catalog.exercises.all()
+
+
+def add_exercise_to_workout(
+    user_id: int,
+    workout_id: int,
+    exercise_id: int,
+    sets: int = 0,
+    reps: int = 0,
+    weight_used_kg: float = 0,
+) -> WorkoutExercise:
+    _check_sets(sets, reps, weight_used_kg)
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            "SELECT workout_date FROM workout_logs WHERE id = %s AND user_id = %s;",
+            (workout_id, user_id),
+        )
+        row = cur.fetchone()
+        if not row:
+            raise NotFoundError("Workout not found (or not owned by you).")
+
+        exercise = catalog.exercises.get(exercise_id, cur)
+        if not exercise:
+            raise ValidationError("Invalid exercise id.")
+
+        cur.execute(
+            """
+            INSERT INTO workout_exercises (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (workout_id, exercise_id)
+            DO UPDATE SET sets = EXCLUDED.sets,
+                          reps = EXCLUDED.reps,
+                          weight_used_kg = EXCLUDED.weight_used_kg;
+            """,
+            (workout_id, exercise_id, sets, reps, weight_used_kg, row["workout_date"]),
+        )
+        conn.commit()
+
+    return WorkoutExercise(
+        exercise_id=exercise_id,
+        exercise_name=exercise.exercise_name,
+        sets=sets,
+        reps=reps,
+        weight_used_kg=float(weight_used_kg),
+    )
+
+
+# Moving a log to another date on Postgres: insert it under the new date, point
+# its child rows there, then delete the old row. A plain UPDATE of the date is a
+# cross-partition move that, before PostgreSQL 15, runs as DELETE + INSERT and
+# cascades the delete to the children. (SQLite's tables are not partitioned; a
+# trigger carries the children along.)
+_MOVE_LOG_SQL = {
+    "workout": (
+        "INSERT INTO workout_logs OVERRIDING SYSTEM VALUE "
+        "SELECT id, user_id, workout_type, duration_min, intensity, calories_burned, %(new)s "
+        "FROM workout_logs WHERE id = %(id)s AND workout_date = %(old)s;",
+        "UPDATE workout_exercises SET workout_date = %(new)s WHERE workout_id = %(id)s;",
+        "DELETE FROM workout_logs WHERE id = %(id)s AND workout_date = %(old)s;",
+    ),
+    "meal": (
+        "INSERT INTO meal_logs OVERRIDING SYSTEM VALUE "
+        "SELECT id, user_id, meal_type, calories, protein_g, carbs_g, fats_g, %(new)s "
+        "FROM meal_logs WHERE id = %(id)s AND meal_date = %(old)s;",
+        "UPDATE meal_foods SET meal_date = %(new)s WHERE meal_id = %(id)s;",
+        "DELETE FROM meal_logs WHERE id = %(id)s AND meal_date = %(old)s;",
+    ),
+}
+
+
+def _move_log(cur, kind: str, log_id: int, old: date, new: date):
+    if new == old or db.backend() != "postgres":
+        return
+    for statement in _MOVE_LOG_SQL[kind]:
+        cur.execute(statement, {"id": log_id, "old": old, "new": new})
+
+
+def update_workout(
+    user_id: int,
+    workout_id: int,
+    workout_type: Optional[str] = None,
+    duration_min: Optional[float] = None,
+    intensity: Optional[str] = None,
+    calories_burned: Optional[float] = None,
+    workout_date=None,
+) -> Workout:
+    # None (or an empty string) leaves a field unchanged.
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            SELECT workout_type, duration_min, intensity, calories_burned, workout_date
+            FROM workout_logs
+            WHERE id = %s AND user_id = %s
+            FOR UPDATE;
+            """,
+            (workout_id, user_id),
+        )
+        row = cur.fetchone()
+
+        if not row:
+            raise NotFoundError("Workout not found (or not owned by you).")
+
+        workout_date = _as_date(workout_date, "workout date") if workout_date else row["workout_date"]
+        _move_log(cur, "workout", workout_id, row["workout_date"], workout_date)
+
+        cur.execute(
+            """
+            UPDATE workout_logs
+            SET workout_type = %s,
+                duration_min = %s,
+                intensity = %s,
+                calories_burned = %s,
+                workout_date = %s
+            WHERE id = %s AND user_id = %s
+            RETURNING id, user_id, workout_type, duration_min, intensity,
+                      calories_burned, workout_date;
+            """,
+            (
+                workout_type or row["workout_type"],
+                row["duration_min"] if duration_min is None else duration_min,
+                intensity or row["intensity"],
+                row["calories_burned"] if calories_burned is None else calories_burned,
+                workout_date,
+                workout_id,
+                user_id,
+            ),
+        )
+        workout = _workout_from_row(cur.fetchone())
+        summaries.refresh_days(cur, [(user_id, row["workout_date"]), (user_id, workout.workout_date)])
+        conn.commit()
+
+    return workout
+
+
+def delete_workout(user_id: int, workout_id: int) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT workout_date FROM workout_logs WHERE id = %s AND user_id = %s;",
+            (workout_id, user_id),
+        )
+        row = cur.fetchone()
+        if not row:
+            raise NotFoundError("Workout not found (or not owned by you).")
+
+        cur.execute("DELETE FROM workout_exercises WHERE workout_id = %s;", (workout_id,))
+        cur.execute("DELETE FROM workout_logs WHERE id = %s AND user_id = %s;", (workout_id, user_id))
+        summaries.refresh_day(cur, user_id, row[0])
+
+        conn.commit()
+
+
+def _search_workout_rows(cur, user_id: int, criteria: WorkoutSearch):
+    if criteria.workout_type is not None:
+        cur.execute(
+            """
+            SELECT wl.id, wl.user_id, wl.workout_date, wl.workout_type, wl.duration_min,
+                   wl.intensity, wl.calories_burned,
+                   e.id AS exercise_id, e.exercise_name,
+                   we.sets, we.reps, we.weight_used_kg
+            FROM workout_logs wl
+            LEFT JOIN workout_exercises we ON we.workout_id = wl.id
+            LEFT JOIN exercises e ON e.id = we.exercise_id
+            WHERE wl.user_id = %s
+              AND COALESCE(wl.workout_type, '') ILIKE %s
+            ORDER BY wl.workout_date, wl.id;
+            """,
+            (user_id, f"%{criteria.workout_type}%"),
+        )
+    elif criteria.start is not None or criteria.end is not None:
+        start = _as_date(criteria.start, "start date") if criteria.start else date.min
+        end = _as_date(criteria.end, "end date") if criteria.end else date.max
+        cur.execute(
+            """
+            SELECT wl.id, wl.user_id, wl.workout_date, wl.workout_type, wl.duration_min,
+                   wl.intensity, wl.calories_burned,
+                   e.id AS exercise_id, e.exercise_name,
+                   we.sets, we.reps, we.weight_used_kg
+            FROM workout_logs wl
+            LEFT JOIN workout_exercises we ON we.workout_id = wl.id
+            LEFT JOIN exercises e ON e.id = we.exercise_id
+            WHERE wl.user_id = %s
+              AND wl.workout_date BETWEEN %s AND %s
+            ORDER BY wl.workout_date, wl.id;
+            """,
+            (user_id, start, end),
+        )
+    else:
+        raise ValidationError("Search needs a date range or a workout type.")
+
+    return cur.fetchall()
+
+
+def _group_workouts(rows) -> List[Workout]:
+    # Rows arrive ordered by workout, one per exercise (LEFT JOIN).
+    workouts = []
+    for r in rows:
+        if not workouts or workouts[-1].id != r["id"]:
+            workouts.append(_workout_from_row(r))
+        if r["exercise_id"]:
+            workouts[-1].exercises.append(
+                WorkoutExercise(
+                    exercise_id=r["exercise_id"],
+                    exercise_name=r["exercise_name"],
+                    sets=r["sets"] or 0,
+                    reps=r["reps"] or 0,
+                    weight_used_kg=_num(r["weight_used_kg"]),
+                )
+            )
+    return workouts
+
+
+def search_workouts(user_id: int, criteria: WorkoutSearch) -> List[Workout]:
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        rows = _search_workout_rows(cur, user_id, criteria)
+    return _group_workouts(rows)
+
+
+# ---- MEALS & FOODS ------------------------------------------------------
+
+
+def _meal_from_row(r) -> Meal:
+    return Meal(
+        id=r["id"],
+        user_id=r["user_id"],
+        meal_type=r["meal_type"],
+        meal_date=_as_date(r["meal_date"]),
+        calories=_num(r["calories"]),
+        protein_g=_num(r["protein_g"]),
+        carbs_g=_num(r["carbs_g"]),
+        fats_g=_num(r["fats_g"]),
+    )
+
+
+def create_meal(user_id: int, meal_type: Optional[str], meal_date=None) -> Meal:
+    meal_date = _as_date(meal_date or date.today(), "meal date")
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            INSERT INTO meal_logs (user_id, meal_type, meal_date)
+            VALUES (%s, %s, %s)
+            RETURNING id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g;
+            """,
+            (user_id, meal_type, meal_date),
+        )
+        meal = _meal_from_row(cur.fetchone())
+        summaries.refresh_day(cur, user_id, meal.meal_date)
+        conn.commit()
+
+    return meal
+
+
+def log_meal(
+    user_id: int,
+    meal_type: Optional[str],
+    foods: Sequence[Tuple[int, float]],
+    meal_date=None,
+) -> Meal:
+    # Creates a meal with all of its (food_id, quantity) rows and the macro totals
+    # computed once, in one statement and one transaction. A repeated food id keeps
+    # the last quantity, as repeated add_food_to_meal calls would.
+    meal_date = _as_date(meal_date or date.today(), "meal date")
+    items = {int(food_id): float(quantity) for food_id, quantity in foods}
+    if not items:
+        raise ValidationError("A meal needs at least one food.")
+    for quantity in items.values():
+        _check_quantity(quantity)
+
+    with _catalog_checked(catalog.foods, items, "food"), get_connection() as conn, \
+            conn.cursor(cursor_factory=DictCursor) as cur:
+        names = {}
+        for food_id in items:
+            food = catalog.foods.get(food_id, cur)
+            if not food:
+                raise ValidationError(f"Invalid food id {food_id}.")
+            names[food_id] = food.food_name
+
+        if db.backend() == "sqlite":
+            row = _insert_meal_sqlite(cur, (user_id, meal_type, meal_date), items.items())
+        else:
+            values = _values_list(cur, "(%s::bigint, %s::numeric(8,3))", items.items())
+            cur.execute(
+                f"""
+                WITH items (food_id, quantity) AS (VALUES {values}),
+                meal AS (
+                    INSERT INTO meal_logs
+                        (user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g)
+                    SELECT %s, %s, %s,
+                           ROUND(SUM(f.calories_per_serv * i.quantity), 2),
+                           ROUND(SUM(f.protein_g * i.quantity), 2),
+                           ROUND(SUM(f.carbs_g * i.quantity), 2),
+                           ROUND(SUM(f.fats_g * i.quantity), 2)
+                    FROM items i
+                    JOIN foods f ON f.id = i.food_id
+                    RETURNING id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g
+                ),
+                linked AS (
+                    INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date)
+                    SELECT meal.id, items.food_id, items.quantity, meal.meal_date
+                    FROM meal, items
+                )
+                SELECT * FROM meal;
+                """,
+                (user_id, meal_type, meal_date),
+            )
+            row = cur.fetchone()
+        meal = _meal_from_row(row)
+        summaries.refresh_day(cur, user_id, meal.meal_date)
+        conn.commit()
+
+    meal.foods = [MealFood(food_id, names[food_id], quantity) for food_id, quantity in items.items()]
+    return meal
+
+
+def create_food(
+    name: str,
+    serving_size: Optional[str] = None,
+    calories_per_serv: float = 0,
+    protein_g: float = 0,
+    carbs_g: float = 0,
+    fats_g: float = 0,
+) -> Optional[Food]:
+    # Returns None when a food with that name already exists.
+    if not name:
+        raise ValidationError("Food name is required.")
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            INSERT INTO foods (food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (food_name) DO NOTHING
+            RETURNING id, food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g;
+            """,
+            (name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g),
+        )
+        row = cur.fetchone()
+        conn.commit()
+
+    if not row:
+        return None
+    food = catalog.food_from_row(row)
+    catalog.foods.put(food)
+    return food
+
+
+def update_food(
+    food_id: int,
+    serving_size: Optional[str] = None,
+    calories_per_serv: Optional[float] = None,
+    protein_g: Optional[float] = None,
+    carbs_g: Optional[float] = None,
+    fats_g: Optional[float] = None,
+) -> Food:
+    # None leaves a field unchanged. Changed macros are pushed into the totals of
+    # every meal that uses the food, and into those meals' daily summaries.
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            UPDATE foods
+            SET serving_size      = COALESCE(%s, serving_size),
+                calories_per_serv = COALESCE(%s, calories_per_serv),
+                protein_g         = COALESCE(%s, protein_g),
+                carbs_g           = COALESCE(%s, carbs_g),
+                fats_g            = COALESCE(%s, fats_g)
+            WHERE id = %s
+            RETURNING id, food_name, serving_size, calories_per_serv, protein_g, carbs_g, fats_g;
+            """,
+            (serving_size, calories_per_serv, protein_g, carbs_g, fats_g, food_id),
+        )
+        row = cur.fetchone()
+        if not row:
+            raise NotFoundError("Food not found.")
+
+        if any(v is not None for v in (calories_per_serv, protein_g, carbs_g, fats_g)):
+            summaries.refresh_days(cur, macros.recompute_for_foods(cur, [food_id]))
+        conn.commit()
+
+    food = catalog.food_from_row(row)
+    catalog.foods.put(food)
+    return food
+
+
+def list_foods(limit: Optional[int] = None) -> List[Food]:
+    foods = catalog.foods.all()
+    return foods if limit is None else foods[:limit]
+
+
+def add_food_to_meal(user_id: int, meal_id: int, food_id: int, quantity: float = 1.0) -> Meal:
+    _check_quantity(quantity)
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        # The row lock serialises concurrent edits of this meal's foods/totals.
+        cur.execute(
+            "SELECT meal_date FROM meal_logs WHERE id = %s AND user_id = %s FOR UPDATE;",
+            (meal_id, user_id),
+        )
+        row = cur.fetchone()
+        if not row:
+            raise NotFoundError("Meal not found (or not owned by you).")
+
+        if not catalog.foods.exists(food_id, cur):
+            raise ValidationError("Invalid food id.")
+
+        meal = _meal_from_row(macros.set_food_quantity(cur, meal_id, food_id, quantity, row["meal_date"]))
+        summaries.refresh_day(cur, user_id, meal.meal_date)
+        conn.commit()
+
+    return meal
+
+
+def update_meal(
+    user_id: int,
+    meal_id: int,
+    meal_type: Optional[str] = None,
+    meal_date=None,
+    calories: Optional[float] = None,
+    protein_g: Optional[float] = None,
+    carbs_g: Optional[float] = None,
+    fats_g: Optional[float] = None,
+) -> Meal:
+    # None (or an empty string) leaves a field unchanged.
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            """
+            SELECT meal_type, meal_date, calories, protein_g, carbs_g, fats_g
+            FROM meal_logs
+            WHERE id = %s AND user_id = %s
+            FOR UPDATE;
+            """,
+            (meal_id, user_id),
+        )
+        row = cur.fetchone()
+
+        if not row:
+            raise NotFoundError("Meal not found (or not owned by you).")
+
+        meal_date = _as_date(meal_date, "meal date") if meal_date else row["meal_date"]
+        _move_log(cur, "meal", meal_id, row["meal_date"], meal_date)
+
+        cur.execute(
+            """
+            UPDATE meal_logs
+            SET meal_type = %s,
+                meal_date = %s,
+                calories = %s,
+                protein_g = %s,
+                carbs_g = %s,
+                fats_g = %s
+            WHERE id = %s AND user_id = %s
+            RETURNING id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g;
+            """,
+            (
+                meal_type or row["meal_type"],
+                meal_date,
+                row["calories"] if calories is None else calories,
+                row["protein_g"] if protein_g is None else protein_g,
+                row["carbs_g"] if carbs_g is None else carbs_g,
+                row["fats_g"] if fats_g is None else fats_g,
+                meal_id,
+                user_id,
+            ),
+        )
+        meal = _meal_from_row(cur.fetchone())
+        summaries.refresh_days(cur, [(user_id, row["meal_date"]), (user_id, meal.meal_date)])
+        conn.commit()
+
+    return meal
+
+
+def delete_meal(user_id: int, meal_id: int) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT meal_date FROM meal_logs WHERE id = %s AND user_id = %s;",
+            (meal_id, user_id),
+        )
+        row = cur.fetchone()
+        if not row:
+            raise NotFoundError("Meal not found (or not owned by you).")
+
+        cur.execute("DELETE FROM meal_foods WHERE meal_id = %s;", (meal_id,))
+        cur.execute("DELETE FROM meal_logs WHERE id = %s AND user_id = %s;", (meal_id, user_id))
+        summaries.refresh_day(cur, user_id, row[0])
+
+        conn.commit()
+
+
+def _search_meal_rows(cur, user_id: int, criteria: MealSearch):
+    if criteria.food_name is not None:
+        cur.execute(
+            """
+            SELECT ml.id, ml.user_id, ml.meal_date, ml.meal_type,
+                   ml.calories, ml.protein_g, ml.carbs_g, ml.fats_g,
+                   f.id AS food_id, f.food_name, mf.quantity
+            FROM meal_logs ml
+            JOIN meal_foods mf ON mf.meal_id = ml.id
+            JOIN foods f ON f.id = mf.food_id
+            WHERE ml.user_id = %s
+              AND f.food_name ILIKE %s
+            ORDER BY ml.meal_date, ml.id;
+            """,
+            (user_id, f"%{criteria.food_name}%"),
+        )
+    elif criteria.meal_date is not None:
+        cur.execute(
+            """
+            SELECT ml.id, ml.user_id, ml.meal_date, ml.meal_type,
+                   ml.calories, ml.protein_g, ml.carbs_g, ml.fats_g,
+                   f.id AS food_id, f.food_name, mf.quantity
+            FROM meal_logs ml
+            LEFT JOIN meal_foods mf ON mf.meal_id = ml.id
+            LEFT JOIN foods f ON f.id = mf.food_id
+            WHERE ml.user_id = %s
+              AND ml.meal_date = %s
+            ORDER BY ml.meal_date, ml.id;
+            """,
+            (user_id, _as_date(criteria.meal_date, "meal date")),
+        )
+    else:
+        raise ValidationError("Search needs a meal date or a food name.")
+
+    return cur.fetchall()
+
+
+def _group_meals(rows) -> List[Meal]:
+    meals = []
+    for r in rows:
+        if not meals or meals[-1].id != r["id"]:
+            meals.append(_meal_from_row(r))
+        if r["food_id"]:
+            meals[-1].foods.append(
+                MealFood(food_id=r["food_id"], food_name=r["food_name"], quantity=_num(r["quantity"]))
+            )
+    return meals
+
+
+def search_meals(user_id: int, criteria: MealSearch) -> List[Meal]:
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        rows = _search_meal_rows(cur, user_id, criteria)
+    return _group_meals(rows)
+
+
+# ---- CATALOG BROWSE & SEARCH -------------------------------------------
+# Keyset pagination: a page never scans the rows before it, however deep it is.
+# Browsing is ordered by id (cursor "<id>"); prefix search by the lower-cased
+# name (cursor "<id>:<lower name>"), both served by indexes from migration 0005.
+# Fuzzy search ranks by pg_trgm similarity and returns a single page.
+
+CATALOG_PAGE_SIZE = 50
+CATALOG_PAGE_MAX = 500
+
+
+def _page_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return CATALOG_PAGE_SIZE
+    if limit < 1:
+        raise ValidationError("Limit must be at least 1.")
+    return min(limit, CATALOG_PAGE_MAX)
+
+
+def _like_prefix(term: str) -> str:
+    escaped = term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def _browse_catalog(cache, after: Optional[str], limit: Optional[int]) -> CatalogPage:
+    limit = _page_limit(limit)
+    try:
+        after_id = int(after) if after else 0
+    except ValueError:
+        raise ValidationError(f"Invalid cursor: {after!r}") from None
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(
+            f"SELECT {cache.columns} FROM {cache.table} WHERE id > %s ORDER BY id LIMIT %s;",
+            (after_id, limit + 1),
+        )
+        rows = cur.fetchall()
+
+    items = [cache.from_row(r) for r in rows[:limit]]
+    next_cursor = str(items[-1].id) if len(rows) > limit else None
+    return CatalogPage(items, next_cursor)
+
+
+def _search_catalog(
+    cache, term: str, fuzzy: bool, after: Optional[str], limit: Optional[int]
+) -> CatalogPage:
+    term = (term or "").strip()
+    if not term:
+        raise ValidationError("Search term is required.")
+    limit = _page_limit(limit)
+    name = cache.name_column
+
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        if fuzzy:
+            try:
+                cur.execute(
+                    f"""
+                    SELECT {cache.columns}
+                    FROM {cache.table}
+                    WHERE {name} %% %(term)s
+                    ORDER BY similarity({name}, %(term)s) DESC, id
+                    LIMIT %(limit)s;
+                    """,
+                    {"term": term, "limit": limit},
+                )
+            except psycopg2.errors.UndefinedFunction:
+                raise ServiceError("Fuzzy search needs the pg_trgm extension (run migrate.py).") from None
+            return CatalogPage([cache.from_row(r) for r in cur.fetchall()])
+
+        params = {"prefix": _like_prefix(term), "limit": limit + 1}
+        # Only add the keyset bound after the first page: btree uses a row
+        # comparison as the scan start, so ('', 0) would scan from the very first key.
+        keyset = ""
+        if after:
+            id_part, _, params["after_name"] = after.partition(":")
+            try:
+                params["after_id"] = int(id_part)
+            except ValueError:
+                raise ValidationError(f"Invalid cursor: {after!r}") from None
+            keyset = f'AND (lower({name}) COLLATE "C", id) > (%(after_name)s, %(after_id)s)'
+
+        cur.execute(
+            f"""
+            SELECT {cache.columns}, lower({name}) AS sort_key
+            FROM {cache.table}
+            WHERE lower({name}) COLLATE "C" LIKE %(prefix)s
+              {keyset}
+            ORDER BY lower({name}) COLLATE "C", id
+            LIMIT %(limit)s;
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+
+    items = [cache.from_row(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = f"{rows[limit - 1]['id']}:{rows[limit - 1]['sort_key']}"
+    return CatalogPage(items, next_cursor)
+
+
+def browse_foods(after: Optional[str] = None, limit: Optional[int] = None) -> CatalogPage:
+    return _browse_catalog(catalog.foods, after, limit)
+
+
+def search_foods(
+    term: str, fuzzy: bool = False, after: Optional[str] = None, limit: Optional[int] = None
+) -> CatalogPage:
+    return _search_catalog(catalog.foods, term, fuzzy, after, limit)
+
+
+def browse_exercises(after: Optional[str] = None, limit: Optional[int] = None) -> CatalogPage:
+    return _browse_catalog(catalog.exercises, after, limit)
+
+
+def search_exercises(
+    term: str, fuzzy: bool = False, after: Optional[str] = None, limit: Optional[int] = None
+) -> CatalogPage:
+    return _search_catalog(catalog.exercises, term, fuzzy, after, limit)
+
+
+def _suggest(index, search_fn, term: str, k: int) -> List[Suggestion]:
+    # Served from the in-memory index; until it has loaded, from the prefix search.
+    if k < 1:
+        raise ValidationError("k must be at least 1.")
+    if index.ready:
+        return index.search(term or "", min(k, CATALOG_PAGE_MAX))
+    if not (term or "").strip():
+        return []
+    name = index.cache.name_column
+    return [Suggestion(e.id, getattr(e, name)) for e in search_fn(term, limit=k).items]
+
+
+def suggest_foods(term: str, k: int = 10) -> List[Suggestion]:
+    return _suggest(autocomplete.foods, search_foods, term, k)
+
+
+def suggest_exercises(term: str, k: int = 10) -> List[Suggestion]:
+    return _suggest(autocomplete.exercises, search_exercises, term, k)
+
+
+# ---- REPORTS ------------------------------------------------------------
+
+
+def _daily_report(cur, user_id: int, day: date) -> DailyReport:
+    return _daily_from_row(day, summaries.get_day(cur, user_id, day))
+
+
+def _daily_from_row(day: date, row) -> DailyReport:
+    if not row:
+        return DailyReport(day=day, calories_in=0.0, calories_out=0.0)
+    return DailyReport(
+        day=day,
+        calories_in=_num(row["calories_in"]),
+        calories_out=_num(row["calories_out"]),
+        protein_g=_num(row["protein_g"]),
+        carbs_g=_num(row["carbs_g"]),
+        fats_g=_num(row["fats_g"]),
+    )
+
+
+def compute_daily_report(user_id: int, day=None) -> DailyReport:
+    day = _as_date(day or date.today())
+
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        return _daily_report(cur, user_id, day)
+
+
+def _add_day(point: TrendPoint, r):
+    point.days_logged += r["meal_count"] > 0 or r["workout_count"] > 0
+    point.meal_days += r["meal_count"] > 0
+    point.calories_in += _num(r["calories_in"])
+    point.calories_out += _num(r["calories_out"])
+    point.protein_g += _num(r["protein_g"])
+    point.carbs_g += _num(r["carbs_g"])
+    point.fats_g += _num(r["fats_g"])
+    point.meal_count += r["meal_count"]
+    point.workout_count += r["workout_count"]
+
+
+def _set_rollup(point: TrendPoint, r):
+    point.days_logged = r["days_logged"]
+    point.meal_days = r["meal_days"]
+    point.calories_in = _num(r["calories_in"])
+    point.calories_out = _num(r["calories_out"])
+    point.protein_g = _num(r["protein_g"])
+    point.carbs_g = _num(r["carbs_g"])
+    point.fats_g = _num(r["fats_g"])
+    point.meal_count = r["meal_count"]
+    point.workout_count = r["workout_count"]
+
+
+def compute_weekly_report(user_id: int, end=None) -> WeeklyReport:
+    # Last 7 days ending at `end` (inclusive), from daily_summaries.
+    end = _as_date(end or date.today())
+    start = end - timedelta(days=6)
+
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        return _weekly_from_days(start, end, summaries.get_days(cur, user_id, start, end))
+
+
+def _weekly_from_days(start: date, end: date, rows) -> WeeklyReport:
+    week = TrendPoint(start=start, end=end)
+    for r in rows:
+        _add_day(week, r)
+    return WeeklyReport(
+        start=start,
+        end=end,
+        avg_calories=week.avg_calories_in,
+        avg_protein_g=week.protein_g / week.meal_days if week.meal_days else None,
+        avg_carbs_g=week.carbs_g / week.meal_days if week.meal_days else None,
+        avg_fats_g=week.fats_g / week.meal_days if week.meal_days else None,
+        avg_calories_out=week.avg_calories_out,
+        meal_days=week.meal_days,
+        days_logged=week.days_logged,
+    )
+
+
+TREND_BUCKETS = ("day", "week", "month")
+TREND_MAX_POINTS = 1000
+TREND_DEFAULT_DAYS = 30
+
+
+def _trend_buckets(start: date, end: date, bucket: str) -> List[TrendPoint]:
+    points = []
+    day = start
+    while day <= end:
+        if len(points) >= TREND_MAX_POINTS:
+            raise ValidationError(f"Too many {bucket} points in this range; use a larger bucket.")
+        if bucket == "day":
+            following = day + timedelta(days=1)
+        else:
+            following = summaries.next_period_start(bucket, summaries.period_start(bucket, day))
+        points.append(TrendPoint(start=day, end=min(following - timedelta(days=1), end)))
+        day = following
+    return points
+
+
+def compute_trend_report(user_id: int, start=None, end=None, bucket: str = "day") -> TrendReport:
+    # One point per day, week (Monday-based) or month in start..end, with empty
+    # buckets included. Whole weeks/months are read from summary_rollups (one row
+    # per bucket); partial ones at the range edges from daily_summaries.
+    if bucket not in TREND_BUCKETS:
+        raise ValidationError(f"Bucket must be one of: {', '.join(TREND_BUCKETS)}.")
+    end = _as_date(end or date.today(), "end date")
+    start = _as_date(start, "start date") if start else end - timedelta(days=TREND_DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValidationError("Start date must not be after the end date.")
+    points = _trend_buckets(start, end, bucket)
+
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        if bucket == "day":
+            by_day = {p.start: p for p in points}
+            for r in summaries.get_days(cur, user_id, start, end):
+                _add_day(by_day[r["day"]], r)
+        else:
+            whole = {
+                p.start: p
+                for p in points
+                if p.start == summaries.period_start(bucket, p.start)
+                and p.end + timedelta(days=1) == summaries.next_period_start(bucket, p.start)
+            }
+            if whole:
+                for r in summaries.get_rollups(cur, user_id, bucket, min(whole), max(whole)):
+                    _set_rollup(whole[r["period_start"]], r)
+            for p in points:
+                if p.start not in whole:
+                    for r in summaries.get_days(cur, user_id, p.start, p.end):
+                        _add_day(p, r)
+
+    return TrendReport(start=start, end=end, bucket=bucket, points=points)
+
+
+def _export_workouts(cur, user_id: int):
+    cur.execute(
+        "SELECT * FROM workout_logs WHERE user_id = %s ORDER BY workout_date;",
+        (user_id,),
+    )
+    return [dict(r) for r in cur.fetchall()]
+
+
+def _export_workout_exercises(cur, user_id: int):
+    cur.execute(
+        """
+        SELECT wl.*, we.exercise_id, we.sets, we.reps, we.weight_used_kg
+        FROM workout_logs wl
+        LEFT JOIN workout_exercises we ON wl.id = we.workout_id
+        WHERE wl.user_id = %s
+        ORDER BY wl.workout_date, wl.id;
+        """,
+        (user_id,),
+    )
+    return [dict(r) for r in cur.fetchall()]
+
+
+def _export_meals(cur, user_id: int):
+    cur.execute(
+        "SELECT * FROM meal_logs WHERE user_id = %s ORDER BY meal_date;",
+        (user_id,),
+    )
+    return [dict(r) for r in cur.fetchall()]
+
+
+def _export_meal_foods(cur, user_id: int):
+    cur.execute(
+        """
+        SELECT ml.*, mf.food_id, mf.quantity
+        FROM meal_logs ml
+        LEFT JOIN meal_foods mf ON ml.id = mf.meal_id
+        WHERE ml.user_id = %s
+        ORDER BY ml.meal_date, ml.id;
+        """,
+        (user_id,),
+    )
+    return [dict(r) for r in cur.fetchall()]
+
+
+def _export_user_data(cur, user_id: int) -> dict:
+    # All four sections from one snapshot, so every child row has its parent.
+    if db.backend() == "postgres":
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;")
+    return {
+        "user_id": user_id,
+        "workouts": _export_workouts(cur, user_id),
+        "workout_exercises": _export_workout_exercises(cur, user_id),
+        "meals": _export_meals(cur, user_id),
+        "meal_foods": _export_meal_foods(cur, user_id),
+    }
+
+
+def export_user_data(user_id: int) -> dict:
+    with get_connection(readonly=True) as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        return _export_user_data(cur, user_id)
+
+
+def export_to_file(user_id: int, filename: Optional[str] = None, fmt: str = "json", since=None) -> str:
+    # Streams straight to disk (see exporter.py); export_user_data() builds it in memory.
+    if fmt not in exporter.FORMATS:
+        raise ValidationError(f"Unknown export format {fmt!r}.")
+    since = _as_date(since, "since date") if since else None
+    filename = filename or exporter.default_filename(user_id, fmt)
+    exporter.export_to_path(user_id, filename, fmt, since)
+    return filename
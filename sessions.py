@@ -0,0 +1,165 @@
+# sessions.py
+# Opaque session tokens for the HTTP API. login() checks the password once (see
+# passwords.py) and returns a random token; later requests present it as
+# "Authorization: Bearer <token>" and are resolved from memory without touching
+# the database or the KDF.
+#
+# Sessions expire SESSION_TTL after login, or SESSION_IDLE_TIMEOUT after their
+# last use. The store keeps them in least-recently-used order, so expired
+# sessions are dropped from the cold end and, when SESSION_MAX_ENTRIES is
+# reached, the least recently used one is evicted. Sessions live in this process
+# only: a restart logs everyone out.
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import services
+
+SESSION_TTL = 12 * 3600.0
+SESSION_IDLE_TIMEOUT = 3600.0
+SESSION_MAX_ENTRIES = 100_000
+TOKEN_BYTES = 32
+
+
+@dataclass
+class Session:
+    token: str
+    user_id: int
+    name: str
+    created: float      # time.time()
+    expires: float      # absolute expiry, time.time()
+    last_used: float
+    read_your_writes: bool = False  # reads see this session's writes even on a replica
+
+
+@dataclass
+class SessionStats:
+    size: int
+    created: int
+    hits: int
+    misses: int
+    expired: int
+    evicted: int
+    revoked: int
+
+
+class SessionStore:
+    def __init__(
+        self,
+        ttl: float = SESSION_TTL,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT,
+        max_entries: int = SESSION_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # token -> Session, least recently used first
+        self._created = 0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+        self._revoked = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _alive(self, session: Session, now: float) -> bool:
+        return now < session.expires and now - session.last_used < self.idle_timeout
+
+    def _purge_locked(self, now: float):
+        # The coldest entries sit at the front; stop at the first live one.
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if self._alive(session, now):
+                break
+            del self._sessions[session.token]
+            self._expired += 1
+
+    def create(self, user_id: int, name: str, read_your_writes: bool = False) -> Session:
+        now = time.time()
+        session = Session(
+            secrets.token_urlsafe(TOKEN_BYTES), user_id, name, now, now + self.ttl, now, read_your_writes
+        )
+        with self._lock:
+            self._purge_locked(now)
+            while len(self._sessions) >= self.max_entries:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+            self._sessions[session.token] = session
+            self._created += 1
+        return session
+
+    def get(self, token: str) -> Optional[Session]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                self._misses += 1
+                return None
+            if not self._alive(session, now):
+                del self._sessions[token]
+                self._expired += 1
+                self._misses += 1
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(token)
+            self._hits += 1
+            return session
+
+    def revoke(self, token: str) -> bool:
+        with self._lock:
+            removed = self._sessions.pop(token, None) is not None
+            self._revoked += removed
+        return removed
+
+    def revoke_user(self, user_id: int) -> int:
+        with self._lock:
+            tokens = [t for t, s in self._sessions.items() if s.user_id == user_id]
+            for token in tokens:
+                del self._sessions[token]
+            self._revoked += len(tokens)
+        return len(tokens)
+
+    def purge_expired(self) -> int:
+        # Expired sessions are also dropped lazily by create() and get().
+        now = time.time()
+        with self._lock:
+            before = self._expired
+            for token, session in list(self._sessions.items()):
+                if not self._alive(session, now):
+                    del self._sessions[token]
+                    self._expired += 1
+            return self._expired - before
+
+    def stats(self) -> SessionStats:
+        with self._lock:
+            return SessionStats(
+                size=len(self._sessions),
+                created=self._created,
+                hits=self._hits,
+                misses=self._misses,
+                expired=self._expired,
+                evicted=self._evicted,
+                revoked=self._revoked,
+            )
+
+
+store = SessionStore()
+
+
+def login(email: str, password: str, read_your_writes: bool = False) -> Optional[Session]:
+    user = services.authenticate(email, password)
+    return store.create(user.id, user.name, read_your_writes) if user else None
+
+
+def resolve(token: str) -> Optional[Session]:
+    return store.get(token) if token else None
+
+
+def logout(token: str) -> bool:
+    return store.revoke(token)
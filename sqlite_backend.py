@@ -0,0 +1,354 @@
+# sqlite_backend.py
+# Embedded storage: a single SQLite file in WAL mode (readers never block the
+# writer), for single-user installs and test fixtures that should not need a
+# Postgres server. connect() returns a connection that looks enough like a
+# psycopg2 one for db.ConnectionPool and the service layer: cursor(cursor_factory=,
+# name=), %s / %(name)s parameters, commit/rollback, get_transaction_status(),
+# and psycopg2 exception classes for constraint violations.
+#
+# The service SQL is written for Postgres and rewritten here on the way in (casts
+# dropped, ILIKE -> LIKE, = ANY(list) -> IN (...), ...). Features with no SQLite
+# equivalent (COPY, pg_trgm similarity, json_agg, LATERAL/unnest, sequences) raise
+# UnsupportedError; the few services that need them either have an SQLite path
+# (see db.backend()) or are Postgres-only.
+#
+#   python sqlite_backend.py init [--path fitness_tracker.db]
+import argparse
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+import psycopg2
+import psycopg2.errors
+from psycopg2 import extensions
+from psycopg2.extras import DictCursor, RealDictCursor
+
+from models import UnsupportedError
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_sqlite.sql")
+BUSY_TIMEOUT = 5.0           # seconds a writer waits for the write lock
+SYNCHRONOUS = "NORMAL"       # with WAL: durable across crashes of the app, not of the OS
+
+# Values go in as the ISO strings / numbers SQLite stores; declared column types
+# (first word, e.g. DECIMAL for DECIMAL(7,2)) turn them back into Python types.
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+
+_UNSUPPORTED = re.compile(
+    r"^\s*COPY\b|\bgenerate_series\b|\bdate_trunc\b|\bLATERAL\b|\bunnest\b|\binterval\b|"
+    r"\bsimilarity\s*\(|\bjson_agg\b|\bjson_build_object\b|\bnextval\b|\bpg_\w+|\bDATE\s+'|\bANY\s*\(",
+    re.IGNORECASE,
+)
+
+_QUALIFIER = re.compile(r"\b[A-Za-z_]\w*\.(?=[A-Za-z_])")
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+
+# (pattern, replacement) applied in order to every statement.
+_REWRITES = [
+    # days since the epoch (analytics): Postgres date - date is an integer
+    (re.compile(r"([\w.]+) - DATE '1970-01-01'"), r"CAST(julianday(\1) - 2440587.5 AS INTEGER)"),
+    (re.compile(r"::\s*\w+(\s*\(\s*\d+(\s*,\s*\d+)?\s*\))?(\[\])?"), ""),
+    (_FOR_UPDATE, ""),
+    (re.compile(r"\bILIKE\b", re.IGNORECASE), "LIKE"),
+    # Postgres LIKE escapes with a backslash by default, SQLite only when told
+    (re.compile(r"\bLIKE\s+(%\(\w+\)s|%s)", re.IGNORECASE), r"LIKE \1 ESCAPE '\\'"),
+    (re.compile(r'COLLATE\s+"C"'), "COLLATE BINARY"),
+    (re.compile(r"=\s*ANY\s*\(\s*(%\(\w+\)s|%s)\s*\)", re.IGNORECASE), r"IN (\1)"),
+    (re.compile(r"\bGREATEST\s*\(", re.IGNORECASE), "MAX("),
+    (re.compile(r"\bLEAST\s*\(", re.IGNORECASE), "MIN("),
+    # UPDATE meal_logs ml SET ... needs AS before the alias
+    (re.compile(r"\bUPDATE\s+(\w+)\s+(?!SET\b)(\w+)\s+SET\b", re.IGNORECASE), r"UPDATE \1 AS \2 SET"),
+    # RETURNING takes bare column names of the modified table
+    (re.compile(r"\bRETURNING\b[^;]*", re.IGNORECASE), lambda m: _QUALIFIER.sub("", m.group(0))),
+    # INSERT ... SELECT ... FROM (...) w ON CONFLICT: without a WHERE, SQLite
+    # parses the ON as a join constraint
+    (re.compile(r"\)\s+(?!ON\b)(\w+)\s+ON\s+CONFLICT\b", re.IGNORECASE), r") \1 WHERE TRUE ON CONFLICT"),
+]
+
+_PLACEHOLDER = re.compile(r"%%|%\((\w+)\)s|%s")
+
+
+@lru_cache(maxsize=512)
+def translate(query: str) -> str:
+    # Postgres dialect -> SQLite dialect; placeholders are left for bind().
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    match = _UNSUPPORTED.search(query)
+    if match:
+        raise UnsupportedError(f"Not available with the SQLite backend ({match.group(0).rstrip('( ').strip()}).")
+    return query
+
+
+def bind(query: str, params):
+    # psycopg2 placeholders -> qmark style. A list or tuple value expands to one
+    # placeholder per element (for the IN (...) that = ANY(...) became).
+    if params is None:
+        return query, ()
+    args = []
+    positional = iter(params) if not isinstance(params, dict) else None
+
+    def replace(m):
+        if m.group(0) == "%%":
+            return "%"
+        value = params[m.group(1)] if m.group(1) else next(positional)
+        if isinstance(value, (list, tuple)):
+            args.extend(value)
+            return ", ".join("?" * len(value))
+        args.append(value)
+        return "?"
+
+    return _PLACEHOLDER.sub(replace, query), args
+
+
+def _translate_error(e: sqlite3.Error) -> psycopg2.Error:
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if message.startswith("UNIQUE"):
+            return psycopg2.errors.UniqueViolation(message)
+        if message.startswith("FOREIGN KEY"):
+            return psycopg2.errors.ForeignKeyViolation(message)
+        if message.startswith("CHECK"):
+            return psycopg2.errors.CheckViolation(message)
+        if message.startswith("NOT NULL"):
+            return psycopg2.errors.NotNullViolation(message)
+        return psycopg2.IntegrityError(message)
+    if isinstance(e, sqlite3.OperationalError):
+        return psycopg2.OperationalError(message)
+    return psycopg2.DatabaseError(message)
+
+
+class Cursor:
+    # Unnamed cursors buffer the whole result, as psycopg2 client-side cursors do;
+    # named ("server-side") ones step through it as it is iterated.
+    def __init__(self, connection, dict_rows: bool, named: bool):
+        self.connection = connection
+        self._cur = connection._conn.cursor()
+        if dict_rows:
+            self._cur.row_factory = sqlite3.Row
+        self._named = named
+        self._rows = None
+        self._pos = 0
+        self.itersize = 2000
+        self.arraysize = 1
+        self.description = None
+        self.rowcount = -1
+        self.query = None
+        self.closed = False
+
+    def _run(self, query: str, params):
+        if not isinstance(query, str):
+            raise UnsupportedError("Not available with the SQLite backend (composed SQL).")
+        sql, args = bind(translate(query), params)
+        self.query = sql.encode()
+        conn = self.connection._conn
+        try:
+            if conn.isolation_level is not None and not conn.in_transaction and _FOR_UPDATE.search(query):
+                # A read that the transaction will write after: take the write lock
+                # now, or a writer committing in between makes our write fail with
+                # SQLITE_BUSY at once (the busy timeout only covers taking the lock).
+                conn.execute("BEGIN IMMEDIATE;")
+            self._cur.execute(sql, args)
+        except sqlite3.Error as e:
+            raise _translate_error(e) from None
+        self.description = self._cur.description
+        self._pos = 0
+        if self.description is None:
+            self._rows = []
+            self.rowcount = self._cur.rowcount
+        elif self._named:
+            self._rows = None
+            self.rowcount = -1
+        else:
+            # Fetching also completes INSERT/UPDATE ... RETURNING.
+            self._rows = self._cur.fetchall()
+            self.rowcount = len(self._rows)
+
+    def execute(self, query, vars=None):
+        self._run(query, vars)
+
+    def executemany(self, query, vars_list):
+        rowcount = 0
+        for params in vars_list:
+            self._run(query, params)
+            rowcount += max(self._cur.rowcount, 0)
+        self.rowcount = rowcount
+
+    def mogrify(self, query, vars=None):
+        raise UnsupportedError("Not available with the SQLite backend (mogrify).")
+
+    def copy_expert(self, sql, file, size=8192):
+        raise UnsupportedError("Not available with the SQLite backend (COPY).")
+
+    def fetchone(self):
+        if self._rows is None:
+            return self._cur.fetchone()
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._rows is None:
+            return self._cur.fetchmany(size)
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        if self._rows is None:
+            return self._cur.fetchall()
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        if not self.closed:
+            self._cur.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Connection:
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self.cursor_factory = None
+        self.encoding = "UTF8"
+        self.closed = 0
+
+    def cursor(self, name=None, cursor_factory=None, **kwargs):
+        factory = cursor_factory or self.cursor_factory
+        dict_rows = factory is not None and issubclass(factory, (DictCursor, RealDictCursor))
+        return Cursor(self, dict_rows, named=name is not None)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from None
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if not self.closed:
+            self._conn.close()
+            self.closed = 1
+
+    def get_transaction_status(self) -> int:
+        if self._conn.in_transaction:
+            return extensions.TRANSACTION_STATUS_INTRANS
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    @property
+    def autocommit(self) -> bool:
+        return self._conn.isolation_level is None
+
+    @autocommit.setter
+    def autocommit(self, value: bool):
+        self._conn.isolation_level = None if value else "IMMEDIATE"
+
+
+def init_db(path: str):
+    # (Re)creates every table from schema_sqlite.sql, with the sample data.
+    with open(SCHEMA_FILE, encoding="utf-8") as f:
+        script = f.read()
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(script)
+    finally:
+        conn.close()
+
+
+# Added to schema_sqlite.sql after files were first created with it: columns as
+# (table, column, statements that add and backfill it), and archived_log_months.
+_UPGRADES = [
+    ("workout_exercises", "workout_date", [
+        "ALTER TABLE workout_exercises ADD COLUMN workout_date DATE;",
+        "UPDATE workout_exercises SET workout_date = "
+        "(SELECT workout_date FROM workout_logs WHERE id = workout_id);",
+        "CREATE TRIGGER IF NOT EXISTS trg_workout_logs_date AFTER UPDATE OF workout_date ON workout_logs "
+        "BEGIN UPDATE workout_exercises SET workout_date = NEW.workout_date WHERE workout_id = NEW.id; END;",
+    ]),
+    ("meal_foods", "meal_date", [
+        "ALTER TABLE meal_foods ADD COLUMN meal_date DATE;",
+        "UPDATE meal_foods SET meal_date = (SELECT meal_date FROM meal_logs WHERE id = meal_id);",
+        "CREATE TRIGGER IF NOT EXISTS trg_meal_logs_date AFTER UPDATE OF meal_date ON meal_logs "
+        "BEGIN UPDATE meal_foods SET meal_date = NEW.meal_date WHERE meal_id = NEW.id; END;",
+    ]),
+]
+
+
+_ARCHIVED_LOG_MONTHS = """
+    CREATE TABLE IF NOT EXISTS archived_log_months (
+        month       DATE PRIMARY KEY,
+        month_end   DATE NOT NULL,
+        archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
+def _upgrade(conn: sqlite3.Connection):
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+    if tables and "archived_log_months" not in tables:
+        with conn:
+            conn.execute(_ARCHIVED_LOG_MONTHS)
+    for table, column, statements in _UPGRADES:
+        columns = [r[1] for r in conn.execute(f"PRAGMA table_info({table});")]
+        if columns and column not in columns:
+            with conn:
+                for statement in statements:
+                    conn.execute(statement)
+
+
+def connect(path: str) -> Connection:
+    # A file that does not exist yet is created with the schema.
+    if path != ":memory:" and not os.path.exists(path):
+        init_db(path)
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level="IMMEDIATE",  # writes wait for the lock up front (BUSY_TIMEOUT)
+        check_same_thread=False,  # the pool hands a connection to one thread at a time
+    )
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS};")
+    _upgrade(conn)
+    return Connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the embedded SQLite database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_init = sub.add_parser("init", help="create (or reset) the database file from schema_sqlite.sql")
+    p_init.add_argument("--path", default="fitness_tracker.db")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init_db(args.path)
+        print(f"Initialised {args.path}.")
+
+
+if __name__ == "__main__":
+    main()
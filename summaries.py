@@ -0,0 +1,419 @@
+# summaries.py
+# Per-user, per-day totals (daily_summaries) so the daily report is a primary-key
+# lookup, plus weekly and monthly rollups of those days (summary_rollups) for the
+# trend report. Service writes call refresh_day() inside their own transaction,
+# which also re-sums the day's week and month from daily_summaries; the `rebuild`
+# command backfills both tables from the raw logs. Days in months partitions.py
+# has archived (archived_log_months) are neither re-summed nor cleared: their raw
+# rows are gone, and the stored totals are all that is left of them.
+import argparse
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from psycopg2.extras import DictCursor
+
+import db
+from db import get_connection
+
+_REFRESH_DAY_SQL = """
+    INSERT INTO daily_summaries
+        (user_id, day, calories_in, protein_g, carbs_g, fats_g, meal_count,
+         calories_out, workout_count)
+    SELECT %(user_id)s, %(day)s, m.calories, m.protein_g, m.carbs_g, m.fats_g, m.n,
+           w.calories_out, w.n
+    FROM (
+        SELECT COALESCE(SUM(calories), 0)  AS calories,
+               COALESCE(SUM(protein_g), 0) AS protein_g,
+               COALESCE(SUM(carbs_g), 0)   AS carbs_g,
+               COALESCE(SUM(fats_g), 0)    AS fats_g,
+               COUNT(*)                    AS n
+        FROM meal_logs
+        WHERE user_id = %(user_id)s AND meal_date = %(day)s
+    ) m, (
+        SELECT COALESCE(SUM(calories_burned), 0) AS calories_out,
+               COUNT(*)                          AS n
+        FROM workout_logs
+        WHERE user_id = %(user_id)s AND workout_date = %(day)s
+    ) w
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archived_log_months a WHERE a.month <= %(day)s AND %(day)s < a.month_end
+    )
+    ON CONFLICT (user_id, day) DO UPDATE
+    SET calories_in   = EXCLUDED.calories_in,
+        protein_g     = EXCLUDED.protein_g,
+        carbs_g       = EXCLUDED.carbs_g,
+        fats_g        = EXCLUDED.fats_g,
+        meal_count    = EXCLUDED.meal_count,
+        calories_out  = EXCLUDED.calories_out,
+        workout_count = EXCLUDED.workout_count;
+"""
+
+# Same as _REFRESH_DAY_SQL for many (user_id, day) pairs in one statement.
+_REFRESH_DAYS_SQL = """
+    INSERT INTO daily_summaries
+        (user_id, day, calories_in, protein_g, carbs_g, fats_g, meal_count,
+         calories_out, workout_count)
+    SELECT k.user_id, k.day, m.calories, m.protein_g, m.carbs_g, m.fats_g, m.n,
+           w.calories_out, w.n
+    FROM unnest(%(user_ids)s::bigint[], %(days)s::date[]) AS k(user_id, day)
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(calories), 0)  AS calories,
+               COALESCE(SUM(protein_g), 0) AS protein_g,
+               COALESCE(SUM(carbs_g), 0)   AS carbs_g,
+               COALESCE(SUM(fats_g), 0)    AS fats_g,
+               COUNT(*)                    AS n
+        FROM meal_logs
+        WHERE user_id = k.user_id AND meal_date = k.day
+    ) m
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(calories_burned), 0) AS calories_out,
+               COUNT(*)                          AS n
+        FROM workout_logs
+        WHERE user_id = k.user_id AND workout_date = k.day
+    ) w
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archived_log_months a WHERE a.month <= k.day AND k.day < a.month_end
+    )
+    ON CONFLICT (user_id, day) DO UPDATE
+    SET calories_in   = EXCLUDED.calories_in,
+        protein_g     = EXCLUDED.protein_g,
+        carbs_g       = EXCLUDED.carbs_g,
+        fats_g        = EXCLUDED.fats_g,
+        meal_count    = EXCLUDED.meal_count,
+        calories_out  = EXCLUDED.calories_out,
+        workout_count = EXCLUDED.workout_count;
+"""
+
+# %(user_filter)s is either TRUE or "user_id = %(user_id)s" for a single user.
+_REBUILD_SQL = """
+    INSERT INTO daily_summaries
+        (user_id, day, calories_in, protein_g, carbs_g, fats_g, meal_count,
+         calories_out, workout_count)
+    SELECT COALESCE(m.user_id, w.user_id),
+           COALESCE(m.day, w.day),
+           COALESCE(m.calories, 0), COALESCE(m.protein_g, 0),
+           COALESCE(m.carbs_g, 0), COALESCE(m.fats_g, 0), COALESCE(m.n, 0),
+           COALESCE(w.calories_out, 0), COALESCE(w.n, 0)
+    FROM (
+        SELECT user_id, meal_date AS day,
+               COALESCE(SUM(calories), 0)  AS calories,
+               COALESCE(SUM(protein_g), 0) AS protein_g,
+               COALESCE(SUM(carbs_g), 0)   AS carbs_g,
+               COALESCE(SUM(fats_g), 0)    AS fats_g,
+               COUNT(*)                    AS n
+        FROM meal_logs
+        WHERE {user_filter}
+        GROUP BY user_id, meal_date
+    ) m
+    FULL OUTER JOIN (
+        SELECT user_id, workout_date AS day,
+               COALESCE(SUM(calories_burned), 0) AS calories_out,
+               COUNT(*)                          AS n
+        FROM workout_logs
+        WHERE {user_filter}
+        GROUP BY user_id, workout_date
+    ) w ON w.user_id = m.user_id AND w.day = m.day
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archived_log_months a
+        WHERE a.month <= COALESCE(m.day, w.day) AND COALESCE(m.day, w.day) < a.month_end
+    );
+"""
+
+# What the rebuilds clear first: everything but the days of archived months.
+_DELETE_LIVE_DAYS_SQL = """
+    DELETE FROM daily_summaries
+    WHERE {user_filter}
+      AND NOT EXISTS (
+          SELECT 1 FROM archived_log_months a
+          WHERE a.month <= daily_summaries.day AND daily_summaries.day < a.month_end
+      );
+"""
+
+
+# Re-sums whole (user_id, period, period_start) buckets from daily_summaries: at
+# most 7 or 31 primary-key rows per bucket, whatever the size of the raw logs.
+# days_logged counts days with a meal or a workout, meal_days days with a meal.
+_REFRESH_ROLLUPS_SQL = """
+    INSERT INTO summary_rollups
+        (user_id, period, period_start, days_logged, meal_days, calories_in,
+         protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+    SELECT k.user_id, k.period, k.period_start, d.days_logged, d.meal_days, d.calories_in,
+           d.protein_g, d.carbs_g, d.fats_g, d.meal_count, d.calories_out, d.workout_count
+    FROM unnest(%(user_ids)s::bigint[], %(periods)s::text[], %(starts)s::date[])
+         AS k(user_id, period, period_start)
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0) AS days_logged,
+               COUNT(*) FILTER (WHERE meal_count > 0)                      AS meal_days,
+               COALESCE(SUM(calories_in), 0)   AS calories_in,
+               COALESCE(SUM(protein_g), 0)     AS protein_g,
+               COALESCE(SUM(carbs_g), 0)       AS carbs_g,
+               COALESCE(SUM(fats_g), 0)        AS fats_g,
+               COALESCE(SUM(meal_count), 0)    AS meal_count,
+               COALESCE(SUM(calories_out), 0)  AS calories_out,
+               COALESCE(SUM(workout_count), 0) AS workout_count
+        FROM daily_summaries
+        WHERE user_id = k.user_id
+          AND day >= k.period_start
+          AND day < (k.period_start + ('1 ' || k.period)::interval)::date
+    ) d
+    ON CONFLICT (user_id, period, period_start) DO UPDATE
+    SET days_logged   = EXCLUDED.days_logged,
+        meal_days     = EXCLUDED.meal_days,
+        calories_in   = EXCLUDED.calories_in,
+        protein_g     = EXCLUDED.protein_g,
+        carbs_g       = EXCLUDED.carbs_g,
+        fats_g        = EXCLUDED.fats_g,
+        meal_count    = EXCLUDED.meal_count,
+        calories_out  = EXCLUDED.calories_out,
+        workout_count = EXCLUDED.workout_count;
+"""
+
+# One bucket per statement, for SQLite (no unnest/LATERAL); %(end)s is the
+# following period's start.
+_REFRESH_ROLLUP_SQL = """
+    INSERT INTO summary_rollups
+        (user_id, period, period_start, days_logged, meal_days, calories_in,
+         protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+    SELECT %(user_id)s, %(period)s, %(start)s,
+           COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0),
+           COUNT(*) FILTER (WHERE meal_count > 0),
+           COALESCE(SUM(calories_in), 0), COALESCE(SUM(protein_g), 0),
+           COALESCE(SUM(carbs_g), 0), COALESCE(SUM(fats_g), 0),
+           COALESCE(SUM(meal_count), 0), COALESCE(SUM(calories_out), 0),
+           COALESCE(SUM(workout_count), 0)
+    FROM daily_summaries
+    WHERE user_id = %(user_id)s AND day >= %(start)s AND day < %(end)s
+    ON CONFLICT (user_id, period, period_start) DO UPDATE
+    SET days_logged   = EXCLUDED.days_logged,
+        meal_days     = EXCLUDED.meal_days,
+        calories_in   = EXCLUDED.calories_in,
+        protein_g     = EXCLUDED.protein_g,
+        carbs_g       = EXCLUDED.carbs_g,
+        fats_g        = EXCLUDED.fats_g,
+        meal_count    = EXCLUDED.meal_count,
+        calories_out  = EXCLUDED.calories_out,
+        workout_count = EXCLUDED.workout_count;
+"""
+
+_REBUILD_ROLLUPS_SQL = """
+    INSERT INTO summary_rollups
+        (user_id, period, period_start, days_logged, meal_days, calories_in,
+         protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+    SELECT user_id, p.period, date_trunc(p.period, day)::date,
+           COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0),
+           COUNT(*) FILTER (WHERE meal_count > 0),
+           SUM(calories_in), SUM(protein_g), SUM(carbs_g), SUM(fats_g),
+           SUM(meal_count), SUM(calories_out), SUM(workout_count)
+    FROM daily_summaries
+    CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+    WHERE {user_filter}
+    GROUP BY user_id, p.period, date_trunc(p.period, day);
+"""
+
+# SQLite has no date_trunc: 'weekday 0' moves to the next Sunday (or stays on one).
+_REBUILD_ROLLUPS_SQLITE = """
+    INSERT INTO summary_rollups
+        (user_id, period, period_start, days_logged, meal_days, calories_in,
+         protein_g, carbs_g, fats_g, meal_count, calories_out, workout_count)
+    SELECT user_id, period, start,
+           COUNT(*) FILTER (WHERE meal_count > 0 OR workout_count > 0),
+           COUNT(*) FILTER (WHERE meal_count > 0),
+           SUM(calories_in), SUM(protein_g), SUM(carbs_g), SUM(fats_g),
+           SUM(meal_count), SUM(calories_out), SUM(workout_count)
+    FROM (
+        SELECT d.*, p.period,
+               CASE p.period WHEN 'week' THEN date(d.day, 'weekday 0', '-6 days')
+                             ELSE date(d.day, 'start of month') END AS start
+        FROM daily_summaries d
+        CROSS JOIN (SELECT 'week' AS period UNION ALL SELECT 'month') AS p
+        WHERE {user_filter}
+    ) x
+    GROUP BY user_id, period, start;
+"""
+
+PERIODS = ("week", "month")
+
+# Refreshes re-sum from the transaction's snapshot and overwrite the stored row,
+# so two writers for the same user must not interleave: each takes this lock
+# (transaction-scoped, keyed by user id) before re-summing. The two-key form
+# keeps it apart from the single-key locks in migrate.py and datagen.py.
+_LOCK_CLASS = 0x53554D4D
+
+
+def period_start(period: str, day: date) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period {period!r}")
+
+
+def next_period_start(period: str, start: date) -> date:
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    raise ValueError(f"Unknown period {period!r}")
+
+
+def lock_users(cur, user_ids: Iterable[int]):
+    # Held until commit/rollback; taken in id order so writers cannot deadlock.
+    # SQLite needs nothing: its write transactions are serialised already.
+    ids = sorted(set(user_ids))
+    if ids and db.backend() != "sqlite":
+        cur.execute(
+            "SELECT pg_advisory_xact_lock(%s, (u %% 2147483647)::int) FROM unnest(%s::bigint[]) AS u;",
+            (_LOCK_CLASS, ids),
+        )
+
+
+def refresh_day(cur, user_id: int, day: date):
+    lock_users(cur, [user_id])
+    cur.execute(_REFRESH_DAY_SQL, {"user_id": user_id, "day": day})
+    _refresh_rollups(cur, [(user_id, day)])
+
+
+def refresh_days(cur, user_days: Iterable[Tuple[int, date]]):
+    keys = sorted(set(user_days))
+    if len(keys) == 1:
+        refresh_day(cur, *keys[0])
+        return
+    lock_users(cur, [k[0] for k in keys])
+    if keys and db.backend() == "sqlite":
+        cur.executemany(_REFRESH_DAY_SQL, [{"user_id": u, "day": d} for u, d in keys])
+        _refresh_rollups(cur, keys)
+    elif keys:
+        cur.execute(
+            _REFRESH_DAYS_SQL,
+            {"user_ids": [k[0] for k in keys], "days": [k[1] for k in keys]},
+        )
+        _refresh_rollups(cur, keys)
+
+
+def refresh_rollups(cur, user_days: Iterable[Tuple[int, date]]):
+    # Re-sum the week and month buckets containing each (user_id, day); call
+    # after daily_summaries rows for those days have changed.
+    user_days = list(user_days)
+    lock_users(cur, [u for u, _ in user_days])
+    _refresh_rollups(cur, user_days)
+
+
+def _refresh_rollups(cur, user_days: Iterable[Tuple[int, date]]):
+    buckets = sorted({(u, p, period_start(p, d)) for u, d in user_days for p in PERIODS})
+    if buckets and db.backend() == "sqlite":
+        cur.executemany(
+            _REFRESH_ROLLUP_SQL,
+            [{"user_id": u, "period": p, "start": s, "end": next_period_start(p, s)} for u, p, s in buckets],
+        )
+    elif buckets:
+        cur.execute(
+            _REFRESH_ROLLUPS_SQL,
+            {
+                "user_ids": [b[0] for b in buckets],
+                "periods": [b[1] for b in buckets],
+                "starts": [b[2] for b in buckets],
+            },
+        )
+
+
+def get_day(cur, user_id: int, day: date):
+    cur.execute(
+        """
+        SELECT calories_in, calories_out, protein_g, carbs_g, fats_g,
+               meal_count, workout_count
+        FROM daily_summaries
+        WHERE user_id = %s AND day = %s;
+        """,
+        (user_id, day),
+    )
+    return cur.fetchone()
+
+
+def get_days(cur, user_id: int, start: date, end: date) -> list:
+    # daily_summaries rows for start..end inclusive, by day.
+    cur.execute(
+        """
+        SELECT day, calories_in, calories_out, protein_g, carbs_g, fats_g,
+               meal_count, workout_count
+        FROM daily_summaries
+        WHERE user_id = %s AND day BETWEEN %s AND %s
+        ORDER BY day;
+        """,
+        (user_id, start, end),
+    )
+    return cur.fetchall()
+
+
+def get_days_for_users(cur, user_ids: List[int], start: date, end: date) -> list:
+    # Same as get_days for many users in one query, by user_id and day.
+    cur.execute(
+        """
+        SELECT user_id, day, calories_in, calories_out, protein_g, carbs_g, fats_g,
+               meal_count, workout_count
+        FROM daily_summaries
+        WHERE user_id = ANY(%s) AND day BETWEEN %s AND %s
+        ORDER BY user_id, day;
+        """,
+        (list(user_ids), start, end),
+    )
+    return cur.fetchall()
+
+
+def get_rollups(cur, user_id: int, period: str, first: date, last: date) -> list:
+    # summary_rollups rows whose period_start lies in first..last, by period_start.
+    cur.execute(
+        """
+        SELECT period_start, days_logged, meal_days, calories_in, calories_out,
+               protein_g, carbs_g, fats_g, meal_count, workout_count
+        FROM summary_rollups
+        WHERE user_id = %s AND period = %s AND period_start BETWEEN %s AND %s
+        ORDER BY period_start;
+        """,
+        (user_id, period, first, last),
+    )
+    return cur.fetchall()
+
+
+def _rebuild_rollups_sql() -> str:
+    return _REBUILD_ROLLUPS_SQLITE if db.backend() == "sqlite" else _REBUILD_ROLLUPS_SQL
+
+
+def rebuild_user(cur, user_id: int) -> int:
+    lock_users(cur, [user_id])
+    cur.execute(_DELETE_LIVE_DAYS_SQL.format(user_filter="user_id = %(user_id)s"), {"user_id": user_id})
+    cur.execute(_REBUILD_SQL.format(user_filter="user_id = %(user_id)s"), {"user_id": user_id})
+    rows = cur.rowcount
+    cur.execute("DELETE FROM summary_rollups WHERE user_id = %s;", (user_id,))
+    cur.execute(_rebuild_rollups_sql().format(user_filter="user_id = %(user_id)s"), {"user_id": user_id})
+    return rows
+
+
+def rebuild(user_id: Optional[int] = None) -> int:
+    with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+        if user_id is None:
+            cur.execute(_DELETE_LIVE_DAYS_SQL.format(user_filter="TRUE"))
+            cur.execute(_REBUILD_SQL.format(user_filter="TRUE"))
+            rows = cur.rowcount
+            cur.execute("DELETE FROM summary_rollups;")
+            cur.execute(_rebuild_rollups_sql().format(user_filter="TRUE"))
+        else:
+            rows = rebuild_user(cur, user_id)
+        conn.commit()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily_summaries and summary_rollups tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="recompute summaries and rollups from meal_logs/workout_logs")
+    p_rebuild.add_argument("--user", type=int, help="only rebuild this user id")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rows = rebuild(args.user)
+        scope = f"user {args.user}" if args.user else "all users"
+        print(f"Rebuilt {rows} daily summary rows for {scope}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+# writequeue.py
+# Optional write-behind queue for high-rate logging (wearable syncs, bulk clients).
+# Callers hand a workout, meal, exercise or food write to a background writer and
+# block on a future; the writer collects up to GROUP_MAX_WRITES writes, or what
+# arrived within GROUP_MAX_WAIT of the first one, and applies the whole group as
+# multi-row inserts in one transaction, so the group shares a single commit (and
+# fsync). Futures resolve after that commit, so a returned id is durable.
+#
+# The functions at the bottom mirror the service calls of the same name. Input
+# errors are raised to the caller before queueing; a write that fails inside the
+# group (unknown catalog id, foreign workout/meal) fails on its own. If the group
+# transaction itself fails, it is rolled back and each write is retried through
+# services.py in its own transaction. Retries happen only when the commit is known
+# not to have happened; if the COMMIT's outcome is unknown (connection lost), the
+# writes fail with an error instead of possibly being written twice.
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Sequence, Tuple
+
+from psycopg2.extras import DictCursor, execute_values
+
+import catalog
+import db
+import macros
+import services
+import summaries
+from db import get_connection
+from models import BusyError, Meal, MealFood, NotFoundError, ServiceError, ValidationError, Workout, WorkoutExercise
+
+GROUP_MAX_WRITES = 500
+GROUP_MAX_WAIT = 0.001          # seconds the writer waits for a group to fill
+QUEUE_MAX_PENDING = 10000
+QUEUE_TIMEOUT = 5.0             # seconds a caller waits for room before "server busy"
+
+_WORKOUT_COLUMNS = "id, user_id, workout_type, duration_min, intensity, calories_burned, workout_date"
+_MEAL_COLUMNS = "id, user_id, meal_type, meal_date, calories, protein_g, carbs_g, fats_g"
+
+
+@dataclass
+class _Write:
+    kind: str                   # "workout", "meal", "exercise" or "food"
+    user_id: int
+    args: tuple                 # args[0] is the workout/meal written to, None for a new one
+    future: Future
+    session: object = None      # db.read_your_writes() key of the caller
+
+
+def _insert_many(cur, head: str, rows: list, tail: str = ""):
+    # One multi-row INSERT on Postgres; SQLite has no execute_values and runs it per row.
+    if not rows:
+        return
+    if db.backend() == "sqlite":
+        placeholders = ", ".join(["%s"] * len(rows[0]))
+        cur.executemany(f"{head} VALUES ({placeholders}) {tail};", rows)
+    else:
+        execute_values(cur, f"{head} VALUES %s {tail};", rows)
+
+
+def _insert_logs(cur, table: str, columns: str, rows: List[tuple]) -> List[int]:
+    # Ids are reserved first (see exporter._flush_workouts) so children can
+    # reference them; SQLite assigns them one row at a time.
+    if not rows:
+        return []
+    if db.backend() == "sqlite":
+        placeholders = ", ".join(["%s"] * len(rows[0]))
+        ids = []
+        for row in rows:
+            cur.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING id;", row)
+            ids.append(cur.fetchone()[0])
+        return ids
+    ids = db.allocate_ids(cur, table, len(rows))
+    execute_values(
+        cur,
+        f"INSERT INTO {table} (id, {columns}) OVERRIDING SYSTEM VALUE VALUES %s;",
+        [(new_id,) + row for new_id, row in zip(ids, rows)],
+    )
+    return ids
+
+
+def _owners(cur, table: str, ids, lock: bool = False) -> dict:
+    # id -> row (id, user_id, date column) for the existing logs a group touches.
+    if not ids:
+        return {}
+    day = "meal_date" if table == "meal_logs" else "workout_date"
+    cur.execute(
+        f"SELECT id, user_id, {day} FROM {table} WHERE id = ANY(%s) ORDER BY id{' FOR UPDATE' if lock else ''};",
+        (sorted(ids),),
+    )
+    return {r[0]: r for r in cur.fetchall()}
+
+
+def _fetch(cur, table: str, columns: str, ids) -> dict:
+    if not ids:
+        return {}
+    cur.execute(f"SELECT {columns} FROM {table} WHERE id = ANY(%s);", (sorted(ids),))
+    return {r["id"]: r for r in cur.fetchall()}
+
+
+def _apply_group(cur, writes: List[_Write]) -> list:
+    # Returns [(write, result or exception)] for every write in the group.
+    outcome = {}
+    ok = []
+    for w in writes:
+        try:
+            if w.kind in ("workout", "exercise"):
+                for exercise_id, *_ in (w.args[1] if w.kind == "workout" else [w.args[1:]]):
+                    if not catalog.exercises.get(exercise_id, cur):
+                        raise ValidationError(f"Invalid exercise id {exercise_id}.")
+            else:
+                for food_id, _ in (w.args[1] if w.kind == "meal" else [w.args[1:]]):
+                    if not catalog.foods.exists(food_id, cur):
+                        raise ValidationError(f"Invalid food id {food_id}.")
+            ok.append(w)
+        except ServiceError as e:
+            outcome[id(w)] = e
+
+    workouts = _owners(cur, "workout_logs", {w.args[0] for w in ok if w.kind == "exercise"})
+    meals = _owners(cur, "meal_logs", {w.args[0] for w in ok if w.kind == "food"}, lock=True)
+    owned = []
+    for w in ok:
+        existing = workouts if w.kind == "exercise" else meals if w.kind == "food" else None
+        if existing is not None and (w.args[0] not in existing or existing[w.args[0]][1] != w.user_id):
+            what = "Workout" if w.kind == "exercise" else "Meal"
+            outcome[id(w)] = NotFoundError(f"{what} not found (or not owned by you).")
+        else:
+            owned.append(w)
+
+    new_workouts = [w for w in owned if w.kind == "workout"]
+    workout_ids = _insert_logs(
+        cur, "workout_logs", "user_id, workout_type, duration_min, intensity, calories_burned, workout_date",
+        [(w.user_id,) + w.args[2:] for w in new_workouts],
+    )
+    new_meals = [w for w in owned if w.kind == "meal"]
+    meal_ids = _insert_logs(
+        cur, "meal_logs", "user_id, meal_type, meal_date", [(w.user_id,) + w.args[2:] for w in new_meals]
+    )
+    target = {id(w): new_id for w, new_id in zip(new_workouts + new_meals, workout_ids + meal_ids)}
+
+    # Later writes to the same (log, catalog item) win, as repeated service calls would.
+    exercise_rows, food_rows = {}, {}
+    for w in owned:
+        if w.kind == "workout":
+            for exercise_id, sets, reps, weight in w.args[1]:
+                exercise_rows[target[id(w)], exercise_id] = (sets, reps, weight)
+        elif w.kind == "exercise":
+            exercise_rows[w.args[0], w.args[1]] = w.args[2:]
+        elif w.kind == "meal":
+            for food_id, quantity in w.args[1]:
+                food_rows[target[id(w)], food_id] = quantity
+        else:
+            food_rows[w.args[0], w.args[1]] = w.args[2]
+    # Child rows carry their log's date (the partition key of the parent on Postgres).
+    workout_dates = {**{i: r[2] for i, r in workouts.items()}, **{target[id(w)]: w.args[-1] for w in new_workouts}}
+    meal_dates = {**{i: r[2] for i, r in meals.items()}, **{target[id(w)]: w.args[-1] for w in new_meals}}
+    _insert_many(
+        cur,
+        "INSERT INTO workout_exercises (workout_id, exercise_id, sets, reps, weight_used_kg, workout_date)",
+        [key + values + (workout_dates[key[0]],) for key, values in exercise_rows.items()],
+        "ON CONFLICT (workout_id, exercise_id) DO UPDATE SET sets = EXCLUDED.sets, "
+        "reps = EXCLUDED.reps, weight_used_kg = EXCLUDED.weight_used_kg",
+    )
+    _insert_many(
+        cur,
+        "INSERT INTO meal_foods (meal_id, food_id, quantity, meal_date)",
+        [key + (quantity, meal_dates[key[0]]) for key, quantity in food_rows.items()],
+        "ON CONFLICT (meal_id, food_id) DO UPDATE SET quantity = EXCLUDED.quantity",
+    )
+
+    touched_meals = {meal_id for meal_id, _ in food_rows}
+    if touched_meals:
+        macros.recompute_meals(cur, touched_meals)
+    summaries.refresh_days(
+        cur,
+        [(w.user_id, w.args[-1]) for w in new_workouts + new_meals]
+        + [(r[1], r[2]) for meal_id, r in meals.items() if meal_id in touched_meals],
+    )
+
+    workout_rows = _fetch(cur, "workout_logs", _WORKOUT_COLUMNS, workout_ids)
+    meal_rows = _fetch(cur, "meal_logs", _MEAL_COLUMNS, set(meal_ids) | touched_meals)
+    for w in owned:
+        if w.kind == "workout":
+            result = services._workout_from_row(workout_rows[target[id(w)]])
+            result.exercises = [
+                WorkoutExercise(exercise_id, catalog.exercises.get(exercise_id, cur).exercise_name, *rest)
+                for exercise_id, *rest in w.args[1]
+            ]
+        elif w.kind == "meal":
+            result = services._meal_from_row(meal_rows[target[id(w)]])
+            result.foods = [
+                MealFood(food_id, catalog.foods.get(food_id, cur).food_name, quantity)
+                for food_id, quantity in w.args[1]
+            ]
+        elif w.kind == "exercise":
+            exercise_id, sets, reps, weight = w.args[1:]
+            result = WorkoutExercise(exercise_id, catalog.exercises.get(exercise_id, cur).exercise_name,
+                                     sets, reps, weight)
+        else:
+            result = services._meal_from_row(meal_rows[w.args[0]])
+        outcome[id(w)] = result
+    return [(w, outcome[id(w)]) for w in writes]
+
+
+def _apply_one(w: _Write):
+    # The per-call service path, used when a group transaction fails.
+    if w.kind == "workout":
+        exercises, rest = w.args[1], w.args[2:]
+        if exercises:
+            return services.log_workout(w.user_id, rest[0], exercises, *rest[1:])
+        return services.create_workout(w.user_id, *rest)
+    if w.kind == "meal":
+        foods, (meal_type, meal_date) = w.args[1], w.args[2:]
+        if foods:
+            return services.log_meal(w.user_id, meal_type, foods, meal_date)
+        return services.create_meal(w.user_id, meal_type, meal_date)
+    if w.kind == "exercise":
+        return services.add_exercise_to_workout(w.user_id, *w.args)
+    return services.add_food_to_meal(w.user_id, *w.args)
+
+
+def _commit_refused(e: Exception) -> bool:
+    # True when the server answered the COMMIT with an error, so nothing was
+    # written. A local SQLite commit either happens or raises.
+    return getattr(e, "pgcode", None) is not None or db.backend() == "sqlite"
+
+
+def _resolve(future: Future, result):
+    if isinstance(result, Exception):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
+
+
+class WriteQueue:
+    def __init__(self, max_writes: int = None, max_wait: float = None, max_pending: int = None):
+        # Defaults are read at construction, so the module settings can be changed first.
+        self.max_writes = max_writes or GROUP_MAX_WRITES
+        self.max_wait = GROUP_MAX_WAIT if max_wait is None else max_wait
+        self.groups = 0
+        self.writes = 0
+        self.fallbacks = 0
+        self._pending = queue.Queue(maxsize=max_pending or QUEUE_MAX_PENDING)
+        self._closed = False
+        self._thread = threading.Thread(target=self._work, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, user_id: int, args: tuple) -> Future:
+        if self._closed:
+            raise ServiceError("Write queue is closed.")
+        future = Future()
+        try:
+            self._pending.put(_Write(kind, user_id, args, future, db.consistency_key()), timeout=QUEUE_TIMEOUT)
+        except queue.Full:
+            raise BusyError("Server busy, try again shortly.") from None
+        return future
+
+    def flush(self):
+        # Blocks until everything submitted before the call has committed.
+        if self._closed:
+            return
+        future = Future()
+        self._pending.put(future)
+        future.result()
+
+    def close(self):
+        # Commits what is queued, then stops the writer.
+        if not self._closed:
+            self._closed = True
+            self._pending.put(None)
+            self._thread.join()
+
+    def _work(self):
+        while True:
+            item = self._pending.get()
+            group = []
+            deadline = time.monotonic() + self.max_wait
+            while isinstance(item, _Write):
+                group.append(item)
+                if len(group) >= self.max_writes:
+                    item = False
+                    break
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = False
+            if group:
+                self._commit(group)
+            if item is None:
+                return
+            if isinstance(item, Future):
+                item.set_result(None)
+
+    def _commit(self, group: List[_Write]):
+        conn = None
+        state = "open"          # -> "committing" -> "committed"
+        try:
+            with get_connection() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
+                results = _apply_group(cur, group)
+                state = "committing"
+                conn.commit()
+                state = "committed"
+        except Exception as exc:
+            if state == "committed":
+                # Failed on the way out (cursor close, returning the connection):
+                # the writes are in, so keep their results.
+                pass
+            elif state == "committing" and not _commit_refused(exc):
+                # The COMMIT may or may not have happened (e.g. connection lost
+                # waiting for the reply); retrying could write everything twice.
+                error = ServiceError("Write outcome unknown, check before retrying.")
+                error.__cause__ = exc
+                results = [(w, error) for w in group]
+            else:
+                # Rolled back; retry each write on its own.
+                self.fallbacks += 1
+                results = []
+                for w in group:
+                    try:
+                        results.append((w, _apply_one(w)))
+                    except Exception as e:
+                        results.append((w, e))
+        if state == "committed":
+            try:
+                db.note_writes(conn, {w.session for w in group})
+            except Exception:
+                # Only read-your-writes bookkeeping; the writes themselves are in.
+                pass
+        self.groups += 1
+        self.writes += len(group)
+        for w, result in results:
+            _resolve(w.future, result)
+
+
+_queue = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> WriteQueue:
+    # One writer per process, as with db.get_pool().
+    global _queue, _queue_pid
+    if _queue is None or _queue_pid != os.getpid():
+        with _queue_lock:
+            if _queue is None or _queue_pid != os.getpid():
+                _queue = WriteQueue()
+                _queue_pid = os.getpid()
+    return _queue
+
+
+def shutdown():
+    global _queue
+    with _queue_lock:
+        q, _queue = _queue, None
+    if q is not None and _queue_pid == os.getpid():
+        q.close()
+
+
+atexit.register(shutdown)
+
+
+def _date(value, what: str) -> date:
+    return services._as_date(value or date.today(), what)
+
+
+def create_workout(
+    user_id: int,
+    workout_type: Optional[str],
+    duration_min: float = 0,
+    intensity: Optional[str] = None,
+    calories_burned: float = 0,
+    workout_date=None,
+) -> Workout:
+    services._check_workout(duration_min, calories_burned)
+    args = (None, (), workout_type, duration_min, intensity, calories_burned, _date(workout_date, "workout date"))
+    return get_queue().submit("workout", user_id, args).result()
+
+
+def log_workout(
+    user_id: int,
+    workout_type: Optional[str],
+    exercises: Sequence[Tuple[int, int, int, float]],
+    duration_min: float = 0,
+    intensity: Optional[str] = None,
+    calories_burned: float = 0,
+    workout_date=None,
+) -> Workout:
+    items = {int(e[0]): (int(e[0]), int(e[1]), int(e[2]), float(e[3])) for e in exercises}
+    if not items:
+        raise ValidationError("A workout needs at least one exercise.")
+    for _, sets, reps, weight in items.values():
+        services._check_sets(sets, reps, weight)
+    services._check_workout(duration_min, calories_burned)
+    args = (None, tuple(items.values()), workout_type, duration_min, intensity, calories_burned,
+            _date(workout_date, "workout date"))
+    return get_queue().submit("workout", user_id, args).result()
+
+
+def add_exercise_to_workout(
+    user_id: int,
+    workout_id: int,
+    exercise_id: int,
+    sets: int = 0,
+    reps: int = 0,
+    weight_used_kg: float = 0,
+) -> WorkoutExercise:
+    services._check_sets(sets, reps, weight_used_kg)
+    args = (workout_id, exercise_id, sets, reps, float(weight_used_kg))
+    return get_queue().submit("exercise", user_id, args).result()
+
+
+def create_meal(user_id: int, meal_type: Optional[str], meal_date=None) -> Meal:
+    args = (None, (), meal_type, _date(meal_date, "meal date"))
+    return get_queue().submit("meal", user_id, args).result()
+
+
+def log_meal(
+    user_id: int,
+    meal_type: Optional[str],
+    foods: Sequence[Tuple[int, float]],
+    meal_date=None,
+) -> Meal:
+    items = {int(food_id): float(quantity) for food_id, quantity in foods}
+    if not items:
+        raise ValidationError("A meal needs at least one food.")
+    for quantity in items.values():
+        services._check_quantity(quantity)
+    args = (None, tuple(items.items()), meal_type, _date(meal_date, "meal date"))
+    return get_queue().submit("meal", user_id, args).result()
+
+
+def add_food_to_meal(user_id: int, meal_id: int, food_id: int, quantity: float = 1.0) -> Meal:
+    services._check_quantity(quantity)
+    return get_queue().submit("food", user_id, (meal_id, food_id, quantity)).result()